@@ -0,0 +1,105 @@
+# Asyncio front end for the config manager: blocking storage work runs on worker threads
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from app_config_service.config_manager import ThreadSafeConfigManager
+from app_config_service.models import ConfigSnapshot
+
+class AsyncConfigManager:
+    """
+    Coroutine API over a ThreadSafeConfigManager, for asyncio applications.
+
+    Reads whose snapshot is already built are answered on the event loop; other reads
+    and every write run on worker threads. Writes are applied on one writer thread in
+    submission order. Writes to a service that arrive while its previous batch is being
+    saved are coalesced: the whole batch is applied in one transaction and saved once.
+    A write that fails validation raises for its own caller only.
+    """
+    def __init__(self, storage, max_retries: int = 20):
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='config-writer')
+        self.manager = ThreadSafeConfigManager(storage, max_retries=max_retries)
+        self.pending: Dict[str, List[Tuple[Callable[[], None], asyncio.Future]]] = {}
+        self.flushes: Dict[str, asyncio.Task] = {}
+        self.batches = 0  # transactions committed by the writer thread
+
+    async def get_config(self, service_name: str, environment: str) -> Optional[ConfigSnapshot]:
+        snapshot = self.manager.snapshots.get(service_name, {}).get(environment)
+        if snapshot is not None:
+            return snapshot
+        return await asyncio.get_running_loop().run_in_executor(None, self.manager.get_config, service_name, environment)
+
+    async def get_config_json(self, service_name: str, environment: str) -> Optional[str]:
+        snapshot = await self.get_config(service_name, environment)
+        return snapshot.to_json() if snapshot else None
+
+    async def list_services(self) -> List[str]:
+        return await asyncio.get_running_loop().run_in_executor(self.writer, self.manager.storage.list_services)
+
+    def _submit(self, service_name: str, operation: Callable[[], None]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if service_name in self.pending:
+            self.pending[service_name].append((operation, future))
+        else:
+            self.pending[service_name] = [(operation, future)]
+            self.flushes[service_name] = asyncio.ensure_future(self._flush(service_name))
+        return future
+
+    async def _flush(self, service_name: str):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.pending[service_name]:
+                batch, self.pending[service_name] = self.pending[service_name], []
+                try:
+                    errors = await loop.run_in_executor(self.writer, self._apply, [operation for operation, _ in batch])
+                except Exception as e:
+                    errors = [e] * len(batch)  # the commit itself failed
+                for (_, future), error in zip(batch, errors):
+                    if future.cancelled():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+        finally:
+            del self.pending[service_name]
+            del self.flushes[service_name]
+
+    def _apply(self, operations: List[Callable[[], None]]) -> List[Optional[Exception]]:
+        # Runs on the writer thread: one transaction (re-run on write conflicts) for the whole batch
+        def apply_all():
+            errors = []
+            for operation in operations:
+                try:
+                    operation()
+                except (ValueError, TypeError) as e:
+                    errors.append(e)
+                else:
+                    errors.append(None)
+            return errors
+        errors = self.manager.run_transaction(apply_all)
+        self.batches += 1
+        return errors
+
+    async def set_base_config(self, service_name: str, config_data: Dict[str, Any]):
+        await self._submit(service_name, lambda: self.manager.set_base_config(service_name, config_data))
+
+    async def set_env_config(self, service_name: str, environment: str, config_data: Dict[str, Any]):
+        await self._submit(service_name, lambda: self.manager.set_env_config(service_name, environment, config_data))
+
+    async def remove_key_from_base(self, service_name: str, key: str):
+        await self._submit(service_name, lambda: self.manager.remove_key_from_base(service_name, key))
+
+    async def delete_service(self, service_name: str) -> bool:
+        # Writes submitted before the delete land first
+        if service_name in self.flushes:
+            await asyncio.shield(self.flushes[service_name])
+        return await asyncio.get_running_loop().run_in_executor(self.writer, self.manager.delete_service, service_name)
+
+    async def close(self):
+        """Wait for queued writes, then release the store and the writer thread."""
+        if self.flushes:
+            await asyncio.gather(*self.flushes.values(), return_exceptions=True)
+        if hasattr(self.manager.storage, 'close'):
+            await asyncio.get_running_loop().run_in_executor(self.writer, self.manager.storage.close)
+        self.writer.shutdown(wait=True)
@@ -0,0 +1,180 @@
+# Compact binary snapshot format for near-instant store loading
+#
+# Layout (all integers little-endian):
+#   header   magic 'ACFG', format version u16, flags u16, service count u32, key count u32,
+#            key table offset u64, index offset u64
+#   records  one per service: version u64, environment count u32, then per environment:
+#            name key id u32, created_at i64, updated_at i64 (epoch microseconds, UTC),
+#            value count u32, then per value: key id u32, JSON length u32, compact JSON bytes
+#   keys     key count x (offset u32, length u32) into the UTF-8 blob that follows; every
+#            config key and environment name is stored once and referenced by id
+#   index    service count x (name offset u64, name length u32, record offset u64, record length u32),
+#            sorted by UTF-8 name, followed by the names blob; lookups binary-search it in place
+#
+# A service is decoded from its own record plus the keys it references, without reading the rest of the file.
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import mmap
+import os
+import struct
+import sys
+from app_config_service.models import Service, timestamp_us
+
+MAGIC = b'ACFG'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIQQ')
+KEY_ENTRY = struct.Struct('<II')
+INDEX_ENTRY = struct.Struct('<QIQI')
+RECORD_HEADER = struct.Struct('<QI')
+ENV_HEADER = struct.Struct('<IqqI')
+VALUE_HEADER = struct.Struct('<II')
+
+def write_name_index(f, index: List[Tuple[bytes, int, int]]) -> int:
+    """Write (name, offset, length) entries sorted by name at the current position; returns where the index starts."""
+    index_offset = f.tell()
+    index.sort()
+    names_offset = index_offset + INDEX_ENTRY.size * len(index)
+    for name, offset, length in index:
+        f.write(INDEX_ENTRY.pack(names_offset, len(name), offset, length))
+        names_offset += len(name)
+    for name, _, _ in index:
+        f.write(name)
+    return index_offset
+
+class NameIndex:
+    """Sorted name -> (offset, length) index written by write_name_index, searched in place in a buffer."""
+    def __init__(self, data, index_offset: int, count: int):
+        self.data = data
+        self.index_offset = index_offset
+        self.count = count
+
+    def entry(self, position: int) -> Tuple[bytes, int, int]:
+        name_offset, name_length, offset, length = INDEX_ENTRY.unpack_from(
+            self.data, self.index_offset + INDEX_ENTRY.size * position)
+        return self.data[name_offset:name_offset + name_length], offset, length
+
+    def find(self, name: str) -> Optional[Tuple[int, int]]:
+        target = name.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            candidate, offset, length = self.entry(middle)
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return offset, length
+        return None
+
+    def names(self) -> Iterator[str]:
+        for position in range(self.count):
+            yield self.entry(position)[0].decode('utf-8')
+
+def is_binary_snapshot(filename: str) -> bool:
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def write_snapshot(filename: str, services: Iterable[Service]) -> int:
+    """Write services (consumed one at a time) as a binary snapshot; returns the number written."""
+    keys: Dict[str, int] = {}
+    index: List[Tuple[bytes, int, int]] = []
+
+    def key_id(key: str) -> int:
+        if key not in keys:
+            keys[key] = len(keys)
+        return keys[key]
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        for service in services:
+            parts = [RECORD_HEADER.pack(service.version, len(service.configurations))]
+            for env, entry in service.configurations.items():
+                parts.append(ENV_HEADER.pack(key_id(env), timestamp_us(entry.created_raw),
+                                             timestamp_us(entry.updated_raw), len(entry.overrides)))
+                for key, value in entry.overrides.items():
+                    encoded = json.dumps(value, separators=(',', ':')).encode('utf-8')
+                    parts.append(VALUE_HEADER.pack(key_id(key), len(encoded)))
+                    parts.append(encoded)
+            record = b''.join(parts)
+            index.append((service.name.encode('utf-8'), f.tell(), len(record)))
+            f.write(record)
+
+        keys_offset = f.tell()
+        blob_offset = 0
+        encoded_keys = [key.encode('utf-8') for key in keys]
+        for encoded in encoded_keys:
+            f.write(KEY_ENTRY.pack(blob_offset, len(encoded)))
+            blob_offset += len(encoded)
+        f.write(b''.join(encoded_keys))
+
+        index_offset = write_name_index(f, index)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(index), len(keys), keys_offset, index_offset))
+    os.replace(tmp, filename)
+    return len(index)
+
+class BinarySnapshot:
+    """Read-only view of a snapshot file through mmap; nothing is decoded until asked for."""
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.service_count, self.key_count, self.keys_offset, self.index_offset = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"'{filename}' is not a version {FORMAT_VERSION} config snapshot.")
+        self.keys_blob = self.keys_offset + KEY_ENTRY.size * self.key_count
+        self.keys: Dict[int, str] = {}
+        self.index = NameIndex(self.data, self.index_offset, self.service_count)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def key(self, key_id: int) -> str:
+        key = self.keys.get(key_id)
+        if key is None:
+            offset, length = KEY_ENTRY.unpack_from(self.data, self.keys_offset + KEY_ENTRY.size * key_id)
+            start = self.keys_blob + offset
+            key = self.keys[key_id] = sys.intern(self.data[start:start + length].decode('utf-8'))
+        return key
+
+    def find(self, name: str) -> Optional[Tuple[int, int]]:
+        return self.index.find(name)
+
+    def names(self) -> Iterator[str]:
+        return self.index.names()
+
+    def read_service(self, name: str) -> Optional[Service]:
+        location = self.find(name)
+        if location is None:
+            return None
+        data, position = self.data, location[0]
+        version, env_count = RECORD_HEADER.unpack_from(data, position)
+        position += RECORD_HEADER.size
+        service = Service(name)
+        service.version = version
+        for _ in range(env_count):
+            env_id, created_at, updated_at, value_count = ENV_HEADER.unpack_from(data, position)
+            position += ENV_HEADER.size
+            values = {}
+            for _ in range(value_count):
+                key_id, length = VALUE_HEADER.unpack_from(data, position)
+                position += VALUE_HEADER.size
+                values[self.key(key_id)] = json.loads(data[position:position + length])
+                position += length
+            # Epoch integers are turned into datetimes only when read
+            service.add_configuration(self.key(env_id), values, created_at, updated_at)
+        return service
+
+    def iter_services(self) -> Iterator[Service]:
+        for name in self.names():
+            yield self.read_service(name)
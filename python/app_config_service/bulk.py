@@ -0,0 +1,199 @@
+# Streaming bulk import and export of configuration records
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+# A record is (source, {'service': ..., 'environment': ..., 'config': {...}}); source is used in reports
+Record = Tuple[str, Dict[str, Any]]
+
+class ImportReport:
+    def __init__(self):
+        self.applied = 0
+        self.rejected: List[Tuple[str, str]] = []  # (source, error)
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.applied + len(self.rejected)
+
+    @property
+    def records_per_second(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+def compression_for(path: str) -> str:
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression needs the 'zstandard' package (pip install zstandard).")
+    return zstandard
+
+def open_text(path: str, mode: str, compression: str = 'none'):
+    """Open a text stream on a file ('-' for stdin/stdout) with optional gzip or zstd compression."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'. Choose from: {', '.join(COMPRESSIONS)}")
+    if path == '-':
+        if compression == 'none':
+            # Callers must not close the process's own streams
+            return sys.stdout if mode == 'w' else sys.stdin
+        raw = sys.stdout.buffer if mode == 'w' else sys.stdin.buffer
+    else:
+        if compression == 'none':
+            return open(path, mode, encoding="utf-8")
+        raw = open(path, mode + 'b')
+    if compression == 'gzip':
+        stream = gzip.GzipFile(fileobj=raw, mode=mode + 'b')
+    elif mode == 'w':
+        stream = _zstandard().ZstdCompressor().stream_writer(raw, closefd=path != '-')
+    else:
+        stream = _zstandard().ZstdDecompressor().stream_reader(raw, closefd=path != '-')
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+def read_ndjson(path: str) -> Iterator[Record]:
+    """Yield records from an NDJSON file ('-' for stdin, '.gz'/'.zst' compressed), one line at a time."""
+    f = sys.stdin if path == '-' else open_text(path, "r", compression_for(path))
+    try:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            source = f"line {line_no}"
+            try:
+                yield source, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield source, {'error': f"Invalid JSON: {e}"}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def read_service_files(directory: str, skip: Iterable[str] = ()) -> Iterator[Record]:
+    """
+    Yield records from a directory of files written by print-service-json, leaving out the files in
+    skip (e.g. the store's own, which print-service-json writes next to by default).
+    Those files hold resolved environments, so only keys that differ from base are imported as overrides.
+    """
+    skipped = {os.path.realpath(path) for path in skip}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json') or os.path.realpath(os.path.join(directory, name)) in skipped:
+            continue
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            service_name = data['service_name']
+            configurations = data['configurations']
+        except (ValueError, KeyError, TypeError) as e:
+            yield name, {'error': f"Not a service export file: {e}"}
+            continue
+        base = configurations.get('base', {})
+        yield name, {'service': service_name, 'environment': 'base', 'config': base}
+        for env, config in configurations.items():
+            if env != 'base':
+                overrides = {k: v for k, v in config.items() if k not in base or base[k] != v}
+                yield f"{name} [{env}]", {'service': service_name, 'environment': env, 'config': overrides}
+
+def read_records(path: str, skip: Iterable[str] = ()) -> Iterator[Record]:
+    return read_service_files(path, skip) if os.path.isdir(path) else read_ndjson(path)
+
+def apply_record(manager, record: Dict[str, Any]):
+    if not isinstance(record, dict):
+        raise ValueError('Record must be a JSON object.')
+    if 'error' in record:
+        raise ValueError(record['error'])
+    if 'service' not in record or 'config' not in record:
+        raise ValueError("Record needs 'service' and 'config' fields.")
+    environment = record.get('environment', 'base')
+    if not isinstance(record['service'], str) or not isinstance(environment, str):
+        raise ValueError('Service and environment names must be strings.')
+    if environment == 'base':
+        manager.set_base_config(record['service'], record['config'])
+    else:
+        manager.set_env_config(record['service'], environment, record['config'])
+
+def import_records(manager, records: Iterable[Record], chunk_size: int = 1000) -> ImportReport:
+    """
+    Apply records in chunks of chunk_size, committing once per chunk (retried on write conflicts).
+    Invalid records are skipped and reported; only one chunk is held in memory at a time.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+
+        def apply_chunk():
+            applied, rejected = 0, []
+            for source, record in chunk:
+                try:
+                    apply_record(manager, record)
+                except (ValueError, TypeError) as e:
+                    rejected.append((source, str(e)))
+                else:
+                    applied += 1
+            return applied, rejected
+        # Re-run from scratch if another process wrote one of the chunk's services first
+        applied, rejected = manager.run_transaction(apply_chunk)
+        report.applied += applied
+        report.rejected.extend(rejected)
+        report.chunks += 1
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def iter_services(storage, prefix: Optional[str] = None):
+    """Yield services one at a time without keeping them loaded, when the storage supports it."""
+    if hasattr(storage, 'iter_services'):
+        services = storage.iter_services()
+    else:
+        services = (storage.get_service(name) for name in storage.list_services())
+    for service in services:
+        if service is not None and (not prefix or service.name.startswith(prefix)):
+            yield service
+
+def _export_configs(service, environment: Optional[str], resolved: bool) -> Dict[str, Dict[str, Any]]:
+    configs = {}
+    for env, entry in service.configurations.items():
+        if environment is None or env == environment:
+            # Overrides keep the export lossless for re-import; resolved is easier to consume
+            configs[env] = entry.config_data if resolved else entry.overrides
+    return configs
+
+def export_records(storage, out, fmt: str = 'ndjson', prefix: Optional[str] = None,
+                   environment: Optional[str] = None, resolved: bool = False) -> int:
+    """
+    Write services to the text stream out, one service at a time, and return how many were written.
+    'ndjson' writes one import-compatible record per service environment;
+    'json' writes a single {service: {environment: config}} object.
+    """
+    if fmt not in ('ndjson', 'json'):
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: ndjson, json")
+    count = 0
+    separator = '{\n'
+    for service in iter_services(storage, prefix):
+        configs = _export_configs(service, environment, resolved)
+        if not configs:
+            continue
+        if fmt == 'ndjson':
+            for env, config in configs.items():
+                out.write(json.dumps({'service': service.name, 'environment': env, 'config': config}) + '\n')
+        else:
+            out.write(separator + json.dumps(service.name) + ': ' + json.dumps(configs))
+            separator = ',\n'
+        count += 1
+    if fmt == 'json':
+        out.write('{}\n' if count == 0 else '\n}\n')
+    return count
@@ -0,0 +1,50 @@
+# Cache of resolved, pre-serialized configurations
+
+from typing import Any, Dict, Hashable, Optional
+from collections import OrderedDict
+
+class ResolvedConfigCache:
+    """
+    Bounded LRU cache keyed by (service, environment, version).
+    Because the service version changes on every committed mutation, stale
+    entries are never returned; they simply age out.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, service_name: str):
+        # Needed when a service is deleted and may be recreated with a reused version number
+        for key in [key for key in self.entries if key[0] == service_name]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+        }
@@ -0,0 +1,160 @@
+# Change feed: a bounded, persisted log of committed configuration changes with sequence numbers
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, UTC
+import json
+import time
+from app_config_service.models import ConfigurationEntry
+from app_config_service.instrumentation import metrics
+from app_config_service.sidecars import AppendLog, sidecar_path
+
+_MISSING = object()
+
+class ChangeEvent:
+    """
+    One committed change to one environment of a service. environment is None when the
+    whole service was deleted, in which case new_version is None too.
+    """
+    def __init__(self, service: str, environment: Optional[str], keys: List[str], old_version: int,
+                 new_version: Optional[int], sequence: int = 0, timestamp: Optional[str] = None):
+        self.sequence = sequence
+        self.service = service
+        self.environment = environment
+        self.keys = keys
+        self.old_version = old_version
+        self.new_version = new_version
+        self.timestamp = timestamp  # set by ChangeFeed.publish
+
+    def matches(self, service: Optional[str] = None, environment: Optional[str] = None) -> bool:
+        # Environments resolve through base, so base changes concern every environment
+        if service is not None and self.service != service:
+            return False
+        return environment is None or self.environment in (environment, 'base', None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'sequence': self.sequence, 'service': self.service, 'environment': self.environment,
+                'keys': self.keys, 'old_version': self.old_version, 'new_version': self.new_version,
+                'timestamp': self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChangeEvent':
+        return cls(data['service'], data['environment'], data['keys'], data['old_version'],
+                   data['new_version'], data['sequence'], data['timestamp'])
+
+def changed_keys(old: Dict[str, ConfigurationEntry], new: Dict[str, ConfigurationEntry]) -> Dict[str, List[str]]:
+    """Environment -> sorted keys whose stored value was added, changed or removed."""
+    changes = {}
+    for env in list(old) + [env for env in new if env not in old]:
+        before = old[env].overrides if env in old else {}
+        after = new[env].overrides if env in new else {}
+        keys = [key for key in set(before) | set(after) if before.get(key, _MISSING) != after.get(key, _MISSING)]
+        if keys or (env in old) != (env in new):
+            changes[env] = sorted(keys)
+    return changes
+
+class FeedGapError(ValueError):
+    """Raised when events after the requested sequence number were already trimmed from the feed."""
+    def __init__(self, since: int, first_sequence: int):
+        super().__init__(f'Events {since + 1}-{first_sequence - 1} are no longer in the change feed; '
+                         f'reload the configs and resume from the latest sequence number.')
+        self.since = since
+        self.first_sequence = first_sequence
+
+def feed_path(storage) -> str:
+    return sidecar_path(storage, '.changes', 'changes.ndjson')
+
+class ChangeFeed(AppendLog):
+    """
+    Append-only NDJSON file of ChangeEvents numbered 1, 2, 3, ...
+
+    Only the latest max_events are kept: once the file holds twice that many (told by
+    the sequence numbers of its first and last lines, so publishing never reads the whole
+    file), the oldest are dropped in one rewrite. Readers resume from the last sequence number
+    they handled; subscribe() delivers events published in this process, follow()
+    also picks up events written by other processes.
+    """
+    def __init__(self, filename: str, max_events: int = 10000):
+        super().__init__(filename)  # numbering and trimming are shared with other processes
+        self.max_events = max_events
+        self.subscribers: List[Tuple[Callable[[ChangeEvent], None], Optional[str], Optional[str]]] = []
+
+    @property
+    def last_sequence(self) -> int:
+        line = self.last_line()
+        return json.loads(line)['sequence'] if line else 0
+
+    def read(self, since: int = 0, service: Optional[str] = None, environment: Optional[str] = None) -> List[ChangeEvent]:
+        """Events after sequence number since, optionally only those concerning one service/environment."""
+        events = [ChangeEvent.from_dict(json.loads(line)) for line in self.lines()]
+        if events and since < events[0].sequence - 1:
+            raise FeedGapError(since, events[0].sequence)
+        return [event for event in events if event.sequence > since and event.matches(service, environment)]
+
+    def publish(self, events: List[ChangeEvent]):
+        """Number, persist and deliver events, in order."""
+        if not events:
+            return
+        with self.lock:
+            sequence = self.last_sequence
+            timestamp = datetime.now(UTC).isoformat()
+            for event in events:
+                sequence += 1
+                event.sequence = sequence
+                event.timestamp = event.timestamp or timestamp
+            self.append([(json.dumps(event.to_dict()) + '\n').encode('utf-8') for event in events])
+            if sequence - json.loads(self.first_line())['sequence'] + 1 >= 2 * self.max_events:
+                self.trim()
+        metrics.count('change_events', len(events))
+        for callback, service, environment in list(self.subscribers):
+            for event in events:
+                if event.matches(service, environment):
+                    callback(event)
+
+    def trim(self):
+        with self.lock:
+            self.rewrite(list(self.lines())[-self.max_events:])
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None], since: Optional[int] = None,
+                  service: Optional[str] = None, environment: Optional[str] = None):
+        """
+        Call callback(event) for every matching event published from now on. With since,
+        matching events after that sequence number are replayed first. Returns a token for unsubscribe().
+        """
+        if since is not None:
+            for event in self.read(since, service, environment):
+                callback(event)
+        subscriber = (callback, service, environment)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.remove(subscriber)
+
+    def follow(self, since: Optional[int] = None, service: Optional[str] = None, environment: Optional[str] = None,
+               poll_interval: float = 0.5, timeout: Optional[float] = None) -> Iterator[ChangeEvent]:
+        """
+        Yield matching events after since (default: only new ones) as any process publishes them.
+        Stops after timeout seconds without a new event, or never when timeout is None.
+        """
+        if since is None:
+            since = self.last_sequence
+        else:
+            self.read(since)  # raises FeedGapError if events were trimmed
+        position = None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # After a trim the whole file is read again; what was delivered is skipped by sequence number
+            lines, position, _ = self.read_since(position)
+            events = [ChangeEvent.from_dict(json.loads(line)) for line in lines]
+            delivered = False
+            for event in events:
+                if event.sequence > since:
+                    since = event.sequence
+                    if event.matches(service, environment):
+                        delivered = True
+                        yield event
+            if delivered and timeout is not None:
+                deadline = time.monotonic() + timeout
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(poll_interval)
@@ -1,92 +1,322 @@
 import sys
 import os
-import shlex
+import json
 try:
     # Try absolute imports for package/module execution
-    from app_config_service.storage import FileStorage
+    from app_config_service.storage import (SQLiteStorage, create_storage, resolve_path, convert_json_to_binary,
+                                            convert_binary_to_json, file_signature, store_files, backend_for_path)
     from app_config_service.config_manager import ConfigManager
+    from app_config_service.changes import ChangeFeed, feed_path
+    from app_config_service.key_index import index_storage, key_index_path, match_postings, read_key_postings, write_key_index
+    from app_config_service.diff import DiffEngine
+    from app_config_service.commands import CHANGE_COMMANDS, apply_command, split_command
+    from app_config_service.locking import ConflictError
+    from app_config_service.history import VersionHistory, history_path, resolve_state
+    from app_config_service.bulk import import_records, read_records, export_records, open_text, compression_for
 except ImportError:
     # Fallback to relative imports for direct script execution
-    from storage import FileStorage
+    from storage import (SQLiteStorage, create_storage, resolve_path, convert_json_to_binary,
+                         convert_binary_to_json, file_signature, store_files, backend_for_path)
     from config_manager import ConfigManager
-import typer
-import json
-from typing import Optional
+    from changes import ChangeFeed, feed_path
+    from key_index import index_storage, key_index_path, match_postings, read_key_postings, write_key_index
+    from diff import DiffEngine
+    from commands import CHANGE_COMMANDS, apply_command, split_command
+    from locking import ConflictError
+    from history import VersionHistory, history_path, resolve_state
+    from bulk import import_records, read_records, export_records, open_text, compression_for
+from typing import List, Optional
 # from app_config_service.storage import InMemoryStorage
 
-app = typer.Typer()
 # storage = InMemoryStorage()
-storage = FileStorage("config/config_data.json")  # Now saves in config folder
-manager = ConfigManager(storage)
+# Storage and manager are built on first use so --help and unrelated commands never load the store
+_storage = None
+_manager = None
+
+def open_storage():
+    # APP_CONFIG_STORAGE selects the backend ("file", "journal", "sharded", "sqlite" or "binary") and APP_CONFIG_PATH
+    # overrides its location; by default every backend saves in the config folder
+    return create_storage(os.environ.get("APP_CONFIG_STORAGE", "file"), os.environ.get("APP_CONFIG_PATH"))
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = open_storage()
+    return _storage
+
+def get_manager():
+    global _manager
+    if _manager is None:
+        # Every change made through the CLI is recorded in the store's change feed for `watch`, and, unless
+        # APP_CONFIG_HISTORY=off, in its version history for `history`, `show --version` and `rollback`.
+        # APP_CONFIG_HISTORY_VERSIONS sets how many versions of each service are kept (0 keeps all)
+        history = None
+        if os.environ.get("APP_CONFIG_HISTORY", "on").lower() not in ("off", "0", "false"):
+            retention = int(os.environ.get("APP_CONFIG_HISTORY_VERSIONS", "100")) or None
+            history = VersionHistory(history_path(get_storage()), retention)
+        _manager = ConfigManager(get_storage(), feed=ChangeFeed(feed_path(get_storage())), history=history)
+    return _manager
+
+def get_history():
+    history = get_manager().history
+    if history is None:
+        raise ValueError("Version history is not enabled (APP_CONFIG_HISTORY=off).")
+    return history
+
+def run_fast_path(args) -> bool:
+    """
+    Answer the most frequent read-only commands without importing typer.
+    Returns False (and does nothing) for anything else, including options and misses,
+    so typer keeps handling help, errors and colored output.
+    """
+    if any(arg.startswith('-') for arg in args):
+        return False
+    if len(args) == 3 and args[0] == 'get-config':
+        config_json = get_manager().get_config_json(args[1], args[2])
+        if config_json is None:
+            return False
+        print(config_json)
+        return True
+    if args == ['list-services']:
+        services = get_storage().list_services()
+        if not services:
+            return False
+        print("\n".join(services))
+        return True
+    return False
+
+if __name__ == "__main__" and len(sys.argv) > 1 and run_fast_path(sys.argv[1:]):
+    sys.exit(0)
+
+import typer
+import time
+try:
+    from app_config_service.instrumentation import metrics
+except ImportError:
+    from instrumentation import metrics
+
+app = typer.Typer()
+
+@app.callback()
+def main(ctx: typer.Context,
+         profile: bool = typer.Option(False, "--profile", help="Print a timing breakdown (load, deserialize, validate, ...) after the command"),
+         cprofile: Optional[str] = typer.Option(None, "--cprofile", help="Write cProfile stats for the command to this file")):
+    """Manage service configurations per environment."""
+    if profile:
+        metrics.enabled = True
+        started = time.perf_counter()
+        ctx.call_on_close(lambda: typer.echo(metrics.report(time.perf_counter() - started), err=True))
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def dump_profile():
+            profiler.disable()
+            profiler.dump_stats(cprofile)
+            typer.echo(f"cProfile stats written to '{cprofile}' (view with: python -m pstats {cprofile})", err=True)
+        ctx.call_on_close(dump_profile)
+
+def print_repl_help():
+    print("Available commands:")
+    print("  add-service <service_name>")
+    print("  set-base <service_name> <json_config>")
+    print("  set-env <service_name> <environment> <json_config>")
+    print("  remove-key <service_name> <key>")
+    print("  get-config <service_name> <environment>")
+    print("  describe-service <service_name>")
+    print("  delete-service <service_name>")
+    print("  print-service-json <service_name>   # Export a service's config to a JSON file")
+    print("  list-services")
+    print("  begin / commit / rollback           # Group changes and save them once")
+    print("  clear")
+    print("  exit")
+
+def run_repl_command(parts) -> bool:
+    """Run one of the REPL commands that only read or print; False if parts is not one of them."""
+    command = parts[0]
+    if command == "get-config" and len(parts) == 3:
+        get_config(parts[1], parts[2])
+    elif command == "describe-service" and len(parts) == 2:
+        describe_service(parts[1])
+    elif command == "print-service-json" and len(parts) == 2:
+        print_service_json(parts[1])
+    elif command == "list-services" and len(parts) == 1:
+        list_services()
+    elif command == "list-services":
+        print("'list-services' does not take any arguments. Type 'help' for usage.")
+    elif command == "help":
+        print_repl_help()
+    else:
+        return False
+    return True
 
 def interactive_cli():
     print("Welcome to config CLI!")
     print("Type 'help' to see available commands. Type 'exit' to quit.")
     while True:
         try:
-            cmd = input("config> ").strip()
+            in_transaction = _manager is not None and _manager.current_transaction is not None
+            cmd = input("config(tx)> " if in_transaction else "config> ").strip()
             if not cmd:
                 continue
             if cmd.lower() in ("exit", "quit"):
+                if in_transaction:
+                    get_manager().rollback()
+                    print("Uncommitted changes discarded.")
                 print("Goodbye!")
                 break
-            if cmd.lower() == "help":
-                print("Available commands:")
-                print("  add-service <service_name>")
-                print("  set-base <service_name> <json_config>")
-                print("  set-env <service_name> <environment> <json_config>")
-                print("  get-config <service_name> <environment>")
-                print("  describe-service <service_name>")
-                print("  delete-service <service_name>")
-                print("  print-service-json <service_name>   # Export a service's config to a JSON file")
-                print("  list-services")
-                print("  clear")
-                print("  exit")
-                continue
             if cmd.lower() == "clear":
                 # Clear the terminal screen (Windows: cls, others: clear)
                 os.system('cls' if os.name == 'nt' else 'clear')
                 continue
-            # Use shlex.split to handle quoted arguments
-            parts = shlex.split(cmd)
+            # Shell-style words; the JSON of set-base/set-env is taken as typed
+            parts = split_command(cmd)
             # To debug command parsing, uncomment the next line:
             # print(f"[DEBUG] Parsed parts: {parts}")  # Uncomment for troubleshooting
             if not parts:
                 continue
             command = parts[0]
-            if command == "add-service" and len(parts) == 2:
+            if command == "begin" and len(parts) == 1:
+                get_manager().begin()
+                print("Transaction started; changes are saved on 'commit'.")
+            elif command == "commit" and len(parts) == 1:
+                get_manager().commit()
+                print("Changes committed.")
+            elif command == "rollback" and len(parts) == 1:
+                get_manager().rollback()
+                print("Changes rolled back.")
+            elif command == "add-service" and len(parts) == 2:
                 add_service(parts[1])
             elif command == "set-base" and len(parts) >= 3:
-                # Join all after the service name as JSON
                 set_base(parts[1], ' '.join(parts[2:]))
             elif command == "set-env" and len(parts) >= 4:
-                # Join all after the environment as JSON
                 set_env(parts[1], parts[2], ' '.join(parts[3:]))
-            elif command == "get-config" and len(parts) == 3:
-                get_config(parts[1], parts[2])
-            elif command == "describe-service" and len(parts) == 2:
-                describe_service(parts[1])
+            elif command == "remove-key" and len(parts) == 3:
+                if get_manager().remove_key_from_base(parts[1], parts[2], indexed_environments(parts[1], parts[2])):
+                    print(f"Key '{parts[2]}' removed from '{parts[1]}'.")
+                elif get_storage().get_service(parts[1]) is None:
+                    print(f"Service '{parts[1]}' not found.")
+                else:
+                    print(f"Key '{parts[2]}' not found in the base config of '{parts[1]}'.")
             elif command == "delete-service" and len(parts) == 2:
-                delete_service(parts[1])
-            elif command == "print-service-json" and len(parts) == 2:
-                print_service_json(parts[1])
-            elif command == "list-services" and len(parts) == 1:
-                list_services()
-            elif command == "list-services":
-                print("'list-services' does not take any arguments. Type 'help' for usage.")
-            else:
+                if in_transaction:
+                    print("Commit or roll back the open transaction before deleting a service.")
+                else:
+                    delete_service(parts[1])
+            elif not run_repl_command(parts):
                 print("Unknown or malformed command. Type 'help' for usage.")
         except (KeyboardInterrupt, EOFError):
+            if _manager is not None and _manager.current_transaction is not None:
+                _manager.rollback()
+                print("\nUncommitted changes discarded.", end="")
             print("\nGoodbye!")
             break
         except Exception as e:
             print(f"Error: {e}")
 
+def run_script(lines) -> int:
+    """
+    Run REPL commands from a script or piped stdin; returns the number of failed lines.
+
+    Changes are not saved one by one: everything is staged in a transaction that is
+    saved once at the end, or at each `commit` line. `rollback` drops the changes since
+    the last `commit` or `begin`. A failed line is reported and skipped. If another
+    process changed one of the services before a commit, that block of changes is
+    replayed on top of the new state; if the replay fails, every line of the block is
+    reported and counted as failed.
+    """
+    manager = get_manager()
+    started = time.perf_counter()
+    line_count = saved = errors = commits = 0
+    save_seconds = 0.0
+    block = []  # changes since the last commit, to replay after a lost write race
+
+    def replay():
+        for _, parts in block:
+            apply_command(get_manager(), parts, indexed_environments)
+
+    def commit():
+        nonlocal saved, commits, errors, save_seconds
+        saving = time.perf_counter()
+        try:
+            if block:
+                try:
+                    manager.commit()
+                except ConflictError:
+                    manager.run_transaction(replay)
+                saved += len(block)
+                commits += 1
+            else:
+                manager.rollback()  # only failed lines since the last commit
+        except Exception as e:
+            # None of the block was saved
+            errors += len(block)
+            for line_no, _ in block:
+                print(f"Line {line_no} skipped: {e}")
+        finally:
+            save_seconds += time.perf_counter() - saving
+            block.clear()
+
+    manager.begin()
+    try:
+        for line_count, line in enumerate(lines, 1):
+            try:
+                parts = split_command(line, comments=True)
+                if not parts:
+                    continue
+                command = parts[0]
+                if command in ("exit", "quit"):
+                    break
+                if command == "commit" or command == "begin":
+                    # begin only marks where the next rollback returns to
+                    commit()
+                    manager.begin()
+                elif command == "rollback":
+                    manager.rollback()
+                    block.clear()
+                    manager.begin()
+                elif command == "delete-service" and len(parts) == 2:
+                    # Deletes are saved right away, so everything before them is committed first
+                    commit()
+                    delete_service(parts[1])
+                    manager.begin()
+                elif command in CHANGE_COMMANDS:
+                    apply_command(get_manager(), parts, indexed_environments)
+                    block.append((line_count, parts))
+                elif command != "clear" and not run_repl_command(parts):
+                    raise ValueError("Unknown or malformed command.")
+            except json.JSONDecodeError:
+                errors += 1
+                print(f"Line {line_count} skipped: invalid JSON.")
+            except Exception as e:
+                errors += 1
+                print(f"Line {line_count} skipped: {e}")
+                if manager.current_transaction is None:
+                    manager.begin()  # keep staging if the failure ended the transaction
+        commit()
+    except BaseException:
+        # Interrupted: nothing after the last commit is saved
+        if manager.current_transaction is not None:
+            manager.rollback()
+        raise
+    elapsed = time.perf_counter() - started
+    print(f"Script done: {line_count} line(s), {saved} change(s) saved in {commits} commit(s), "
+          f"{errors} error(s) in {elapsed:.2f}s ({line_count / elapsed if elapsed else 0:.0f} lines/s, "
+          f"{save_seconds:.2f}s saving).")
+    return errors
+
+def run_script_file(path: str) -> int:
+    if path == '-':
+        return run_script(sys.stdin)
+    with open(path, "r", encoding="utf-8") as f:
+        return run_script(f)
+
 @app.command()
 def add_service(service_name: str):
     """Add a new service."""
     try:
-        manager.set_base_config(service_name, {})
+        get_manager().set_base_config(service_name, {})
         typer.echo(f"Service '{service_name}' added.")
     except Exception as e:
         typer.secho(f"Error: {e}", fg=typer.colors.RED)
@@ -96,7 +326,7 @@ def set_base(service_name: str, config_json: str):
     """Set or update base configuration for a service. config_json should be a JSON string."""
     try:
         config_data = json.loads(config_json)
-        manager.set_base_config(service_name, config_data)
+        get_manager().set_base_config(service_name, config_data)
         typer.echo(f"Base configuration for '{service_name}' set/updated.")
     except json.JSONDecodeError:
         typer.secho("Invalid JSON format for config_json.", fg=typer.colors.RED)
@@ -108,7 +338,7 @@ def set_env(service_name: str, environment: str, config_json: str):
     """Set or update environment-specific configuration. config_json should be a JSON string."""
     try:
         config_data = json.loads(config_json)
-        manager.set_env_config(service_name, environment, config_data)
+        get_manager().set_env_config(service_name, environment, config_data)
         typer.echo(f"Configuration for '{service_name}' in '{environment}' set/updated.")
     except json.JSONDecodeError:
         typer.secho("Invalid JSON format for config_json.", fg=typer.colors.RED)
@@ -119,9 +349,9 @@ def set_env(service_name: str, environment: str, config_json: str):
 def get_config(service_name: str, environment: str):
     """Get configuration for a service in a specific environment."""
     try:
-        entry = manager.get_config(service_name, environment)
-        if entry:
-            typer.echo(json.dumps(entry.config_data, indent=2))
+        config_json = get_manager().get_config_json(service_name, environment)
+        if config_json is not None:
+            typer.echo(config_json)
         else:
             typer.secho("No configuration found.", fg=typer.colors.YELLOW)
     except Exception as e:
@@ -131,7 +361,7 @@ def get_config(service_name: str, environment: str):
 def list_services():
     """List all services."""
     try:
-        services = storage.list_services()
+        services = get_storage().list_services()
         typer.echo("\n".join(services) if services else "No services found.")
     except Exception as e:
         typer.secho(f"Error: {e}", fg=typer.colors.RED)
@@ -140,7 +370,7 @@ def list_services():
 def describe_service(service_name: str):
     """Show the full configuration (all environments) for a service."""
     try:
-        service = storage.get_service(service_name)
+        service = get_storage().get_service(service_name)
         if not service:
             typer.secho(f"Service '{service_name}' not found.", fg=typer.colors.YELLOW)
             return
@@ -152,20 +382,305 @@ def describe_service(service_name: str):
 def delete_service(service_name: str):
     """Delete a service and all its configurations."""
     try:
-        if hasattr(storage, 'services') and service_name in storage.services:
-            del storage.services[service_name]
-            if hasattr(storage, 'save'):
-                storage.save()
+        if get_manager().delete_service(service_name):
             typer.echo(f"Service '{service_name}' deleted.")
         else:
             typer.secho(f"Service '{service_name}' not found.", fg=typer.colors.YELLOW)
     except Exception as e:
         typer.secho(f"Error: {e}", fg=typer.colors.RED)
 
+@app.command()
+def batch(batch_file: str = typer.Argument(..., help="File of commands to apply, or '-' for stdin")):
+    """Apply add-service/set-base/set-env/remove-key lines from a file as one transaction, saving once."""
+    line_no = 0
+    try:
+        commands = []
+        with (sys.stdin if batch_file == '-' else open(batch_file, "r", encoding="utf-8")) as f:
+            for line_no, line in enumerate(f, 1):
+                commands.append((line_no, split_command(line, comments=True)))
+        total = line_no
+
+        def apply_all():
+            nonlocal line_no
+            for line_no, parts in commands:
+                if parts:
+                    apply_command(get_manager(), parts, indexed_environments)
+        # Replayed from the first line if another process changed one of the services meanwhile
+        get_manager().run_transaction(apply_all)
+        typer.echo(f"Batch applied: {total} line(s) committed.")
+    except OSError as e:
+        typer.secho(f"Error reading batch file: {e}", fg=typer.colors.RED)
+    except json.JSONDecodeError:
+        typer.secho(f"Invalid JSON on line {line_no}; no changes were saved.", fg=typer.colors.RED)
+    except Exception as e:
+        typer.secho(f"Error on line {line_no}: {e}; no changes were saved.", fg=typer.colors.RED)
+
+@app.command("import")
+def import_config(path: str = typer.Argument(..., help="NDJSON file ('-' for stdin) or a directory of print-service-json files"),
+                  chunk_size: int = typer.Option(1000, help="Records applied per commit")):
+    """Bulk import configs. NDJSON lines look like {"service": ..., "environment": ..., "config": {...}}."""
+    try:
+        # print-service-json writes next to the store, so its own files are never read as exports
+        report = import_records(get_manager(), read_records(path, store_files(get_storage())), chunk_size)
+        typer.echo(f"Imported {report.applied} record(s) in {report.elapsed:.2f}s "
+                   f"({report.records_per_second:.0f} records/s, {report.chunks} commit(s)).")
+        if report.rejected:
+            typer.secho(f"{len(report.rejected)} record(s) rejected:", fg=typer.colors.YELLOW)
+            for source, error in report.rejected:
+                typer.echo(f"  {source}: {error}")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command("export")
+def export_config(path: str = typer.Argument("-", help="Output file, or '-' for stdout"),
+                  format: str = typer.Option("ndjson", help="ndjson (import-compatible records) or json"),
+                  compress: Optional[str] = typer.Option(None, help="none, gzip or zstd (default: from the file suffix)"),
+                  prefix: Optional[str] = typer.Option(None, help="Only services whose name starts with this"),
+                  environment: Optional[str] = typer.Option(None, help="Only this environment"),
+                  resolved: bool = typer.Option(False, help="Write resolved configs instead of environment overrides")):
+    """Stream every service to a file or stdout without loading the whole store at once."""
+    try:
+        out = open_text(path, "w", compress or compression_for(path))
+        try:
+            count = export_records(get_storage(), out, format, prefix, environment, resolved)
+        finally:
+            if out is sys.stdout:
+                out.flush()
+            else:
+                out.close()
+        if path != '-':
+            typer.echo(f"Exported {count} service(s) to '{path}'.")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED, err=True)
+
+@app.command()
+def migrate_sqlite(json_file: Optional[str] = typer.Option(None, help="JSON store to import (default: config/config_data.json)"),
+                   db_file: Optional[str] = typer.Option(None, help="SQLite database to write (default: config/config_data.db)")):
+    """Import an existing JSON config store into a SQLite database."""
+    try:
+        source = resolve_path(json_file, os.path.join('config', 'config_data.json'))
+        target = SQLiteStorage(db_file)
+        count = target.import_json(source)
+        target.close()
+        typer.echo(f"Imported {count} service(s) from '{source}' into '{target.filename}'.")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def convert_to_binary(json_file: Optional[str] = typer.Option(None, help="JSON store to read (default: config/config_data.json)"),
+                      binary_file: Optional[str] = typer.Option(None, help="Snapshot to write (default: config/config_data.bin)")):
+    """Convert a JSON config store into a binary snapshot for fast loading."""
+    try:
+        source = resolve_path(json_file, os.path.join('config', 'config_data.json'))
+        target = resolve_path(binary_file, os.path.join('config', 'config_data.bin'))
+        if not os.path.exists(source):
+            raise ValueError(f"'{source}' does not exist.")
+        count = convert_json_to_binary(source, target)
+        typer.echo(f"Wrote {count} service(s) from '{source}' to '{target}'.")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def convert_to_json(binary_file: Optional[str] = typer.Option(None, help="Snapshot to read (default: config/config_data.bin)"),
+                    json_file: Optional[str] = typer.Option(None, help="JSON store to write (default: config/config_data.json)")):
+    """Convert a binary snapshot back into a JSON config store."""
+    try:
+        source = resolve_path(binary_file, os.path.join('config', 'config_data.bin'))
+        target = resolve_path(json_file, os.path.join('config', 'config_data.json'))
+        count = convert_binary_to_json(source, target)
+        typer.echo(f"Wrote {count} service(s) from '{source}' to '{target}'.")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def watch(service_name: str,
+          environment: Optional[str] = typer.Argument(None, help="Only changes affecting this environment (base changes included)"),
+          since: Optional[int] = typer.Option(None, help="Replay changes after this sequence number first (default: only new changes)"),
+          poll_interval: float = typer.Option(0.5, help="Seconds between checks of the change feed")):
+    """Print each change to a service as one JSON line, as it is committed by any process."""
+    try:
+        feed = get_manager().feed
+        for event in feed.follow(since, service_name, environment, poll_interval):
+            typer.echo(json.dumps(event.to_dict()))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED, err=True)
+
+def query_store(key, filters, environment=None):
+    """
+    Query the key index sidecar next to the store, reading only this key's postings.
+    If the store changed since the sidecar was written, it is rebuilt with one pass first.
+    """
+    storage = get_storage()
+    path = key_index_path(storage)
+    signature = file_signature(store_files(storage))
+    postings = read_key_postings(path, key, signature)
+    if postings is not None:
+        return match_postings(postings, filters, environment)
+    # Index a store opened after taking the signature, so the sidecar never claims newer contents than it holds
+    fresh = open_storage()
+    index = index_storage(fresh, values=False)
+    if hasattr(fresh, 'close'):
+        fresh.close()
+    write_key_index(path, index, signature)
+    return index.query(key, filters, environment)
+
+def indexed_environments(service_name, key):
+    """Environments of a service storing key per the key index sidecar, or None if it is missing or stale."""
+    storage = get_storage()
+    postings = read_key_postings(key_index_path(storage), key, file_signature(store_files(storage)))
+    return None if postings is None else list(postings.get(service_name, {}))
+
+def parse_filter_value(text):
+    # JSON literals (numbers, true, null, quoted strings) as such; anything else is a plain string
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+@app.command()
+def query(key: str,
+          eq: Optional[str] = typer.Option(None, help="Only values equal to this (JSON literal or plain string)"),
+          ne: Optional[str] = typer.Option(None, help="Only values different from this"),
+          gt: Optional[float] = typer.Option(None, help="Only numbers greater than this"),
+          ge: Optional[float] = typer.Option(None, help="Only numbers greater than or equal to this"),
+          lt: Optional[float] = typer.Option(None, help="Only numbers less than this"),
+          le: Optional[float] = typer.Option(None, help="Only numbers less than or equal to this"),
+          env: Optional[str] = typer.Option(None, help="Match each service's resolved value in this environment")):
+    """List every service environment storing a key (tab-separated: service, environment, value), optionally filtered."""
+    try:
+        filters = [(op, parse_filter_value(value)) for op, value in (('=', eq), ('!=', ne)) if value is not None]
+        filters += [(op, value) for op, value in (('>', gt), ('>=', ge), ('<', lt), ('<=', le)) if value is not None]
+        matches = query_store(key, filters, env)
+        for service, environment, value in matches:
+            typer.echo(f"{service}\t{environment}\t{json.dumps(value)}")
+        if not matches:
+            typer.secho("No matches.", fg=typer.colors.YELLOW)
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def diff(left_env: Optional[str] = typer.Argument(None, help="Environment on the left, e.g. staging (default: every environment)"),
+         right_env: Optional[str] = typer.Argument(None, help="Environment on the right, e.g. production (default: same as left)"),
+         service: Optional[str] = typer.Option(None, help="Only this service (default: every service, in one pass)"),
+         other_service: Optional[str] = typer.Option(None, help="Read the right side from this service (needs --service)"),
+         other_store: Optional[str] = typer.Option(None, help="Read the right side from this store, e.g. a backup (.json, .bin, .db or a shard folder)"),
+         version: Optional[List[int]] = typer.Option(None, help="Compare recorded versions of --service: N with the latest, or N with M (--version N --version M)"),
+         json_output: bool = typer.Option(False, "--json", help="Print each diff as one JSON object per line")):
+    """Show added, removed and changed keys between resolved configs of environments, services, stores or versions."""
+    try:
+        engine = DiffEngine()
+        storage = get_storage()
+        if version:
+            if service is None or len(version) > 2 or right_env is not None:
+                raise ValueError("--version needs --service, at most two versions and at most one environment.")
+            diffs = get_history().diff(service, *version, environment=left_env)
+            engine.compared = len(diffs)
+        elif other_service is not None:
+            if service is None or left_env is None:
+                raise ValueError("--other-service needs --service and an environment.")
+            diffs = [engine.diff_services(storage.get_service(service), left_env, storage.get_service(other_service),
+                                          right_env or left_env, service, other_service)]
+        elif other_store is not None:
+            other = create_storage(backend_for_path(other_store), other_store)
+            diffs = engine.diff_stores(storage, other, left_env, right_env, [service] if service else None)
+        elif left_env is None or right_env in (None, left_env):
+            raise ValueError("Give two different environments, --other-service or --other-store.")
+        else:
+            diffs = engine.diff_environments(storage, left_env, right_env, [service] if service else None)
+        differing = 0
+        for config_diff in diffs:
+            if config_diff.identical:
+                continue
+            differing += 1
+            typer.echo(json.dumps(config_diff.to_dict()) if json_output else config_diff.format())
+        if not json_output:
+            typer.secho(f"{differing} differing config(s); {engine.compared} compared key by key, "
+                        f"{engine.skipped} skipped as identical.", fg=typer.colors.GREEN if not differing else None)
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def history(service_name: str,
+            environment: Optional[str] = typer.Option(None, "--env", help="Only versions that changed this environment"),
+            limit: Optional[int] = typer.Option(None, help="Only the latest N versions")):
+    """List a service's recorded versions (tab-separated: version, timestamp, changed keys per environment)."""
+    try:
+        records = [record for record in get_history().read(service_name)
+                   if environment is None or environment in record.changes]
+        if not records:
+            typer.secho(f"No history for '{service_name}'.", fg=typer.colors.YELLOW)
+            return
+        for record in records[-limit if limit else 0:]:
+            changed = "; ".join(f"{env}: {', '.join(keys)}" if record.changes[env] is not None else f"{env}: removed"
+                                for env, keys in record.keys().items())
+            typer.echo(f"{record.version}\t{record.timestamp}\t{changed}")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def show(service_name: str,
+         environment: Optional[str] = typer.Argument(None, help="Only this environment, resolved (default: every environment)"),
+         version: Optional[int] = typer.Option(None, help="Show the configs as they were at this version (see `history`)")):
+    """Show a service's resolved configs, now or at an earlier version."""
+    try:
+        if version is None:
+            service = get_storage().get_service(service_name)
+            state = {env: entry.overrides for env, entry in service.configurations.items()} if service else None
+        else:
+            state = get_history().state_at(service_name, version)
+        if state is None:
+            typer.secho(f"Version {version} of '{service_name}' is not in the history." if version is not None
+                        else f"Service '{service_name}' not found.", fg=typer.colors.YELLOW)
+            return
+        if environment is not None:
+            config = resolve_state(state, environment)
+            if config is None:
+                typer.secho("No configuration found.", fg=typer.colors.YELLOW)
+                return
+            typer.echo(json.dumps(config, indent=2))
+        else:
+            typer.echo(json.dumps({env: resolve_state(state, env) for env in state}, indent=2))
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def rollback(service_name: str,
+             version: int = typer.Option(..., help="Version to restore (see `history`)")):
+    """Restore a service's configs to an earlier version, committed as a new version."""
+    try:
+        manager = get_manager()
+        manager.restore_version(service_name, version)
+        typer.echo(f"'{service_name}' restored to version {version} "
+                   f"(now version {manager.storage.get_service(service_name).version}).")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
+@app.command()
+def serve(host: str = typer.Option("127.0.0.1", help="Address to listen on"),
+          port: int = typer.Option(8080, help="Port to listen on"),
+          reload_interval: float = typer.Option(1.0, help="Seconds between checks for changes made by other processes")):
+    """Serve configs over HTTP: GET /services/{name}/{env}, and /poll?version=N to wait for a change."""
+    import asyncio
+    try:
+        from app_config_service.server import ConfigServer
+    except ImportError:
+        from server import ConfigServer
+    try:
+        server = ConfigServer(open_storage, reload_interval)
+        typer.echo(f"Serving configs on http://{host}:{port} (Ctrl+C to stop)")
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        typer.echo("Server stopped.")
+    except Exception as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+
 def print_service_json(service_name: str):
     """Export a service's config to a JSON file in the config folder and print a confirmation message."""
     try:
-        service = storage.get_service(service_name)
+        service = get_storage().get_service(service_name)
         if not service:
             print(f"Service '{service_name}' not found.")
             return
@@ -185,7 +700,15 @@ def print_service_json(service_name: str):
 # Entry point for the CLI
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) == 1:
+    if "--script" in sys.argv[1:]:
+        if len(sys.argv) != 3 or sys.argv[1] != "--script":
+            print("Usage: --script <file> (or '-' for stdin), with no other arguments.", file=sys.stderr)
+            sys.exit(2)
+        sys.exit(1 if run_script_file(sys.argv[2]) else 0)
+    elif len(sys.argv) == 1 and not sys.stdin.isatty():
+        # Commands piped in: run them as a script
+        sys.exit(1 if run_script(sys.stdin) else 0)
+    elif len(sys.argv) == 1:
         interactive_cli()
     else:
         app()
@@ -0,0 +1,56 @@
+# Parsing and applying the change commands shared by `batch`, scripts and the interactive CLI
+
+from typing import Callable, List, Optional
+import json
+import shlex
+
+# Commands whose last argument is a JSON config, by the number of words before it
+JSON_COMMANDS = {'set-base': 2, 'set-env': 3}
+CHANGE_COMMANDS = ('add-service', 'set-base', 'set-env', 'remove-key')
+
+def split_command(line: str, comments: bool = False) -> List[str]:
+    """
+    Split a command line into words like a shell. The JSON config of set-base/set-env is the
+    rest of the line, so it can be typed as is ({"timeout": 30}) or shell-quoted ('{"timeout": 30}').
+    """
+    words = line.split(None, 1)
+    if not words or words[0] not in JSON_COMMANDS:
+        return shlex.split(line, comments=comments)
+    lexer = shlex.shlex(line, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    head = []
+    for _ in range(JSON_COMMANDS[words[0]]):
+        word = lexer.get_token()
+        if word is None:
+            return head
+        head.append(word)
+    rest = lexer.instream.read().strip()
+    if rest[:1] in ('"', "'"):
+        rest = ' '.join(shlex.split(rest, comments=comments))
+    elif comments and '#' in rest:
+        # A comment may follow the JSON (or stand in for it); a '#' inside its strings stays
+        try:
+            end = 0 if rest.startswith('#') else json.JSONDecoder().raw_decode(rest)[1]
+        except ValueError:
+            end = None
+        if end is not None and rest[end:].lstrip().startswith('#'):
+            rest = rest[:end]
+    return head + [rest] if rest else head
+
+def apply_command(manager, parts: List[str], environments_with: Optional[Callable[[str, str], Optional[List[str]]]] = None):
+    """
+    Apply one parsed change command to a manager; raises ValueError on malformed lines.
+    environments_with(service, key) may name the environments remove-key has to visit.
+    """
+    command = parts[0]
+    if command == "add-service" and len(parts) == 2:
+        manager.set_base_config(parts[1], {})
+    elif command == "set-base" and len(parts) >= 3:
+        manager.set_base_config(parts[1], json.loads(' '.join(parts[2:])))
+    elif command == "set-env" and len(parts) >= 4:
+        manager.set_env_config(parts[1], parts[2], json.loads(' '.join(parts[3:])))
+    elif command == "remove-key" and len(parts) == 3:
+        manager.remove_key_from_base(parts[1], parts[2], environments_with and environments_with(parts[1], parts[2]))
+    else:
+        raise ValueError(f"Unknown or malformed command: {' '.join(parts)}")
@@ -1,14 +1,167 @@
 # Core logic for managing configurations
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+from contextlib import contextmanager
+import json
+import random
+import threading
+import time
 # from app_config_service.storage import InMemoryStorage
-from app_config_service.storage import FileStorage
-from app_config_service.models import ConfigurationEntry
-from app_config_service.validation import validate_config_types
+from app_config_service.models import ConfigSnapshot, ConfigurationEntry, Service
+from app_config_service.cache import ResolvedConfigCache
+from app_config_service.instrumentation import metrics
+from app_config_service.changes import ChangeEvent, ChangeFeed, changed_keys
+from app_config_service.locking import ConflictError, ReadWriteLock
+from app_config_service.key_index import KeyIndex, Match, index_storage
+from app_config_service.history import VersionHistory, entry_changes
+
+class Transaction:
+    """Services touched since begin(), with the state needed to undo them."""
+    def __init__(self):
+        self.services: Dict[str, Service] = {}
+        self.snapshots: Dict[str, Optional[Dict[str, ConfigurationEntry]]] = {}  # None: created in this transaction
+        self.versions: Dict[str, Optional[int]] = {}  # version each service was read at, checked on save
 
 class ConfigManager:
-    def __init__(self, storage):  # Accept any storage type
+    def __init__(self, storage, cache_size: int = 1024, feed: Optional[ChangeFeed] = None, max_retries: int = 20,
+                 history: Optional[VersionHistory] = None):  # Accept any storage type
         self.storage = storage
+        self.current_transaction: Optional[Transaction] = None
+        self.cache = ResolvedConfigCache(cache_size)
+        self.feed = feed  # when set, every commit publishes a ChangeEvent per changed environment
+        self.max_retries = max_retries  # re-runs of an operation that lost a write race to another process
+        self.keys: Optional[KeyIndex] = None  # built by the first query, then kept up to date by commits
+        self.history = history  # when set, every commit records what each new service version changed
+
+    def _save(self, services, expected):
+        # Storages that can compare-and-swap write only these services, failing if another process changed them
+        if hasattr(self.storage, 'save_services'):
+            self.storage.save_services(list(services), expected)
+        # Storages that can persist a single service avoid rewriting the whole store
+        elif hasattr(self.storage, 'save_service'):
+            for service in services:
+                self.storage.save_service(service)
+        elif hasattr(self.storage, 'save'):
+            self.storage.save()
+
+    def begin(self):
+        """Start staging changes; nothing is saved until commit()."""
+        if self.current_transaction is not None:
+            raise ValueError('A transaction is already in progress.')
+        self.current_transaction = Transaction()
+
+    def commit(self):
+        """Save every service changed since begin() in one pass."""
+        tx = self.current_transaction
+        if tx is None:
+            raise ValueError('No transaction in progress.')
+        self.current_transaction = None
+        events, versions, changed = [], [], {}
+        for name, service in tx.services.items():
+            changes = changed_keys(tx.snapshots[name] or {}, service.configurations)
+            if not changes and tx.snapshots[name] is not None:
+                continue  # staged but left as it was: no new version
+            changed[name] = service
+            if self.feed is not None:
+                for env, keys in changes.items():
+                    events.append(ChangeEvent(name, env, keys, service.version, service.version + 1))
+            if self.history is not None:
+                versions.append((service, entry_changes(tx.snapshots[name] or {}, service.configurations)))
+            service.version += 1
+        try:
+            if changed:
+                self._save(changed.values(), {name: tx.versions[name] for name in changed})
+        except ConflictError:
+            for service in changed.values():
+                service.version -= 1
+            self._undo(tx)
+            self.keys = None  # the storage re-read services other processes changed
+            raise
+        if self.keys is not None:
+            for service in changed.values():
+                self.keys.update_service(service)
+        if self.history is not None:
+            self.history.record(versions)
+        if self.feed is not None:
+            self.feed.publish(events)
+
+    def rollback(self):
+        """Undo every change made since begin()."""
+        tx = self.current_transaction
+        if tx is None:
+            raise ValueError('No transaction in progress.')
+        self.current_transaction = None
+        self._undo(tx)
+
+    def _undo(self, tx: Transaction):
+        for name, snapshot in tx.snapshots.items():
+            if snapshot is None:
+                # Never saved, so dropping it from memory is enough (unless the storage already
+                # replaced it with another process's copy)
+                if self.storage.services.get(name) is tx.services[name]:
+                    self.storage.services.pop(name, None)
+                self.cache.invalidate(name)
+            else:
+                tx.services[name].configurations = snapshot
+                tx.services[name].schema = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group any number of changes into one all-or-nothing commit.
+        Nested use joins the outer transaction.
+        """
+        if self.current_transaction is not None:
+            yield self
+            return
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def run_transaction(self, operation: Callable[[], Any], retries: Optional[int] = None) -> Any:
+        """
+        Run operation() in a transaction and return its result. If another process changed
+        one of the services first (ConflictError), the changes are undone and operation()
+        runs again on the fresh state, up to retries times. Inside an outer transaction it
+        simply joins it and the outer commit decides.
+        """
+        if self.current_transaction is not None:
+            return operation()
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                with self.transaction():
+                    return operation()
+            except ConflictError:
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                metrics.count('conflict_retries')
+                # Randomized backoff so competing writers stop colliding in lockstep
+                time.sleep(random.uniform(0, 0.001 * 2 ** min(attempt, 6)))
+
+    def _stage(self, service_name: str) -> Service:
+        # Fetch (or create) a service and remember how to undo changes to it
+        tx = self.current_transaction
+        if service_name in tx.services:
+            return tx.services[service_name]
+        service = self.storage.get_service(service_name)
+        if service is None:
+            # Registered without saving; commit() persists it with the rest of the transaction
+            service = Service(service_name)
+            self.storage.services[service_name] = service
+            tx.snapshots[service_name] = None
+            tx.versions[service_name] = None
+        else:
+            tx.snapshots[service_name] = service.copy_configurations()
+            tx.versions[service_name] = service.version
+        tx.services[service_name] = service
+        return service
 
     def set_base_config(self, service_name: str, config_data: Dict[str, Any]):
         if not service_name or not service_name.strip():
@@ -17,29 +170,21 @@ class ConfigManager:
             raise ValueError('Service name cannot exceed 128 characters.')
         if not isinstance(config_data, dict):
             raise ValueError('Config data must be a dictionary.')
-        service = self.storage.add_service(service_name)
-        base_entry = service.get_configuration('base')
-        if base_entry:
-            validate_config_types(base_entry.config_data, config_data)
-            # Begin atomic update
-            old_data = base_entry.config_data.copy()
-            try:
+
+        def apply():
+            service = self._stage(service_name)
+            base_entry = service.get_configuration('base')
+            if base_entry:
+                schema = service.get_schema()
+                with metrics.timer('validate'):
+                    schema.validate(config_data, allow_unknown=True)
+                if any(key not in schema.types for key in config_data):
+                    service.schema = None
                 base_entry.update(config_data)
-            except Exception as e:
-                base_entry.config_data = old_data
-                raise e
-        else:
-            service.add_configuration('base', config_data)
-        # Propagate new keys to all environments
-        for env, entry in service.configurations.items():
-            if env == 'base':
-                continue
-            for key, value in config_data.items():
-                if key not in entry.config_data:
-                    entry.config_data[key] = value
-        # Ensure changes are saved
-        if hasattr(self.storage, 'save'):
-            self.storage.save()
+            else:
+                service.add_configuration('base', dict(config_data))
+            # Environments overlay base, so new keys reach them without copying
+        self.run_transaction(apply)
 
     def set_env_config(self, service_name: str, environment: str, config_data: Dict[str, Any]):
         if not service_name or not service_name.strip():
@@ -50,46 +195,62 @@ class ConfigManager:
             raise ValueError('Environment name cannot be empty.')
         if not isinstance(config_data, dict):
             raise ValueError('Config data must be a dictionary.')
-        service = self.storage.add_service(service_name)
-        base_entry = service.get_configuration('base')
-        if not base_entry:
-            raise ValueError('Base configuration must be set first.')
-        for key in config_data:
-            if key not in base_entry.config_data:
-                raise ValueError(f'Key {key} not defined in base configuration.')
-        validate_config_types(base_entry.config_data, config_data)
-        env_entry = service.get_configuration(environment)
-        if env_entry:
-            # Begin atomic update
-            old_data = env_entry.config_data.copy()
-            try:
+
+        def apply():
+            existing = self.storage.get_service(service_name)
+            if not existing or not existing.get_configuration('base'):
+                raise ValueError('Base configuration must be set first.')
+            service = self._stage(service_name)
+            # Reports unknown keys and every type mismatch at once
+            with metrics.timer('validate'):
+                service.get_schema().validate(config_data)
+            env_entry = service.get_configuration(environment)
+            if env_entry:
                 env_entry.update(config_data)
-            except Exception as e:
-                env_entry.config_data = old_data
-                raise e
-        else:
-            merged = base_entry.config_data.copy()
-            merged.update(config_data)
-            service.add_configuration(environment, merged)
-        # Ensure changes are saved
-        if hasattr(self.storage, 'save'):
-            self.storage.save()
+            else:
+                # Only the overrides are stored; everything else resolves from base
+                service.add_configuration(environment, dict(config_data))
+        self.run_transaction(apply)
+
+    def remove_key_from_base(self, service_name: str, key: str, environments: Optional[List[str]] = None) -> bool:
+        """
+        Remove a key from base and from every environment overriding it; returns False if the
+        service or its base has no such key. environments may list the service's environments
+        storing the key, as read from the key index sidecar of the store the service was loaded
+        from; it is only trusted on the first attempt, as a retry reloads.
+        """
+        hints = [environments]
+        def apply():
+            known, hints[0] = hints[0], None
+            service = self.storage.get_service(service_name)
+            if not service:
+                return False
+            base_entry = service.get_configuration('base')
+            if not base_entry or key not in base_entry.overrides:
+                return False
+            # The key index knows which environments store the key, as long as it indexed this very
+            # version and the service has no earlier uncommitted changes in this transaction
+            fresh = service_name not in self.current_transaction.services
+            if known is None and self.keys is not None and self.keys.versions.get(service_name) == service.version:
+                known = self.keys.environments_with(service_name, key)
+            self._stage(service_name)
+            # Remove from base and from any environment overriding it
+            with metrics.timer('propagate'):
+                for env in known if known is not None and fresh else list(service.configurations):
+                    service.configurations[env].overrides.pop(key, None)
+            service.schema = None
+            return True
+        return self.run_transaction(apply)
 
-    def remove_key_from_base(self, service_name: str, key: str):
+    def validate_env_configs(self, service_name: str, payloads):
+        """
+        Check many environment payloads against a service's base schema in one pass.
+        Returns (index, errors) for every rejected payload; raises if the service has no base.
+        """
         service = self.storage.get_service(service_name)
-        if not service:
-            return
-        base_entry = service.get_configuration('base')
-        if not base_entry or key not in base_entry.config_data:
-            return
-        del base_entry.config_data[key]
-        # Remove from all environments
-        for env, entry in service.configurations.items():
-            if key in entry.config_data:
-                del entry.config_data[key]
-        # Ensure changes are saved
-        if hasattr(self.storage, 'save'):
-            self.storage.save()
+        if not service or not service.get_configuration('base'):
+            raise ValueError('Base configuration must be set first.')
+        return service.get_schema().validate_many(payloads)
 
     def get_config(self, service_name: str, environment: str) -> Optional[ConfigurationEntry]:
         service = self.storage.get_service(service_name)
@@ -97,3 +258,190 @@ class ConfigManager:
             return None
         # Return environment config if exists, else base
         return service.get_configuration(environment) or service.get_configuration('base')
+
+    def get_config_json(self, service_name: str, environment: str) -> Optional[str]:
+        """Resolved config as an indented JSON string, served from the cache when the version is unchanged."""
+        service = self.storage.get_service(service_name)
+        if not service:
+            return None
+        tx = self.current_transaction
+        if tx is not None and service_name in tx.services:
+            # Uncommitted changes share the committed version number; never cache them
+            entry = service.get_configuration(environment) or service.get_configuration('base')
+            return json.dumps(entry.config_data, indent=2) if entry else None
+        key = (service_name, environment, service.version)
+        text = self.cache.get(key)
+        if text is None:
+            entry = service.get_configuration(environment) or service.get_configuration('base')
+            if not entry:
+                return None
+            with metrics.timer('serialize'):
+                text = json.dumps(entry.config_data, indent=2)
+            self.cache.put(key, text)
+        return text
+
+    def key_index(self) -> KeyIndex:
+        """Inverted key index over the whole store, built with one pass over storage on first use."""
+        if self.keys is None:
+            with metrics.timer('index'):
+                self.keys = index_storage(self.storage)
+        return self.keys
+
+    def query(self, key: str, filters: Iterable[Tuple[str, Any]] = (), environment: Optional[str] = None) -> List[Match]:
+        """
+        (service, environment, value) for every stored value of key passing all (operator, value)
+        filters; operators are = != > >= < <=. With environment, each service's resolved value
+        there is matched instead.
+        """
+        return self.key_index().query(key, filters, environment)
+
+    def restore_version(self, service_name: str, version: int):
+        """
+        Commit a new version of a service whose entries hold what they held at an earlier
+        version. Environments added since are removed; the history keeps every version.
+        """
+        if self.history is None:
+            raise ValueError('Version history is not enabled.')
+        state = self.history.state_at(service_name, version)
+        if state is None:
+            raise ValueError(f"Version {version} of '{service_name}' is not in the history.")
+
+        def apply():
+            service = self._stage(service_name)
+            restored = Service(service_name)
+            for env, overrides in state.items():
+                current = service.get_configuration(env)
+                restored.add_configuration(env, dict(overrides), current.created_raw if current else None)
+            service.configurations = restored.configurations
+            service.schema = None
+        self.run_transaction(apply)
+
+    def delete_service(self, service_name: str) -> bool:
+        self.cache.invalidate(service_name)
+        service = self.storage.get_service(service_name) if self.feed is not None else None
+        deleted = self.storage.delete_service(service_name)
+        if deleted and self.keys is not None:
+            self.keys.remove_service(service_name)
+        if deleted and self.history is not None:
+            self.history.forget(service_name)
+        if deleted and service is not None:
+            self.feed.publish([ChangeEvent(service_name, None, [], service.version, None)])
+        return deleted
+
+class ThreadSafeConfigManager(ConfigManager):
+    """
+    ConfigManager for applications that share one instance between threads.
+
+    get_config() returns immutable ConfigSnapshots. Each snapshot is built once per service
+    version and then handed to every reader without taking a lock. Writes are serialized and
+    each thread has its own transaction. A staged service is write-locked until its commit or
+    rollback, so readers never build a snapshot from a half-applied change. Until then they keep
+    getting the previous snapshot. Saving to storage excludes readers that are loading from it.
+    """
+    def __init__(self, storage, cache_size: int = 1024, feed: Optional[ChangeFeed] = None, max_retries: int = 20,
+                 history: Optional[VersionHistory] = None):
+        self.local = threading.local()  # per-thread transaction and the service locks it holds
+        super().__init__(storage, cache_size, feed, max_retries, history)
+        self.writer = threading.RLock()  # one transaction at a time
+        self.store_lock = ReadWriteLock()  # readers loading from storage vs. a commit writing to it
+        self.service_locks: Dict[str, ReadWriteLock] = {}
+        self.service_locks_guard = threading.Lock()
+        self.snapshots: Dict[str, Dict[str, ConfigSnapshot]] = {}  # service -> environment -> snapshot
+
+    @property
+    def current_transaction(self) -> Optional[Transaction]:
+        return getattr(self.local, 'transaction', None)
+
+    @current_transaction.setter
+    def current_transaction(self, tx: Optional[Transaction]):
+        self.local.transaction = tx
+
+    def _service_lock(self, service_name: str) -> ReadWriteLock:
+        lock = self.service_locks.get(service_name)
+        if lock is None:
+            with self.service_locks_guard:
+                lock = self.service_locks.setdefault(service_name, ReadWriteLock())
+        return lock
+
+    def begin(self):
+        self.writer.acquire()
+        try:
+            super().begin()
+        except BaseException:
+            self.writer.release()
+            raise
+        self.local.locked = []
+
+    def _stage(self, service_name: str) -> Service:
+        if service_name not in self.current_transaction.services:
+            lock = self._service_lock(service_name)
+            lock.acquire_write()
+            self.local.locked.append((service_name, lock))
+        return super()._stage(service_name)
+
+    def _finish(self):
+        # Drop the touched services' snapshots while their write locks are still held, then unlock
+        for service_name, lock in reversed(self.local.locked):
+            self.snapshots.pop(service_name, None)
+            lock.release_write()
+        self.local.locked = []
+        self.writer.release()
+
+    def commit(self):
+        if self.current_transaction is None:
+            raise ValueError('No transaction in progress.')
+        try:
+            with self.store_lock.write():
+                super().commit()
+        except ConflictError:
+            # The storage re-read what other processes wrote; snapshots of any service may be outdated
+            self.snapshots.clear()
+            raise
+        finally:
+            self._finish()
+
+    def rollback(self):
+        if self.current_transaction is None:
+            raise ValueError('No transaction in progress.')
+        try:
+            with self.store_lock.write():
+                super().rollback()
+        finally:
+            self._finish()
+
+    def get_config(self, service_name: str, environment: str) -> Optional[ConfigSnapshot]:
+        tx = self.current_transaction
+        if tx is not None and service_name in tx.services:
+            # This thread's own uncommitted changes; it already holds the write lock
+            entry = super().get_config(service_name, environment)
+            return ConfigSnapshot(service_name, entry, tx.services[service_name].version) if entry else None
+        snapshot = self.snapshots.get(service_name, {}).get(environment)
+        if snapshot is not None:
+            return snapshot
+        with self._service_lock(service_name).read(), self.store_lock.read():
+            service = self.storage.get_service(service_name)
+            entry = service and (service.get_configuration(environment) or service.get_configuration('base'))
+            if not entry:
+                return None
+            snapshot = ConfigSnapshot(service_name, entry, service.version)
+            self.snapshots.setdefault(service_name, {})[environment] = snapshot
+        return snapshot
+
+    def get_config_json(self, service_name: str, environment: str) -> Optional[str]:
+        snapshot = self.get_config(service_name, environment)
+        return snapshot.to_json() if snapshot else None
+
+    def validate_env_configs(self, service_name: str, payloads):
+        with self._service_lock(service_name).read(), self.store_lock.read():
+            return super().validate_env_configs(service_name, payloads)
+
+    def query(self, key: str, filters: Iterable[Tuple[str, Any]] = (), environment: Optional[str] = None) -> List[Match]:
+        # Commits update the key index while holding the store lock for writing
+        with self.store_lock.read():
+            return super().query(key, filters, environment)
+
+    def delete_service(self, service_name: str) -> bool:
+        lock = self._service_lock(service_name)
+        with self.writer, lock.write(), self.store_lock.write():
+            self.snapshots.pop(service_name, None)
+            return super().delete_service(service_name)
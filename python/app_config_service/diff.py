@@ -0,0 +1,176 @@
+# Structured diffs between resolved configs: two environments, two services or two stores
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+from app_config_service.models import ConfigurationEntry, Service
+from app_config_service.cache import ResolvedConfigCache
+from app_config_service.validation import type_code
+
+class ConfigDiff:
+    """
+    Key-level differences between a left and a right resolved config, each identified by
+    (service, environment). A side that does not exist counts as an empty config.
+    """
+    def __init__(self, left: Tuple[str, str], right: Tuple[str, str], added: Dict[str, Any],
+                 removed: Dict[str, Any], changed: Dict[str, Tuple[Any, Any]]):
+        self.left = left
+        self.right = right
+        self.added = added  # only on the right
+        self.removed = removed  # only on the left
+        self.changed = changed  # key -> (left value, right value)
+
+    @property
+    def identical(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def typed(value):
+            return {'value': value, 'type': type_code(value)}
+        return {
+            'left': {'service': self.left[0], 'environment': self.left[1]},
+            'right': {'service': self.right[0], 'environment': self.right[1]},
+            'added': {key: typed(value) for key, value in self.added.items()},
+            'removed': {key: typed(value) for key, value in self.removed.items()},
+            'changed': {key: {'old': old, 'old_type': type_code(old), 'new': new, 'new_type': type_code(new)}
+                        for key, (old, new) in self.changed.items()},
+        }
+
+    def format(self) -> str:
+        """Readable listing: + added, - removed, ~ changed (values as JSON, with their types)."""
+        def show(value):
+            return f'{json.dumps(value)} ({type_code(value)})'
+        lines = [f'{self.left[0]}/{self.left[1]} -> {self.right[0]}/{self.right[1]}']
+        lines.extend(f'  + {key} = {show(value)}' for key, value in self.added.items())
+        lines.extend(f'  - {key} = {show(value)}' for key, value in self.removed.items())
+        lines.extend(f'  ~ {key}: {show(old)} -> {show(new)}' for key, (old, new) in self.changed.items())
+        return '\n'.join(lines)
+
+def _same(left: Any, right: Any) -> bool:
+    # 1, 1.0 and True are equal in Python but different JSON values
+    return left == right and type_code(left) == type_code(right)
+
+def diff_configs(left_config: Dict[str, Any], right_config: Dict[str, Any],
+                 left: Tuple[str, str] = ('', ''), right: Tuple[str, str] = ('', '')) -> ConfigDiff:
+    """Compare two flat configs key by key."""
+    added = {key: value for key, value in right_config.items() if key not in left_config}
+    removed = {key: value for key, value in left_config.items() if key not in right_config}
+    changed = {key: (value, right_config[key]) for key, value in left_config.items()
+               if key in right_config and not _same(value, right_config[key])}
+    return ConfigDiff(left, right, added, removed, changed)
+
+def content_hash(config: Dict[str, Any]) -> bytes:
+    """Digest of a config's canonical JSON: equal configs (keys, values and JSON types) hash equal."""
+    text = json.dumps(config, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+def resolve(service: Optional[Service], environment: str) -> Optional[ConfigurationEntry]:
+    # Same resolution as get-config: the environment, else base
+    if service is None:
+        return None
+    return service.get_configuration(environment) or service.get_configuration('base')
+
+def _read_once(storage, name: str) -> Optional[Service]:
+    # Decode a service without leaving it in a lazily loaded storage's memory, so bulk passes stream
+    loaded = getattr(getattr(storage, 'services', None), 'loaded', None)
+    cached = loaded is not None and name in loaded
+    service = storage.get_service(name)
+    if loaded is not None and not cached:
+        loaded.pop(name, None)
+    return service
+
+EMPTY_HASH = content_hash({})
+
+class DiffEngine:
+    """
+    Diffs resolved configs, one service at a time. A resolved config is base with an
+    environment's overrides on top, so it is identified by the content hashes of those two
+    stored entries. When both sides have the same pair, the configs are identical: they are
+    counted in skipped without being resolved or compared key by key. Entry hashes are
+    cached by service, environment, version and write timestamp, so each base is hashed
+    once however many environments use it, and repeated diffs of a long-lived store only
+    hash what changed since. Across two FileStorages, services whose stored JSON is
+    byte-identical are skipped without being decoded at all.
+    """
+    def __init__(self, cache_size: int = 65536):
+        self.hashes = ResolvedConfigCache(cache_size)
+        self.compared = 0  # configs compared key by key
+        self.skipped = 0  # configs found identical by hash, or whole services by their bytes
+
+    def entry_hash(self, service: Service, environment: str) -> bytes:
+        """Content hash of the overrides stored on one entry (EMPTY_HASH if there is none)."""
+        entry = service.get_configuration(environment)
+        if entry is None:
+            return EMPTY_HASH
+        key = (service.name, environment, service.version, entry.updated_raw)
+        digest = self.hashes.get(key)
+        if digest is None:
+            digest = content_hash(entry.overrides)
+            self.hashes.put(key, digest)
+        return digest
+
+    def resolved_hashes(self, service: Optional[Service], environment: str) -> Tuple[bytes, bytes]:
+        if service is None:
+            return EMPTY_HASH, EMPTY_HASH
+        own = EMPTY_HASH if environment == 'base' else self.entry_hash(service, environment)
+        return self.entry_hash(service, 'base'), own
+
+    def diff_services(self, left: Optional[Service], left_env: str, right: Optional[Service], right_env: str,
+                      left_name: Optional[str] = None, right_name: Optional[str] = None) -> ConfigDiff:
+        """Diff one resolved environment of left against one of right (either may be None)."""
+        left_side = (left.name if left else left_name, left_env)
+        right_side = (right.name if right else right_name, right_env)
+        if self.resolved_hashes(left, left_env) == self.resolved_hashes(right, right_env):
+            self.skipped += 1
+            return ConfigDiff(left_side, right_side, {}, {}, {})
+        self.compared += 1
+        left_entry, right_entry = resolve(left, left_env), resolve(right, right_env)
+        return diff_configs(left_entry.config_data if left_entry else {}, right_entry.config_data if right_entry else {},
+                            left_side, right_side)
+
+    def diff_environments(self, storage, left_env: str, right_env: str,
+                          names: Optional[Iterable[str]] = None) -> Iterator[ConfigDiff]:
+        """Non-empty diffs of left_env vs right_env for every service (or the named ones), in one pass."""
+        if names is None and hasattr(storage, 'iter_services'):
+            services = storage.iter_services()
+        else:
+            services = (_read_once(storage, name) for name in (storage.list_services() if names is None else names))
+        for service in services:
+            if service is None:
+                continue
+            diff = self.diff_services(service, left_env, service, right_env)
+            if not diff.identical:
+                yield diff
+
+    def diff_stores(self, left_storage, right_storage, left_env: Optional[str] = None, right_env: Optional[str] = None,
+                    names: Optional[Iterable[str]] = None) -> Iterator[ConfigDiff]:
+        """
+        Non-empty diffs between same-named services of two stores, e.g. the live store and a
+        backup. With left_env, that environment on the left is compared with right_env (default:
+        the same) on the right; without, every environment either side has is compared with
+        itself. Services only one store has diff against an empty config.
+        """
+        if names is None:
+            left_names = left_storage.list_services()
+            seen = set(left_names)
+            names = left_names + [name for name in right_storage.list_services() if name not in seen]
+        # Identical stored bytes mean identical services, which only matters when each env meets itself
+        by_bytes = (right_env is None or right_env == left_env) and \
+            hasattr(left_storage, 'raw_service') and hasattr(right_storage, 'raw_service')
+        for name in names:
+            if by_bytes:
+                raw = left_storage.raw_service(name)
+                if raw is not None and raw == right_storage.raw_service(name):
+                    self.skipped += 1
+                    continue
+            left, right = _read_once(left_storage, name), _read_once(right_storage, name)
+            if left_env is not None:
+                pairs: List[Tuple[str, str]] = [(left_env, right_env or left_env)]
+            else:
+                environments = list(left.configurations) if left else []
+                environments += [env for env in (right.configurations if right else ()) if env not in environments]
+                pairs = [(env, env) for env in environments]
+            for left_side_env, right_side_env in pairs:
+                diff = self.diff_services(left, left_side_env, right, right_side_env, name, name)
+                if not diff.identical:
+                    yield diff
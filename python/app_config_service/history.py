@@ -0,0 +1,230 @@
+# Version history: what every committed service version changed, with periodic full checkpoints
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, UTC
+import json
+from app_config_service.models import ConfigurationEntry, Service
+from app_config_service.diff import ConfigDiff, diff_configs
+from app_config_service.sidecars import AppendLog, sidecar_path
+
+# environment -> stored overrides, as a service had them at one version
+State = Dict[str, Dict[str, Any]]
+# environment -> {'set': {key: value}, 'unset': [key]}, or None when the environment was removed
+Changes = Dict[str, Optional[Dict[str, Any]]]
+
+def entry_changes(old: Dict[str, ConfigurationEntry], new: Dict[str, ConfigurationEntry]) -> Changes:
+    """What turns one set of entries into another, for every environment whose stored overrides differ."""
+    changes: Changes = {}
+    for env in list(old) + [env for env in new if env not in old]:
+        if env not in new:
+            changes[env] = None
+            continue
+        diff = diff_configs(old[env].overrides if env in old else {}, new[env].overrides)
+        if env not in old or not diff.identical:
+            changed = {key: value for key, (_, value) in diff.changed.items()}
+            changes[env] = {'set': {**diff.added, **changed}, 'unset': sorted(diff.removed)}
+    return changes
+
+def apply_changes(state: State, changes: Changes) -> State:
+    """The next state; environments the changes do not touch are shared with state, not copied."""
+    state = dict(state)
+    for env, change in changes.items():
+        if change is None:
+            state.pop(env, None)
+            continue
+        overrides = dict(state.get(env, {}))
+        for key in change['unset']:
+            overrides.pop(key, None)
+        overrides.update(change['set'])
+        state[env] = overrides
+    return state
+
+def resolve_state(state: State, environment: str) -> Optional[Dict[str, Any]]:
+    # Same resolution as get-config: the environment over base, else base
+    if environment not in state:
+        return state.get('base')
+    if environment == 'base' or 'base' not in state:
+        return state[environment]
+    return {**state['base'], **state[environment]}
+
+class VersionRecord:
+    """
+    One committed version of a service: the changes from the version before and, on
+    checkpoints, the full state. version is None for the marker left by deleting the
+    service, which ends its history.
+    """
+    def __init__(self, service: str, version: Optional[int], changes: Optional[Changes],
+                 checkpoint: Optional[State] = None, timestamp: Optional[str] = None):
+        self.service = service
+        self.version = version
+        self.changes = changes
+        self.checkpoint = checkpoint
+        self.timestamp = timestamp
+
+    def keys(self) -> Dict[str, List[str]]:
+        """Environment -> keys set or unset by this version ([] for a removed environment)."""
+        return {env: sorted(list(change['set']) + change['unset']) if change else []
+                for env, change in (self.changes or {}).items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        # service first: readers pick one service's lines out by their prefix
+        data = {'service': self.service, 'version': self.version, 'timestamp': self.timestamp, 'changes': self.changes}
+        if self.checkpoint is not None:
+            data['checkpoint'] = self.checkpoint
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'VersionRecord':
+        return cls(data['service'], data['version'], data['changes'], data.get('checkpoint'), data['timestamp'])
+
+def history_path(storage) -> str:
+    return sidecar_path(storage, '.history', 'history.ndjson')
+
+def _replay(records: List[VersionRecord], version: Optional[int] = None) -> Tuple[Optional[State], Optional[int]]:
+    # State after the records up to version (all when None), and the last version applied;
+    # state is None while the chain is broken, until the next checkpoint
+    state, last = None, None
+    for record in records:
+        if version is not None and record.version > version:
+            break
+        if record.checkpoint is not None:
+            state = record.checkpoint
+        elif state is not None and record.version == last + 1:
+            state = apply_changes(state, record.changes)
+        else:
+            state = None
+        last = record.version
+    return state, last
+
+class VersionHistory(AppendLog):
+    """
+    Append-only NDJSON file with one VersionRecord per committed service version.
+
+    A record holds only the keys its version set or unset, so the file grows with the
+    size of each change rather than with the size of the config. A version is rebuilt by
+    replaying changes forward from the nearest earlier checkpoint. A full checkpoint is
+    written every checkpoint_every versions, and whenever the version before is missing
+    (the first change recorded for a service, or one made without history). Only the
+    latest max_versions of each service are kept: once a service has twice that many,
+    the file is rewritten and the oldest kept version becomes a checkpoint.
+
+    The latest version and record count per service are kept in a summary next to the
+    file, so a new process only reads the records written after it.
+    """
+    summary_bytes = 256 * 1024
+
+    def __init__(self, filename: str, max_versions: Optional[int] = 100, checkpoint_every: int = 50):
+        super().__init__(filename)  # appends and rewrites are shared with other processes
+        self.max_versions = max_versions  # None keeps every version
+        self.checkpoint_every = checkpoint_every
+        self.latest: Dict[str, int] = {}  # last recorded version per service
+        self.counts: Dict[str, int] = {}  # records per service
+
+    def _scan(self, line: bytes):
+        data = json.loads(line)
+        service, version = data['service'], data['version']
+        if version is None:
+            self.latest.pop(service, None)
+            self.counts.pop(service, None)
+        else:
+            self.latest[service] = version
+            self.counts[service] = self.counts.get(service, 0) + 1
+
+    def _reset(self):
+        self.latest, self.counts = {}, {}
+
+    def _state(self) -> Dict[str, List[int]]:
+        return {service: [version, self.counts[service]] for service, version in self.latest.items()}
+
+    def _restore(self, state: Dict[str, List[int]]):
+        self.latest = {service: version for service, (version, _) in state.items()}
+        self.counts = {service: count for service, (_, count) in state.items()}
+
+    def _append(self, records: List[VersionRecord]):
+        self.append([(json.dumps(record.to_dict()) + '\n').encode('utf-8') for record in records])
+
+    def record(self, changed: List[Tuple[Service, Changes]]):
+        """Record the versions services were just saved at, with what changed since the version before."""
+        if not changed:
+            return
+        with self.lock:
+            self.catch_up()
+            timestamp = datetime.now(UTC).isoformat()
+            records = []
+            for service, changes in changed:
+                checkpoint = None
+                if self.latest.get(service.name) != service.version - 1 or service.version % self.checkpoint_every == 0:
+                    checkpoint = {env: dict(entry.overrides) for env, entry in service.configurations.items()}
+                records.append(VersionRecord(service.name, service.version, changes, checkpoint, timestamp))
+            self._append(records)
+            if self.max_versions and any(self.counts[service.name] >= 2 * self.max_versions for service, _ in changed):
+                self.trim()
+
+    def forget(self, service_name: str):
+        """End a deleted service's history; a service created later under the name starts a new one."""
+        with self.lock:
+            self.catch_up()
+            if service_name in self.counts:
+                self._append([VersionRecord(service_name, None, None, timestamp=datetime.now(UTC).isoformat())])
+
+    def read(self, service_name: str) -> List[VersionRecord]:
+        """The service's recorded versions, oldest first."""
+        prefix = ('{"service": ' + json.dumps(service_name) + ',').encode('utf-8')
+        records: List[VersionRecord] = []
+        for line in self.lines():
+            # Only this service's lines are decoded
+            if not line.startswith(prefix):
+                continue
+            record = VersionRecord.from_dict(json.loads(line))
+            if record.version is None:
+                records = []
+            else:
+                records.append(record)
+        return records
+
+    def state_at(self, service_name: str, version: int) -> Optional[State]:
+        """Stored overrides per environment at one version, or None if that version is not in the history."""
+        state, last = _replay(self.read(service_name), version)
+        return state if last == version else None
+
+    def diff(self, service_name: str, old: int, new: Optional[int] = None,
+             environment: Optional[str] = None) -> List[ConfigDiff]:
+        """
+        Resolved configs at version old against version new (default: the latest recorded), for
+        one environment or every environment either version has. Raises if a version is not in the history.
+        """
+        records = self.read(service_name)
+        new = records[-1].version if new is None and records else new
+        states = []
+        for version in (old, new):
+            state, last = _replay(records, version)
+            if version is None or state is None or last != version:
+                raise ValueError(f"Version {version} of '{service_name}' is not in the history.")
+            states.append(state)
+        environments = [environment] if environment else list(states[0]) + [env for env in states[1] if env not in states[0]]
+        return [diff_configs(resolve_state(states[0], env) or {}, resolve_state(states[1], env) or {},
+                             (f'{service_name}@{old}', env), (f'{service_name}@{new}', env)) for env in environments]
+
+    def trim(self):
+        """Drop all but each service's latest max_versions, and the histories of deleted services."""
+        with self.lock:
+            lines = list(self.lines())
+            by_service: Dict[str, List[Tuple[int, VersionRecord]]] = {}
+            for position, line in enumerate(lines):
+                record = VersionRecord.from_dict(json.loads(line))
+                if record.version is None:
+                    by_service.pop(record.service, None)
+                else:
+                    by_service.setdefault(record.service, []).append((position, record))
+            kept: List[Tuple[int, bytes]] = []
+            for entries in by_service.values():
+                start = len(entries) - self.max_versions if self.max_versions else 0
+                if start > 0:
+                    first = entries[start][1]
+                    if first.checkpoint is None:
+                        # Rebuilt from the dropped versions (stays None if their chain was already broken)
+                        first.checkpoint, _ = _replay([record for _, record in entries[:start + 1]])
+                    lines[entries[start][0]] = (json.dumps(first.to_dict()) + '\n').encode('utf-8')
+                kept.extend((position, lines[position]) for position, _ in entries[max(start, 0):])
+            kept.sort()
+            self.rewrite([line for _, line in kept])
@@ -0,0 +1,88 @@
+# Timers and counters for storage and manager hot paths
+
+from typing import Callable, Dict, List, Optional
+from collections import defaultdict
+import time
+
+# Phases recorded by the built-in instrumentation
+PHASES = ('load', 'deserialize', 'validate', 'propagate', 'serialize', 'write')
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    def __init__(self, metrics: 'Metrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    """
+    Accumulates time spent per phase and named counters.
+    Disabled by default, in which case timer() returns a shared no-op context.
+    Listeners are called as listener(kind, name, value) with kind 'timer' or 'counter',
+    so an embedding application can forward every measurement to its own collector.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.timings: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.listeners: List[Callable[[str, str, float], None]] = []
+
+    def timer(self, name: str):
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def record(self, name: str, seconds: float):
+        self.timings[name] += seconds
+        self.calls[name] += 1
+        for listener in self.listeners:
+            listener('timer', name, seconds)
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        self.counters[name] += amount
+        for listener in self.listeners:
+            listener('counter', name, amount)
+
+    def add_listener(self, listener: Callable[[str, str, float], None]):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str, float], None]):
+        self.listeners.remove(listener)
+
+    def reset(self):
+        self.timings.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+    def report(self, total: Optional[float] = None) -> str:
+        lines = [f"{'phase':<14}{'calls':>8}{'ms':>12}{'%':>7}"]
+        accounted = sum(self.timings.values())
+        total = total or accounted
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            share = 100 * seconds / total if total else 0.0
+            lines.append(f"{name:<14}{self.calls[name]:>8}{seconds * 1000:>12.2f}{share:>6.1f}%")
+        if total > accounted:
+            lines.append(f"{'(other)':<14}{'':>8}{(total - accounted) * 1000:>12.2f}{100 * (total - accounted) / total:>6.1f}%")
+            lines.append(f"{'total':<14}{'':>8}{total * 1000:>12.2f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        return '\n'.join(lines)
+
+# Shared instance used by storage and ConfigManager
+metrics = Metrics()
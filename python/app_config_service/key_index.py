@@ -0,0 +1,216 @@
+# Inverted index from config keys (and optionally values) to the service environments that store them
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from bisect import bisect_left, bisect_right
+import json
+import operator
+import os
+from app_config_service.models import Service
+from app_config_service.sidecars import sidecar_path
+
+OPERATORS = {'=': operator.eq, '!=': operator.ne, '>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+RANGE_OPERATORS = ('>', '>=', '<', '<=')
+
+Match = Tuple[str, str, Any]  # (service, environment, value)
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _bucket(value: Any) -> Optional[Tuple]:
+    # Equality buckets for scalar values; True and 1 stay apart as they do in JSON
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return (isinstance(value, bool), value)
+    return None
+
+def _check_filters(filters: List[Tuple[str, Any]]):
+    for op, value in filters:
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator '{op}'. Choose from: {', '.join(OPERATORS)}")
+        if op in RANGE_OPERATORS and not _is_number(value):
+            raise ValueError(f"'{op}' needs a number, got {value!r}.")
+
+def _passes(value: Any, filters: List[Tuple[str, Any]]) -> bool:
+    for op, expected in filters:
+        if op in RANGE_OPERATORS:
+            if not _is_number(value) or not OPERATORS[op](value, expected):
+                return False
+        else:
+            left, right = _bucket(value), _bucket(expected)
+            if left is None or right is None:
+                left, right = value, expected
+            if not OPERATORS[op](left, right):
+                return False
+    return True
+
+def match_postings(postings: Dict[str, Dict[str, Any]], filters: List[Tuple[str, Any]] = (),
+                   environment: Optional[str] = None) -> List[Match]:
+    """
+    Filter one key's postings (service -> environment -> stored value). Without environment, every
+    place the key is stored is a candidate; with it, each service's resolved value in that
+    environment is, as get_config resolves it: its override, else base.
+    """
+    _check_filters(filters)
+    matches = []
+    for service, envs in postings.items():
+        if environment is None:
+            candidates = envs.items()
+        elif environment in envs:
+            candidates = [(environment, envs[environment])]
+        elif 'base' in envs:
+            candidates = [(environment, envs['base'])]
+        else:
+            continue
+        matches.extend((service, env, value) for env, value in candidates if _passes(value, filters))
+    matches.sort(key=lambda match: (match[0], match[1]))
+    return matches
+
+class KeyIndex:
+    """
+    key -> service -> environment -> stored value, for every key stored on any entry.
+    Updated one service at a time as changes commit. With values=True it also keeps,
+    per key, equality buckets and a sorted list of numeric values, so filtered queries
+    only touch matching postings.
+    """
+    def __init__(self, values: bool = True):
+        self.postings: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.service_keys: Dict[str, Set[str]] = {}
+        self.versions: Dict[str, int] = {}  # version each service was indexed at
+        self.values = values
+        self.by_value: Dict[str, Dict[Tuple, Set[Tuple[str, str]]]] = {}
+        self.numbers: Dict[str, Tuple[List[float], List[Tuple[str, str]]]] = {}
+
+    @classmethod
+    def build(cls, services: Iterable[Service], values: bool = True) -> 'KeyIndex':
+        index = cls(values)
+        for service in services:
+            index.add_service(service)
+        return index
+
+    def add_service(self, service: Service):
+        keys = self.service_keys.setdefault(service.name, set())
+        self.versions[service.name] = service.version
+        for env, entry in service.configurations.items():
+            for key, value in entry.overrides.items():
+                keys.add(key)
+                self.postings.setdefault(key, {}).setdefault(service.name, {})[env] = value
+                if self.values:
+                    self._add_value(key, service.name, env, value)
+
+    def remove_service(self, service_name: str):
+        for key in self.service_keys.pop(service_name, ()):
+            envs = self.postings[key].pop(service_name)
+            if not self.postings[key]:
+                del self.postings[key]
+            if self.values:
+                for env, value in envs.items():
+                    self._remove_value(key, service_name, env, value)
+        self.versions.pop(service_name, None)
+
+    def update_service(self, service: Service):
+        self.remove_service(service.name)
+        self.add_service(service)
+
+    def _add_value(self, key: str, service: str, env: str, value: Any):
+        bucket = _bucket(value)
+        if bucket is not None:
+            self.by_value.setdefault(key, {}).setdefault(bucket, set()).add((service, env))
+        if _is_number(value):
+            numbers, locations = self.numbers.setdefault(key, ([], []))
+            at = bisect_right(numbers, value)
+            numbers.insert(at, value)
+            locations.insert(at, (service, env))
+
+    def _remove_value(self, key: str, service: str, env: str, value: Any):
+        bucket = _bucket(value)
+        if bucket is not None:
+            buckets = self.by_value[key]
+            buckets[bucket].discard((service, env))
+            if not buckets[bucket]:
+                del buckets[bucket]
+        if _is_number(value):
+            numbers, locations = self.numbers[key]
+            at = bisect_left(numbers, value)
+            while locations[at] != (service, env):
+                at += 1
+            del numbers[at]
+            del locations[at]
+
+    def environments_with(self, service_name: str, key: str) -> List[str]:
+        """Environments of a service that store key themselves."""
+        return list(self.postings.get(key, {}).get(service_name, ()))
+
+    def _candidates(self, key: str, filters: List[Tuple[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+        # Postings narrowed through the value index by the first filter it can answer
+        for op, value in filters:
+            if op == '=' and _bucket(value) is not None:
+                locations = self.by_value.get(key, {}).get(_bucket(value), ())
+            elif op in RANGE_OPERATORS:
+                numbers, all_locations = self.numbers.get(key, ([], []))
+                if op in ('>', '>='):
+                    start, end = (bisect_right if op == '>' else bisect_left)(numbers, value), len(numbers)
+                else:
+                    start, end = 0, (bisect_left if op == '<' else bisect_right)(numbers, value)
+                locations = all_locations[start:end]
+            else:
+                continue
+            postings = self.postings.get(key, {})
+            narrowed: Dict[str, Dict[str, Any]] = {}
+            for service, env in locations:
+                narrowed.setdefault(service, {})[env] = postings[service][env]
+            return narrowed
+        return None
+
+    def query(self, key: str, filters: List[Tuple[str, Any]] = (), environment: Optional[str] = None) -> List[Match]:
+        """(service, environment, value) wherever key passes every (operator, value) filter."""
+        filters = list(filters)
+        _check_filters(filters)
+        postings = self.postings.get(key, {})
+        if self.values and environment is None:
+            narrowed = self._candidates(key, filters)
+            if narrowed is not None:
+                postings = narrowed
+        return match_postings(postings, filters, environment)
+
+def index_storage(storage, values: bool = True) -> KeyIndex:
+    """Build a KeyIndex with one pass over every service of a storage."""
+    if hasattr(storage, 'iter_services'):
+        services = storage.iter_services()
+    else:
+        services = (storage.get_service(name) for name in storage.list_services())
+    return KeyIndex.build(services, values)
+
+def key_index_path(storage) -> str:
+    return sidecar_path(storage, '.keys', 'keys.idx')
+
+def write_key_index(path: str, index: KeyIndex, signature: Tuple):
+    """
+    Persist an index as one JSON line per key after a header mapping keys to their line's
+    byte range, so a query reads only the key it asks about. signature identifies the
+    store contents the index was built from.
+    """
+    lines = [json.dumps(index.postings[key]).encode('utf-8') + b'\n' for key in index.postings]
+    offset, ranges = 0, {}
+    for key, line in zip(index.postings, lines):
+        ranges[key] = [offset, len(line)]
+        offset += len(line)
+    header = json.dumps({'signature': signature, 'keys': ranges}).encode('utf-8') + b'\n'
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.writelines(lines)
+    os.replace(tmp, path)
+
+def read_key_postings(path: str, key: str, signature: Tuple) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Postings of one key from a sidecar, or None if it is missing or stale."""
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header['signature'] != json.loads(json.dumps(signature)):
+                return None
+            if key not in header['keys']:
+                return {}
+            offset, length = header['keys'][key]
+            f.seek(f.tell() + offset)
+            return json.loads(f.read(length))
+    except (OSError, ValueError, KeyError):
+        return None
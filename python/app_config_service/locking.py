@@ -0,0 +1,137 @@
+# Locks for stores shared by several processes (file locks, write conflicts) or threads (reader-writer locks)
+
+from typing import Optional
+from contextlib import contextmanager
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class ConflictError(ValueError):
+    """Raised by a compare-and-swap write when another process changed the service first."""
+    def __init__(self, service_name: str, expected: Optional[int], actual: Optional[int]):
+        describe = lambda version: 'absent' if version is None else f'version {version}'
+        super().__init__(f"Service '{service_name}' changed concurrently: expected {describe(expected)}, found {describe(actual)}.")
+        self.service_name = service_name
+        self.expected = expected
+        self.actual = actual
+
+class LockTimeout(OSError):
+    pass
+
+class FileLock:
+    """
+    Exclusive advisory lock on a lock file, shared by every process using the same path.
+    Reentrant within one instance, so a locked method may call another one.
+    With timeout None, acquire() waits as long as it takes.
+    """
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = timeout
+        self.fd: Optional[int] = None
+        self.depth = 0
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self.fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        if self.depth:
+            self.depth += 1
+            return
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None and self.timeout is None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            deadline = None if self.timeout is None else time.monotonic() + self.timeout
+            delay = 0.0005
+            while not self._try_lock():
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(self.fd)
+                    self.fd = None
+                    raise LockTimeout(f"Timed out after {self.timeout}s waiting for '{self.path}'.")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.01)
+        self.depth = 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+class ReadWriteLock:
+    """
+    Any number of readers or a single writer, for the threads of one process.
+    Waiting writers go first, so a steady stream of readers cannot starve them.
+    Not reentrant: a thread holding it must not acquire it again.
+    """
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writing or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+
+    def release_write(self):
+        with self.condition:
+            self.writing = False
+            self.condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
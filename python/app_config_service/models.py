@@ -1,28 +1,145 @@
-from typing import Dict, Any, Optional
-from datetime import datetime, UTC
+from typing import Dict, Any, Mapping, Optional, Union
+from datetime import datetime, timedelta, UTC
+from types import MappingProxyType
+import json
+from app_config_service.validation import ConfigSchema
 
 # Data models (Service, Configuration, etc.)
 
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MICROSECOND = timedelta(microseconds=1)
+
+# Stored timestamps may be datetimes, ISO strings (JSON stores, SQLite) or epoch microseconds (binary snapshots)
+Timestamp = Union[datetime, str, int]
+
+def parse_timestamp(value: Timestamp) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, int):
+        return EPOCH + timedelta(microseconds=value)
+    return datetime.fromisoformat(value)
+
+def timestamp_iso(value: Timestamp) -> str:
+    # ISO strings are written back untouched, so a load/save round trip never parses them
+    return value if isinstance(value, str) else parse_timestamp(value).isoformat()
+
+def timestamp_us(value: Timestamp) -> int:
+    if isinstance(value, int):
+        return value
+    value = parse_timestamp(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return (value - EPOCH) // MICROSECOND
+
 class ConfigurationEntry:
-    def __init__(self, environment: str, config_data: Dict[str, Any], created_at: Optional[datetime] = None, updated_at: Optional[datetime] = None):
+    # No per-instance __dict__: a loaded store holds one entry per service environment
+    __slots__ = ('environment', 'overrides', 'base', 'created_raw', 'updated_raw')
+
+    def __init__(self, environment: str, config_data: Dict[str, Any], created_at: Optional[Timestamp] = None, updated_at: Optional[Timestamp] = None, base: Optional['ConfigurationEntry'] = None):
         self.environment = environment
-        self.config_data = config_data  # flat JSON object (dict)
-        self.created_at = created_at or datetime.now(UTC)
-        self.updated_at = updated_at or datetime.now(UTC)
+        self.overrides = config_data  # values set on this entry only (the full config for base)
+        self.base = base  # entry this one is layered over; None for the base entry itself
+        # Timestamps are kept as loaded and only parsed into datetimes when read
+        self.created_raw = created_at or datetime.now(UTC)
+        self.updated_raw = updated_at or datetime.now(UTC)
+
+    @property
+    def created_at(self) -> datetime:
+        if not isinstance(self.created_raw, datetime):
+            self.created_raw = parse_timestamp(self.created_raw)
+        return self.created_raw
+
+    @created_at.setter
+    def created_at(self, value: Timestamp):
+        self.created_raw = value
+
+    @property
+    def updated_at(self) -> datetime:
+        if not isinstance(self.updated_raw, datetime):
+            self.updated_raw = parse_timestamp(self.updated_raw)
+        return self.updated_raw
+
+    @updated_at.setter
+    def updated_at(self, value: Timestamp):
+        self.updated_raw = value
+
+    @property
+    def config_data(self) -> Dict[str, Any]:
+        """Resolved flat config: the base values with this entry's overrides applied."""
+        if self.base is None:
+            return self.overrides
+        resolved = self.base.config_data.copy()
+        resolved.update(self.overrides)
+        return resolved
 
     def update(self, new_data: Dict[str, Any]):
-        self.config_data.update(new_data)
+        self.overrides.update(new_data)
         self.updated_at = datetime.now(UTC)
 
+def freeze(value: Any) -> Any:
+    """Read-only deep copy of a config value: dicts become read-only mappings and lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class ConfigSnapshot:
+    """
+    Immutable copy of one resolved environment config at one service version.
+    Safe to share between threads: later writes never change it.
+    """
+    __slots__ = ('service', 'environment', 'version', 'config_data', 'created_at', 'updated_at', '_json')
+
+    def __init__(self, service: str, entry: ConfigurationEntry, version: int):
+        self.service = service
+        self.environment = entry.environment
+        self.version = version
+        self.config_data: Mapping[str, Any] = freeze(entry.config_data)
+        self.created_at = entry.created_at
+        self.updated_at = entry.updated_at
+        self._json: Optional[str] = None
+
+    def to_json(self) -> str:
+        # Computed once; two threads racing here just build the same string
+        if self._json is None:
+            self._json = json.dumps(self.config_data, indent=2, default=dict)
+        return self._json
+
 class Service:
+    __slots__ = ('name', 'configurations', 'version', 'schema')
+
     def __init__(self, name: str):
         self.name = name
         self.configurations: Dict[str, ConfigurationEntry] = {}  # key: environment
+        self.version = 0  # bumped by ConfigManager on every committed change
+        self.schema: Optional[ConfigSchema] = None  # compiled from base; rebuilt when base keys change
 
-    def add_configuration(self, environment: str, config_data: Dict[str, Any]):
-        entry = ConfigurationEntry(environment, config_data)
+    def add_configuration(self, environment: str, config_data: Dict[str, Any], created_at: Optional[Timestamp] = None, updated_at: Optional[Timestamp] = None):
+        entry = ConfigurationEntry(environment, config_data, created_at, updated_at)
         self.configurations[environment] = entry
+        # Environments are sparse overlays on top of base
+        if environment == 'base':
+            self.schema = None
+            for env, other in self.configurations.items():
+                if env != 'base':
+                    other.base = entry
+        else:
+            entry.base = self.configurations.get('base')
         return entry
 
     def get_configuration(self, environment: str) -> Optional[ConfigurationEntry]:
         return self.configurations.get(environment)
+
+    def get_schema(self) -> ConfigSchema:
+        if self.schema is None:
+            base = self.configurations.get('base')
+            self.schema = ConfigSchema(base.overrides if base else {})
+        return self.schema
+
+    def copy_configurations(self) -> Dict[str, ConfigurationEntry]:
+        """Detached copy of all entries (linked to each other), e.g. to restore later."""
+        copy = Service(self.name)
+        for env, entry in self.configurations.items():
+            copy.add_configuration(env, entry.overrides.copy(), entry.created_raw, entry.updated_raw)
+        return copy.configurations
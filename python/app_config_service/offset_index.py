@@ -0,0 +1,107 @@
+# Sidecar byte-offset index for the JSON store, so one service can be decoded without parsing the file
+#
+# Layout of '<store>.idx' (all integers little-endian):
+#   header   magic 'ACFI', format version u16, flags u16, service count u32,
+#            data file size u64, mtime (ns) u64 and inode u64
+#   order    service count x u32: positions in the index below, in data file order
+#   index    the binary snapshot name index (see binary_format.py): each service name with the
+#            byte offset and length of its JSON object in the data file
+#
+# The size, mtime and inode recorded in the header must match the data file, otherwise the
+# index is considered stale and ignored.
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+from app_config_service.binary_format import NameIndex, write_name_index
+
+MAGIC = b'ACFI'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIQQQ')
+ORDER_ENTRY = struct.Struct('<I')
+
+def index_filename(data_filename: str) -> str:
+    return data_filename + '.idx'
+
+def write_offset_index(data_filename: str, spans: List[Tuple[bytes, int, int]], stat: os.stat_result):
+    """Write the sidecar for a data file whose services occupy spans of (encoded name, offset, length)."""
+    filename = index_filename(data_filename)
+    tmp = filename + '.tmp'
+    spans = sorted(spans)
+    order = array('I', sorted(range(len(spans)), key=lambda position: spans[position][1]))
+    if sys.byteorder != 'little':
+        order.byteswap()
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(spans), stat.st_size, stat.st_mtime_ns, stat.st_ino))
+        f.write(order.tobytes())
+        write_name_index(f, spans)
+    os.replace(tmp, filename)
+
+# Windows refuses to replace a file that any process has mapped, and writers replace both the data
+# file and its index. There both are read into memory instead, so nothing stays mapped between reads.
+MAP_FILES = os.name != 'nt'
+
+class OffsetIndex:
+    """
+    Maps the data file and its sidecar index (reads them, where MAP_FILES is off); read_service
+    decodes only the requested service's bytes. Exposes the same lookup methods as BinarySnapshot.
+    """
+    def __init__(self, data_filename: str, decode: Callable[[Dict[str, Any]], Any]):
+        self.decode = decode
+        self.maps = []
+        with open(index_filename(data_filename), 'rb') as f:
+            index = self._map(f)
+            if len(index) < HEADER.size:
+                raise ValueError('Truncated offset index.')
+            magic, version, _, count, size, mtime_ns, inode = HEADER.unpack_from(index, 0)
+            with open(data_filename, 'rb') as data:
+                stat = os.fstat(data.fileno())
+                if (magic, version) != (MAGIC, FORMAT_VERSION) or (size, mtime_ns, inode) != \
+                        (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                    self.close()
+                    raise ValueError(f"Offset index for '{data_filename}' is stale.")
+                self.data = self._map(data)
+        self.index = NameIndex(index, HEADER.size + ORDER_ENTRY.size * count, count)
+
+    def _map(self, f):
+        if not MAP_FILES:
+            return f.read()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps.append(mapped)
+        return mapped
+
+    def close(self):
+        for mapped in self.maps:
+            mapped.close()
+        self.maps = []
+
+    def find(self, name: str) -> Optional[Tuple[int, int]]:
+        return self.index.find(name)
+
+    def entries(self) -> Iterator[Tuple[str, int, int]]:
+        """(name, offset, length) of every service, in data file order."""
+        for (position,) in ORDER_ENTRY.iter_unpack(self.index.data[HEADER.size:self.index.index_offset]):
+            name, offset, length = self.index.entry(position)
+            yield name.decode('utf-8'), offset, length
+
+    def names(self) -> Iterator[str]:
+        for name, _, _ in self.entries():
+            yield name
+
+    def read_service(self, name: str):
+        location = self.find(name)
+        if location is None:
+            return None
+        offset, length = location
+        return self.decode(json.loads(self.data[offset:offset + length]))
+
+def open_offset_index(data_filename: str, decode: Callable[[Dict[str, Any]], Any]) -> Optional[OffsetIndex]:
+    """The data file's index, or None when it is missing, stale or unreadable."""
+    try:
+        return OffsetIndex(data_filename, decode)
+    except (OSError, ValueError, struct.error):
+        return None
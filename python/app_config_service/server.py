@@ -0,0 +1,195 @@
+# Asyncio HTTP server for reading configs, with ETags and long-polling
+
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import asyncio
+import hashlib
+import json
+import time
+from app_config_service.config_manager import ConfigManager
+from app_config_service.cache import ResolvedConfigCache
+from app_config_service.storage import file_signature, store_files
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+MAX_HEADER_BYTES = 16384
+
+def _unchanged(current, version: Optional[int], etag: Optional[str]) -> bool:
+    if current is None:
+        return False
+    return current[0] == version if version is not None else current[2] == etag
+
+class ConfigServer:
+    """
+    Serves resolved configs from an in-memory ConfigManager.
+
+    GET /services/{name}/{env}                          resolved config; honours If-None-Match
+    GET /services/{name}/{env}/poll?version=N&timeout=S  waits until the config's version is no
+                                                        longer N (or S seconds pass: 304)
+
+    Responses carry an ETag (hash of the body) and X-Config-Version. The store's files are
+    checked every reload_interval seconds; when another process changed them, the store is
+    reopened with open_storage() and waiting long-polls re-check their version.
+    """
+    def __init__(self, open_storage: Callable, reload_interval: float = 1.0, max_poll_timeout: float = 300.0):
+        self.open_storage = open_storage
+        self.reload_interval = reload_interval
+        self.max_poll_timeout = max_poll_timeout
+        self.manager = ConfigManager(open_storage())
+        self.files = store_files(self.manager.storage)
+        self.signature = file_signature(self.files)
+        self.responses = ResolvedConfigCache()  # (name, env, version) -> (body, etag)
+        self.changed = asyncio.Event()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.watcher: Optional[asyncio.Task] = None
+        self.connections = set()  # handler tasks, cancelled on close so long-polls do not hold it up
+
+    def lookup(self, name: str, env: str) -> Optional[Tuple[int, bytes, str]]:
+        """(version, body, etag) of a resolved config, or None when there is none."""
+        service = self.manager.storage.get_service(name)
+        if service is None:
+            return None
+        key = (name, env, service.version)
+        response = self.responses.get(key)
+        if response is None:
+            text = self.manager.get_config_json(name, env)
+            if text is None:
+                return None
+            body = text.encode('utf-8')
+            response = (service.version, body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"')
+            self.responses.put(key, response)
+        return response
+
+    def notify(self):
+        """Wake every waiting long-poll so it re-checks its config; call after changing the manager in process."""
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def reload_if_changed(self) -> bool:
+        signature = file_signature(self.files)
+        if signature == self.signature:
+            return False
+        old = self.manager.storage
+        self.manager = ConfigManager(self.open_storage())
+        self.signature = signature
+        self.responses.clear()
+        if hasattr(old, 'close'):
+            old.close()
+        self.notify()
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload_if_changed()
+
+    async def poll(self, name: str, env: str, version: Optional[int], etag: Optional[str], timeout: float):
+        deadline = time.monotonic() + min(timeout, self.max_poll_timeout)
+        while True:
+            changed = self.changed
+            current = self.lookup(name, env)
+            if not _unchanged(current, version, etag):
+                return current
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return current
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return current
+
+    async def respond(self, method: str, target: str, headers: Dict[str, str]):
+        """(status, headers, body) for one request."""
+        if method != 'GET':
+            return 405, {'Allow': 'GET'}, b''
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if len(parts) not in (3, 4) or parts[0] != 'services' or (len(parts) == 4 and parts[3] != 'poll'):
+            return 404, {}, b'{"error": "Unknown path"}'
+        name, env = parts[1], parts[2]
+        if len(parts) == 4:
+            query = parse_qs(url.query)
+            try:
+                version = int(query['version'][0]) if 'version' in query else None
+                timeout = float(query.get('timeout', ['30'])[0])
+            except ValueError:
+                return 400, {}, b'{"error": "version must be an integer and timeout a number"}'
+            current = await self.poll(name, env, version, headers.get('if-none-match'), timeout)
+            unchanged = _unchanged(current, version, headers.get('if-none-match'))
+        else:
+            current = self.lookup(name, env)
+            unchanged = _unchanged(current, None, headers.get('if-none-match'))
+        if current is None:
+            return 404, {}, json.dumps({'error': f"No configuration for '{name}' in '{env}'"}).encode('utf-8')
+        response_headers = {'ETag': current[2], 'X-Config-Version': str(current[0])}
+        return (304, response_headers, b'') if unchanged else (200, response_headers, current[1])
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, protocol = lines[0].split(' ')
+                    headers = {}
+                    for line in lines[1:]:
+                        if line:
+                            key, value = line.split(':', 1)
+                            headers[key.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self._write(writer, 400, {}, b'{"error": "Malformed request"}', False)
+                    return
+                if length:
+                    await reader.readexactly(length)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if protocol == 'HTTP/1.1' else connection == 'keep-alive'
+                status, response_headers, body = await self.respond(method, target, headers)
+                await self._write(writer, status, response_headers, body, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def _write(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], body: bytes, keep_alive: bool):
+        lines = [f'HTTP/1.1 {status} {REASONS[status]}', f'Content-Length: {len(body)}',
+                 'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        if body:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{key}: {value}' for key, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080):
+        self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES, backlog=4096)
+        self.watcher = asyncio.get_running_loop().create_task(self._watch())
+        return self.server
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+        if self.server is not None:
+            self.server.close()
+            for task in list(self.connections):
+                task.cancel()
+            await self.server.wait_closed()
+        if hasattr(self.manager.storage, 'close'):
+            self.manager.storage.close()
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8080):
+        await self.start(host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
@@ -0,0 +1,166 @@
+# Files kept next to a store: where they go, and the append-only NDJSON logs among them
+
+from typing import Any, Iterator, List, Optional, Tuple
+import json
+import os
+from app_config_service.instrumentation import metrics
+from app_config_service.locking import FileLock
+
+# Where a reader stopped: the file's (inode, device) and the byte offset after the last line read
+Position = Tuple[Tuple[int, int], int]
+
+def sidecar_path(storage, suffix: str, name: str) -> str:
+    """Location of a sidecar: the storage's file name plus suffix, or name inside its directory."""
+    if hasattr(storage, 'filename'):
+        return storage.filename + suffix
+    return os.path.join(storage.directory, name)
+
+def _complete_lines(f) -> Iterator[bytes]:
+    for line in f:
+        if not line.endswith(b'\n'):
+            return  # being appended right now
+        yield line
+
+class AppendLog:
+    """
+    Append-only file of JSON lines shared with other processes. Appends and rewrites hold a
+    lock file next to it. catch_up() hands every line appended since its last call to _scan();
+    when the file was replaced (e.g. trimmed) since, _reset() is called and it starts over.
+
+    Logs that set summary_bytes also save what they scanned (_state()) with the position it
+    reaches, in a '.summary' file next to the log, every time that many more bytes were
+    scanned. A new process restores it and only scans the lines after it.
+    """
+    summary_bytes: Optional[int] = None
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.summary_path = filename + '.summary'
+        self.lock = FileLock(filename + '.lock')
+        self.position: Optional[Position] = None  # how far catch_up() got
+        self.summarized = 0  # offset of the last summary saved or restored
+
+    def _scan(self, line: bytes):
+        pass
+
+    def _reset(self):
+        pass
+
+    def _state(self) -> Any:
+        return None
+
+    def _restore(self, state: Any):
+        pass
+
+    def _load_summary(self):
+        try:
+            with open(self.summary_path, 'rb') as f:
+                summary = json.load(f)
+            identity, offset = tuple(summary['identity']), summary['offset']
+            self._restore(summary['state'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self.position, self.summarized = (identity, offset), offset
+
+    def _save_summary(self, force: bool = False):
+        # Call with the lock held
+        if not self.summary_bytes or self.position is None:
+            return
+        if not force and self.position[1] - self.summarized < self.summary_bytes:
+            return
+        tmp = self.summary_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'identity': self.position[0], 'offset': self.position[1], 'state': self._state()}, f)
+        os.replace(tmp, self.summary_path)
+        self.summarized = self.position[1]
+
+    def lines(self) -> Iterator[bytes]:
+        """Every complete line, streamed."""
+        try:
+            with open(self.filename, 'rb') as f:
+                yield from _complete_lines(f)
+        except FileNotFoundError:
+            return
+
+    def read_since(self, position: Optional[Position] = None) -> Tuple[List[bytes], Optional[Position], bool]:
+        """
+        Complete lines after position (None: every line), the position after them, and whether
+        the file was replaced or truncated since position, in which case every line is returned.
+        """
+        try:
+            f = open(self.filename, 'rb')
+        except FileNotFoundError:
+            return [], None, position is not None
+        with f:
+            stat = os.fstat(f.fileno())
+            identity, offset = (stat.st_ino, stat.st_dev), 0
+            restarted = position is not None and (position[0] != identity or stat.st_size < position[1])
+            if position is not None and not restarted:
+                offset = position[1]
+            f.seek(offset)
+            lines = list(_complete_lines(f))
+        return lines, (identity, offset + sum(map(len, lines))), restarted
+
+    def catch_up(self):
+        """Scan the lines appended since the last call (call with the lock held)."""
+        if self.position is None and self.summary_bytes:
+            self._load_summary()
+        lines, self.position, restarted = self.read_since(self.position)
+        if restarted:
+            self._reset()
+            self.summarized = 0
+        for line in lines:
+            self._scan(line)
+        self._save_summary()
+
+    def first_line(self) -> Optional[bytes]:
+        """The first complete line, if any."""
+        lines = self.lines()
+        try:
+            return next(lines, None)
+        finally:
+            lines.close()
+
+    def last_line(self) -> Optional[bytes]:
+        """The last complete line, read back from the end of the file; a torn trailing line is skipped."""
+        try:
+            with open(self.filename, 'rb') as f:
+                end = f.seek(0, os.SEEK_END)
+                tail = b''
+                while end > 0:
+                    start = max(0, end - 4096)
+                    f.seek(start)
+                    tail = f.read(end - start) + tail
+                    end = start
+                    last = tail.rfind(b'\n')
+                    if last >= 0:
+                        previous = tail.rfind(b'\n', 0, last)
+                        if previous >= 0 or end == 0:
+                            return tail[previous + 1:last + 1]
+        except FileNotFoundError:
+            pass
+        return None
+
+    def append(self, lines: List[bytes]):
+        """Append lines and scan them (call with the lock held; logs that scan call catch_up() first)."""
+        with metrics.timer('write'):
+            with open(self.filename, 'ab') as f:
+                f.write(b''.join(lines))
+                f.flush()  # so the size below includes the lines
+                stat = os.fstat(f.fileno())
+        self.position = ((stat.st_ino, stat.st_dev), stat.st_size)
+        for line in lines:
+            self._scan(line)
+        self._save_summary()
+
+    def rewrite(self, lines: List[bytes]):
+        """Replace the file with lines in one step, then scan them from the start."""
+        with self.lock:
+            tmp = self.filename + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.writelines(lines)
+            if self.summary_bytes and os.path.exists(self.summary_path):
+                os.remove(self.summary_path)  # describes the file being replaced
+            os.replace(tmp, self.filename)
+            self.catch_up()
+            self._save_summary(force=True)
@@ -1,33 +1,56 @@
 # In-memory and file storage abstraction
 
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+from collections.abc import MutableMapping
+import hashlib
 import json
 import os
-from app_config_service.models import Service, ConfigurationEntry
-from datetime import datetime
+import sqlite3
+import sys
+import threading
+from app_config_service.models import Service, ConfigurationEntry, timestamp_iso
+from app_config_service.instrumentation import metrics
+from app_config_service.binary_format import BinarySnapshot, is_binary_snapshot, write_snapshot
+from app_config_service.offset_index import open_offset_index, write_offset_index
+from app_config_service.locking import ConflictError, FileLock
+
+def entry_to_dict(entry: ConfigurationEntry):
+    data = {'environment': entry.environment}
+    # Base holds the full config; environments only store their overrides
+    if entry.environment == 'base':
+        data['config_data'] = entry.overrides
+    else:
+        data['overrides'] = entry.overrides
+    data['created_at'] = timestamp_iso(entry.created_raw)
+    data['updated_at'] = timestamp_iso(entry.updated_raw)
+    return data
 
 def service_to_dict(service: Service):
     return {
         'name': service.name,
-        'configurations': {
-            env: {
-                'environment': entry.environment,
-                'config_data': entry.config_data,
-                'created_at': entry.created_at.isoformat(),
-                'updated_at': entry.updated_at.isoformat(),
-            } for env, entry in service.configurations.items()
-        }
+        'version': service.version,
+        'configurations': {env: entry_to_dict(entry) for env, entry in service.configurations.items()}
     }
 
+def intern_keys(values):
+    # Share one string object per key name across environments and services
+    return {sys.intern(key): value for key, value in values.items()}
+
 def service_from_dict(data):
     service = Service(data['name'])
+    service.version = data.get('version', 0)
+    base_data = data['configurations'].get('base', {}).get('config_data', {})
     for env, entry in data['configurations'].items():
-        service.configurations[env] = ConfigurationEntry(
-            entry['environment'],
-            entry['config_data'],
-            datetime.fromisoformat(entry['created_at']),
-            datetime.fromisoformat(entry['updated_at'])
-        )
+        if 'overrides' in entry:
+            values = entry['overrides']
+        elif env == 'base':
+            values = entry['config_data']
+        else:
+            # Older files store fully materialized environments; keep only what differs from base
+            values = {k: v for k, v in entry['config_data'].items() if k in base_data and base_data[k] != v}
+        # Timestamps are kept as stored and only become datetimes when someone reads them;
+        # binary snapshots convert them to epoch microseconds when they are written
+        service.add_configuration(sys.intern(env), intern_keys(values), entry['created_at'], entry['updated_at'])
     return service
 
 # class InMemoryStorage:
@@ -45,34 +68,827 @@ def service_from_dict(data):
 #     def list_services(self):
 #         return list(self.services.keys())
 
+def _service_json(service: Service) -> str:
+    # A service's object as it appears nested at depth one of the indented store
+    return json.dumps(service_to_dict(service), indent=2).replace('\n', '\n  ')
+
+def merge_json_store(f, index, changed: Dict[str, Optional[Service]], spans) -> int:
+    """
+    Write the store read through an OffsetIndex to the binary file f, with the services in
+    changed replaced (or dropped, when mapped to None) and new ones appended. Every other
+    service is copied byte for byte without being decoded. Spans are collected as in write_json_store.
+    """
+    pending = dict(changed)
+    position = 0
+
+    def emit(name, value):
+        nonlocal position
+        prefix = (b',\n  ' if spans else b'{\n  ') + json.dumps(name).encode('ascii') + b': '
+        with metrics.timer('write'):
+            f.write(prefix + value)
+        spans.append((name.encode('utf-8'), position + len(prefix), len(value)))
+        position += len(prefix) + len(value)
+
+    def serialized(service):
+        with metrics.timer('serialize'):
+            return _service_json(service).encode('ascii')
+
+    for name, offset, length in index.entries():
+        if name not in pending:
+            emit(name, index.data[offset:offset + length])
+        elif pending[name] is not None:
+            emit(name, serialized(pending.pop(name)))
+    for name, service in pending.items():
+        if service is not None:
+            emit(name, serialized(service))
+    f.write(b'\n}' if spans else b'{}')
+    return len(spans)
+
+def write_json_store(f, services, spans=None) -> int:
+    """
+    Write services to an open text file in the FileStorage layout.
+    Output matches json.dump(..., indent=2), but only one service is serialized at a time.
+    If spans is a list, (encoded name, byte offset, byte length) of each service's object is appended to it.
+    """
+    separator = '{\n  '
+    count = 0
+    position = 0  # json.dumps escapes non-ASCII, so characters and bytes line up
+    for service in services:
+        with metrics.timer('serialize'):
+            prefix = separator + json.dumps(service.name) + ': '
+            value = _service_json(service)
+        with metrics.timer('write'):
+            f.write(prefix + value)
+        if spans is not None:
+            spans.append((service.name.encode('utf-8'), position + len(prefix), len(value)))
+        position += len(prefix) + len(value)
+        separator = ',\n  '
+        count += 1
+    f.write('{}' if count == 0 else '\n}')
+    return count
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+def scan_json_store(text: str):
+    """
+    Parse a FileStorage JSON document like json.loads, and also return the
+    (encoded name, offset, length) span of each service's object in text.
+    """
+    def skip(pos):
+        while pos < len(text) and text[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def expect(pos, char):
+        pos = skip(pos)
+        if not text.startswith(char, pos):
+            raise json.JSONDecodeError(f"Expecting '{char}'", text, pos)
+        return skip(pos + 1)
+
+    data, spans = {}, {}
+    pos = expect(0, '{')
+    if text.startswith('}', pos):
+        return data, []
+    while True:
+        name, pos = _decoder.raw_decode(text, pos)
+        start = expect(pos, ':')
+        data[name], pos = _decoder.raw_decode(text, start)
+        spans[name] = (name.encode('utf-8'), start, pos - start)
+        pos = skip(pos)
+        if text.startswith('}', pos):
+            break
+        pos = expect(pos, ',')
+    if skip(pos + 1) != len(text):
+        raise json.JSONDecodeError('Extra data', text, skip(pos + 1))
+    return data, list(spans.values())
+
+def resolve_path(filename, default):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if filename is None:
+        # Always use path relative to this file's parent directory (app_config_service)
+        return os.path.join(base_dir, default)
+    # If a relative path is given, make it relative to this file's parent directory
+    if not os.path.isabs(filename):
+        return os.path.join(base_dir, filename)
+    return filename
+
+def write_atomic(path, text):
+    # Write to a sibling temp file and rename so readers never see a half-written file
+    tmp = path + '.tmp'
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
 class FileStorage:
+    """
+    Stores every service in one JSON file.
+
+    A sidecar offset index ('<filename>.idx', see offset_index.py) records where each
+    service sits in the file. While it matches the file, opening the store maps both
+    files and decodes a service only when it is looked up; otherwise the whole file is
+    parsed and the index rebuilt for the next run. save() rewrites both.
+
+    Processes sharing the file serialize their writes on '<filename>.lock'. save_services()
+    is a compare-and-swap: under the lock it checks each service against the current file,
+    raising ConflictError if another process changed it, then copies every other service
+    unchanged, so the lock is never held for a full parse.
+    """
     def __init__(self, filename=None):
-        if filename is None:
-            # Always use path relative to this file's parent directory (app_config_service)
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            filename = os.path.join(base_dir, 'config', 'config_data.json')
-        else:
-            # If a relative path is given, make it relative to this file's parent directory
-            if not os.path.isabs(filename):
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-                filename = os.path.join(base_dir, filename)
-        self.filename = filename
+        self.filename = resolve_path(filename, os.path.join('config', 'config_data.json'))
+        self.lock = FileLock(self.filename + '.lock')
+        self.index = None
         self.services = self.load()
 
     def load(self):
         # Ensure the directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
         if not os.path.exists(self.filename):
-            with open(self.filename, "w") as f:
-                json.dump({}, f)
-            return {}
-        with open(self.filename, "r") as f:
+            with self.lock:
+                if not os.path.exists(self.filename):
+                    with open(self.filename, "w") as f:
+                        json.dump({}, f)
+        with metrics.timer('load'):
+            self.index = open_offset_index(self.filename, service_from_dict)
+        if self.index is not None:
+            return SnapshotServices(self.index)
+        with self.lock:
+            # A writer may have been between renaming the file and indexing it
+            self.index = open_offset_index(self.filename, service_from_dict)
+            if self.index is not None:
+                return SnapshotServices(self.index)
+            services = self._parse()
+            self.index = open_offset_index(self.filename, service_from_dict)
+        if self.index is None:
+            return services
+        indexed = SnapshotServices(self.index)
+        indexed.loaded = services
+        return indexed
+
+    def _parse(self):
+        # Full parse of the file; also indexes it when the offsets can be used as byte offsets
+        with metrics.timer('load'):
+            with open(self.filename, "rb") as f:
+                raw = f.read()
+                stat = os.fstat(f.fileno())
+            data, spans = scan_json_store(raw.decode('utf-8'))
+        with metrics.timer('deserialize'):
+            services = {name: service_from_dict(sdata) for name, sdata in data.items()}
+        metrics.count('services_loaded', len(services))
+        if raw.isascii():
+            try:
+                write_offset_index(self.filename, spans, stat)
+            except OSError:
+                pass
+        return services
+
+    def _replace(self, tmp, spans, loaded):
+        # Swap in a fully written temp file and its index, then read through the new file
+        stat = os.stat(tmp)
+        if self.index is not None:
+            self.index.close()
+        os.replace(tmp, self.filename)
+        write_offset_index(self.filename, spans, stat)
+        self.index = open_offset_index(self.filename, service_from_dict)
+        self.services = SnapshotServices(self.index)
+        self.services.loaded = loaded
+
+    def save(self):
+        """Rewrite the whole file from this process's view of the store."""
+        with self.lock:
+            tmp = self.filename + '.tmp'
+            spans = []
+            with open(tmp, "w", encoding="utf-8") as f:
+                count = write_json_store(f, self.iter_services(), spans)
+            metrics.count('services_saved', count)
+            # Already decoded services are kept; everything else is read from the new file
+            loaded = self.services.loaded if isinstance(self.services, SnapshotServices) else dict(self.services)
+            self._replace(tmp, spans, loaded)
+
+    def save_services(self, services, expected: Optional[Dict[str, Optional[int]]] = None, deleted=()):
+        """
+        Write only these services (and drop the deleted names) on top of the current file.
+        expected maps service names to the version they had when read (None: did not exist);
+        if the file has a different version, nothing is written and ConflictError is raised,
+        after which this storage reads those services afresh.
+        """
+        with self.lock:
+            current = open_offset_index(self.filename, service_from_dict)
+            if current is None:
+                return self._save_parsed(services, expected, deleted)
+            for name, version in (expected or {}).items():
+                on_disk = current.read_service(name)
+                actual = on_disk.version if on_disk is not None else None
+                if actual != version:
+                    metrics.count('write_conflicts')
+                    self._reopen(current)
+                    raise ConflictError(name, version, actual)
+            changed = {service.name: service for service in services}
+            changed.update((name, None) for name in deleted)
+            tmp = self.filename + '.tmp'
+            spans = []
+            with open(tmp, "wb") as f:
+                merge_json_store(f, current, changed, spans)
+            metrics.count('services_saved', len(services))
+            current.close()
+            # Other services may have been changed by other processes; only ours stay decoded
+            self._replace(tmp, spans, {name: service for name, service in changed.items() if service is not None})
+
+    def _save_parsed(self, services, expected, deleted):
+        # The file has no usable index (e.g. it was edited by hand): check against a full parse and rewrite it
+        current = self._parse()
+        for name, version in (expected or {}).items():
+            actual = current[name].version if name in current else None
+            if actual != version:
+                metrics.count('write_conflicts')
+                self.services = current
+                raise ConflictError(name, version, actual)
+        current.update((service.name, service) for service in services)
+        for name in deleted:
+            current.pop(name, None)
+        self.services = current
+        self.save()
+
+    def _reopen(self, index):
+        # Read through an up-to-date index from now on, dropping services decoded from older files
+        if self.index is not None and self.index is not index:
+            self.index.close()
+        self.index = index
+        self.services = SnapshotServices(index)
+
+    def iter_services(self):
+        if isinstance(self.services, SnapshotServices):
+            return self.services.iter_values()
+        return iter(list(self.services.values()))
+
+    def add_service(self, service_name: str) -> Service:
+        if service_name not in self.services:
+            service = Service(service_name)
+            try:
+                self.save_services([service], {service_name: None})
+            except ConflictError:
+                pass  # created by another process in the meantime
+        return self.services[service_name]
+
+    def get_service(self, service_name: str) -> Optional[Service]:
+        return self.services.get(service_name)
+
+    def list_services(self):
+        return list(self.services.keys())
+
+    def raw_service(self, service_name: str) -> Optional[bytes]:
+        """The service's JSON bytes as stored, while it has not been loaded or changed in memory; else None."""
+        if not isinstance(self.services, SnapshotServices) or service_name in self.services.loaded \
+                or service_name in self.services.deleted:
+            return None
+        location = self.index.find(service_name)
+        if location is None:
+            return None
+        offset, length = location
+        return self.index.data[offset:offset + length]
+
+    def delete_service(self, service_name: str) -> bool:
+        if service_name not in self.services:
+            return False
+        self.save_services([], deleted=[service_name])
+        return True
+
+class JournaledFileStorage(FileStorage):
+    """
+    FileStorage variant that records mutations in an append-only change log.
+
+    The JSON file keeps the regular FileStorage layout and acts as the snapshot.
+    Each changed service is appended as one small record to '<filename>.log';
+    once the log holds at least compact_threshold records, and more records than
+    there are services, it is folded back into the snapshot and truncated. Tying
+    compaction to the store size keeps its cost amortized per write on big stores.
+    load() replays the snapshot plus the log tail.
+
+    Appends happen under the store's lock file after replaying whatever other
+    processes appended since, so save_services() can compare versions without
+    re-reading the snapshot.
+    """
+    def __init__(self, filename=None, compact_threshold=1000):
+        self.compact_threshold = compact_threshold
+        self.log_records = 0
+        self.log_offset = 0  # bytes of the log already applied to self.services
+        self.snapshot_id = None  # identity of the snapshot file the log applies to
+        super().__init__(filename)
+
+    @property
+    def log_filename(self):
+        return self.filename + '.log'
+
+    def _snapshot_identity(self):
+        stat = os.stat(self.filename)
+        return stat.st_ino, stat.st_mtime_ns
+
+    def load(self):
+        services = super().load()
+        self.snapshot_id = self._snapshot_identity()
+        self.log_records = 0
+        self.log_offset = 0
+        self._replay(services)
+        if os.path.exists(self.log_filename) and self.log_offset != os.path.getsize(self.log_filename):
+            with self.lock:
+                # Appends happen under the lock, so anything still incomplete now is a torn tail
+                self._replay(services)
+                with open(self.log_filename, "r+b") as f:
+                    f.truncate(self.log_offset)
+        return services
+
+    def _replay(self, services):
+        # Apply complete records from log_offset on; returns the names they touched
+        touched = set()
+        if not os.path.exists(self.log_filename):
+            return touched
+        with open(self.log_filename, "rb") as f:
+            f.seek(self.log_offset)
+            for line in f:
+                try:
+                    with metrics.timer('load'):
+                        record = json.loads(line)
+                except ValueError:
+                    # Torn tail from an interrupted append; everything after it is dropped
+                    break
+                with metrics.timer('deserialize'):
+                    self._apply_record(services, record)
+                touched.add(record['name'])
+                self.log_offset += len(line)
+                self.log_records += 1
+        return touched
+
+    def _catch_up(self):
+        """
+        Bring self.services up to date with other processes' writes (call with the lock held).
+        Returns the names they touched, or None when the snapshot was compacted and everything reloaded.
+        """
+        if self._snapshot_identity() != self.snapshot_id or \
+                (os.path.exists(self.log_filename) and os.path.getsize(self.log_filename) < self.log_offset):
+            self.services = self.load()
+            return None
+        return self._replay(self.services)
+
+    def _apply_record(self, services, record):
+        if record['op'] == 'put':
+            services[record['name']] = service_from_dict(record['service'])
+        elif record['op'] == 'delete':
+            services.pop(record['name'], None)
+
+    def _append(self, records):
+        with metrics.timer('serialize'):
+            text = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        with metrics.timer('write'):
+            with open(self.log_filename, "a", encoding="utf-8") as f:
+                f.write(text)
+        self.log_offset += len(text)
+        self.log_records += len(records)
+        metrics.count('log_records_appended', len(records))
+        if self.log_records >= max(self.compact_threshold, len(self.services)):
+            self.compact()
+
+    def compact(self):
+        # Write the snapshot first: replaying a log that was already folded in is harmless
+        with self.lock:
+            self._catch_up()
+            metrics.count('compactions')
+            super().save()
+            with open(self.log_filename, "w"):
+                pass
+            self.snapshot_id = self._snapshot_identity()
+            self.log_records = 0
+            self.log_offset = 0
+
+    def save(self):
+        self.compact()
+
+    def save_service(self, service: Service):
+        self.save_services([service])
+
+    def save_services(self, services, expected: Optional[Dict[str, Optional[int]]] = None, deleted=()):
+        with self.lock:
+            touched = self._catch_up()
+            for name, version in (expected or {}).items():
+                if touched is not None and name not in touched:
+                    continue  # nobody else wrote it since we read it
+                on_disk = self.services.get(name)
+                actual = on_disk.version if on_disk is not None else None
+                if actual != version:
+                    metrics.count('write_conflicts')
+                    raise ConflictError(name, version, actual)
+            records = []
+            for service in services:
+                self.services[service.name] = service
+                with metrics.timer('serialize'):
+                    records.append({'op': 'put', 'name': service.name, 'service': service_to_dict(service)})
+            for name in deleted:
+                self.services.pop(name, None)
+                records.append({'op': 'delete', 'name': name})
+            if records:
+                self._append(records)
+
+    def add_service(self, service_name: str) -> Service:
+        if service_name not in self.services:
+            try:
+                self.save_services([Service(service_name)], {service_name: None})
+            except ConflictError:
+                pass  # created by another process in the meantime
+        return self.services[service_name]
+
+    def delete_service(self, service_name: str) -> bool:
+        if service_name not in self.services:
+            return False
+        self.save_services([], deleted=[service_name])
+        return True
+
+class LazyServices(MutableMapping):
+    """
+    Dict-like map of service name -> Service that only knows the names up front.
+    A Service is built by loader(name) the first time it is looked up.
+    """
+    def __init__(self, names, loader):
+        self.names = names  # name -> backend-specific location
+        self.loaded: Dict[str, Service] = {}
+        self.loader = loader
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            if name not in self.names:
+                raise KeyError(name)
+            self.loaded[name] = self.loader(name)
+        return self.loaded[name]
+
+    def __setitem__(self, name, service):
+        self.loaded[name] = service
+        self.names.setdefault(name, None)
+
+    def __delitem__(self, name):
+        del self.names[name]
+        self.loaded.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __iter__(self):
+        return iter(list(self.names))
+
+    def iter_values(self):
+        """Yield every service once; unloaded ones are built without being kept, for one-pass scans."""
+        for name in list(self.names):
+            if name in self.loaded:
+                yield self.loaded[name]
+            elif name in self.names:
+                yield self.loader(name, keep=False)
+
+    def __len__(self):
+        return len(self.names)
+
+class ShardedStorage:
+    """
+    Stores one JSON file per service plus a small manifest, all under one directory.
+
+    Only the manifest is read at startup; a service's shard is parsed the first
+    time get_service touches it, and only shards whose content changed are written back.
+    """
+    def __init__(self, filename=None):
+        self.directory = resolve_path(filename, os.path.join('config', 'shards'))
+        self.manifest_file = os.path.join(self.directory, 'manifest.json')
+        self.written: Dict[str, str] = {}  # name -> last serialized shard content
+        self.services = self.load()
+
+    def load(self):
+        os.makedirs(os.path.join(self.directory, 'services'), exist_ok=True)
+        names = {}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                names = json.load(f)['services']
+        self.persisted = set(names)
+        return LazyServices(names, self._load_shard)
+
+    def shard_name(self, service_name: str) -> str:
+        # Hashed file names keep unicode and special characters out of the file system
+        return hashlib.sha1(service_name.encode('utf-8')).hexdigest()[:20] + '.json'
+
+    def _shard_path(self, shard):
+        return os.path.join(self.directory, 'services', shard)
+
+    def _load_shard(self, service_name, keep=True):
+        with metrics.timer('load'):
+            with open(self._shard_path(self.services.names[service_name]), "r", encoding="utf-8") as f:
+                text = f.read()
+            data = json.loads(text)
+        if keep:
+            self.written[service_name] = text
+        with metrics.timer('deserialize'):
+            return service_from_dict(data)
+
+    def _save_manifest(self):
+        write_atomic(self.manifest_file, json.dumps({'services': self.services.names}))
+        self.persisted = set(self.services.names)
+
+    def _write_shard(self, service: Service) -> bool:
+        with metrics.timer('serialize'):
+            text = json.dumps(service_to_dict(service))
+        if self.written.get(service.name) == text:
+            return False
+        with metrics.timer('write'):
+            write_atomic(self._shard_path(self.services.names[service.name]), text)
+        metrics.count('shards_written')
+        self.written[service.name] = text
+        return True
+
+    def save_service(self, service: Service):
+        new = self.services.names.get(service.name) is None
+        if new:
+            self.services.names[service.name] = self.shard_name(service.name)
+        self._write_shard(service)
+        if new:
+            self._save_manifest()
+
+    def save(self):
+        manifest_changed = False
+        for name in self.persisted - self.services.names.keys():
+            # Services removed from the services map since the manifest was last written
+            shard_path = self._shard_path(self.shard_name(name))
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+            self.written.pop(name, None)
+            manifest_changed = True
+        for name, service in self.services.loaded.items():
+            if self.services.names.get(name) is None:
+                self.services.names[name] = self.shard_name(name)
+                manifest_changed = True
+            self._write_shard(service)
+        if manifest_changed:
+            self._save_manifest()
+
+    def add_service(self, service_name: str) -> Service:
+        if service_name not in self.services:
+            self.services[service_name] = Service(service_name)
+            self.save_service(self.services[service_name])
+        return self.services[service_name]
+
+    def get_service(self, service_name: str) -> Optional[Service]:
+        return self.services.get(service_name)
+
+    def list_services(self):
+        return list(self.services.names)
+
+    def iter_services(self):
+        return self.services.iter_values()
+
+    def delete_service(self, service_name: str) -> bool:
+        if service_name not in self.services:
+            return False
+        del self.services[service_name]
+        self.save()
+        return True
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS environments (
+    id INTEGER PRIMARY KEY,
+    service_id INTEGER NOT NULL REFERENCES services(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE (service_id, name)
+);
+CREATE TABLE IF NOT EXISTS config_keys (
+    environment_id INTEGER NOT NULL REFERENCES environments(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (environment_id, key)
+);
+CREATE INDEX IF NOT EXISTS idx_config_keys_key ON config_keys(key);
+"""
+
+class SQLiteStorage:
+    """
+    Stores services, environments and config keys in indexed SQLite tables.
+
+    Environment rows hold only their overrides of base.
+    A service is read on first access. save_service diffs it against the rows
+    it was loaded from, so a single-key update writes a single row. The database
+    runs in WAL mode so readers keep going while a writer commits.
+    """
+    def __init__(self, filename=None):
+        self.filename = resolve_path(filename, os.path.join('config', 'config_data.db'))
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        # The connection is used by whichever thread reaches the store, e.g. the async writer thread.
+        # Writes are serialized by the config managers; concurrent loads are serialized by read_lock.
+        self.conn = sqlite3.connect(self.filename, check_same_thread=False)
+        self.read_lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SQLITE_SCHEMA)
+        if 'version' not in [row[1] for row in self.conn.execute('PRAGMA table_info(services)')]:
+            # Databases created before service versions were tracked
+            self.conn.execute('ALTER TABLE services ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        # name -> {environment: (environment row id, config values as stored)}
+        self.synced: Dict[str, Dict[str, tuple]] = {}
+        self.services = self.load()
+
+    def load(self):
+        names = dict(self.conn.execute('SELECT name, id FROM services'))
+        self.persisted = set(names)
+        return LazyServices(names, self._load_service)
+
+    def _load_service(self, service_name, keep=True):
+        with metrics.timer('load'), self.read_lock:
+            return self._read_service(service_name, keep)
+
+    def _read_service(self, service_name, keep):
+        service = Service(service_name)
+        service.version = self.conn.execute(
+            'SELECT version FROM services WHERE id = ?', (self.services.names[service_name],)).fetchone()[0]
+        synced = {}
+        rows = self.conn.execute(
+            'SELECT id, name, created_at, updated_at FROM environments WHERE service_id = ?',
+            (self.services.names[service_name],))
+        for env_id, env, created_at, updated_at in rows.fetchall():
+            config_data = {sys.intern(key): json.loads(value) for key, value in self.conn.execute(
+                'SELECT key, value FROM config_keys WHERE environment_id = ?', (env_id,))}
+            service.add_configuration(sys.intern(env), config_data, created_at, updated_at)
+            synced[env] = (env_id, dict(config_data))
+        if keep:
+            self.synced[service_name] = synced
+        return service
+
+    def _write_service(self, service: Service):
+        service_id = self.services.names.get(service.name)
+        if service_id is None:
+            service_id = self.conn.execute('INSERT INTO services (name, version) VALUES (?, ?)',
+                                           (service.name, service.version)).lastrowid
+            self.services.names[service.name] = service_id
+            self.persisted.add(service.name)
+        else:
+            self.conn.execute('UPDATE services SET version = ? WHERE id = ? AND version != ?',
+                              (service.version, service_id, service.version))
+        synced = self.synced.setdefault(service.name, {})
+        for env in [env for env in synced if env not in service.configurations]:
+            self.conn.execute('DELETE FROM environments WHERE id = ?', (synced.pop(env)[0],))
+        for env, entry in service.configurations.items():
+            if env in synced:
+                env_id, old_data = synced[env]
+                if old_data == entry.overrides:
+                    continue
+                self.conn.execute('UPDATE environments SET updated_at = ? WHERE id = ?',
+                                  (timestamp_iso(entry.updated_raw), env_id))
+            else:
+                env_id, old_data = self.conn.execute(
+                    'INSERT INTO environments (service_id, name, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                    (service_id, env, timestamp_iso(entry.created_raw), timestamp_iso(entry.updated_raw))).lastrowid, {}
+            removed = [(env_id, key) for key in old_data if key not in entry.overrides]
+            changed = [(env_id, key, json.dumps(value)) for key, value in entry.overrides.items()
+                       if key not in old_data or old_data[key] != value]
+            self.conn.executemany('DELETE FROM config_keys WHERE environment_id = ? AND key = ?', removed)
+            self.conn.executemany(
+                'INSERT INTO config_keys (environment_id, key, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (environment_id, key) DO UPDATE SET value = excluded.value', changed)
+            synced[env] = (env_id, json.loads(json.dumps(entry.overrides)))
+
+    def save_service(self, service: Service):
+        with metrics.timer('write'):
+            with self.conn:
+                self._write_service(service)
+
+    def save(self):
+        with metrics.timer('write'), self.conn:
+            for name in self.persisted - self.services.names.keys():
+                self.conn.execute('DELETE FROM services WHERE name = ?', (name,))
+                self.synced.pop(name, None)
+            self.persisted &= self.services.names.keys()
+            for service in self.services.loaded.values():
+                self._write_service(service)
+
+    def add_service(self, service_name: str) -> Service:
+        if service_name not in self.services:
+            self.services[service_name] = Service(service_name)
+            self.save_service(self.services[service_name])
+        return self.services[service_name]
+
+    def get_service(self, service_name: str) -> Optional[Service]:
+        return self.services.get(service_name)
+
+    def list_services(self):
+        return list(self.services.names)
+
+    def iter_services(self):
+        return self.services.iter_values()
+
+    def delete_service(self, service_name: str) -> bool:
+        if service_name not in self.services:
+            return False
+        del self.services[service_name]
+        self.save()
+        return True
+
+    def import_json(self, filename) -> int:
+        """Import every service from a FileStorage JSON file, replacing services with the same name."""
+        with open(filename, "r", encoding="utf-8") as f:
             data = json.load(f)
-            return {name: service_from_dict(sdata) for name, sdata in data.items()}
+        with self.conn:
+            for name, sdata in data.items():
+                if name in self.services:
+                    del self.services[name]
+                    self.conn.execute('DELETE FROM services WHERE name = ?', (name,))
+                    self.synced.pop(name, None)
+                    self.persisted.discard(name)
+                self.services.loaded[name] = service_from_dict(sdata)
+                self._write_service(self.services.loaded[name])
+        return len(data)
+
+    def close(self):
+        self.conn.close()
+
+class SnapshotServices(MutableMapping):
+    """
+    Dict-like map of services backed by a BinarySnapshot or an OffsetIndex. Lookups
+    binary-search the index, so neither the names nor other services are decoded up front.
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.loaded: Dict[str, Service] = {}
+        self.deleted = set()  # names in the snapshot that were removed
+        self.added = set()  # names not in the snapshot that were set
+
+    def _read(self, name):
+        with metrics.timer('deserialize'):
+            return self.snapshot.read_service(name)
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            service = None if name in self.deleted else self._read(name)
+            if service is None:
+                raise KeyError(name)
+            self.loaded[name] = service
+        return self.loaded[name]
+
+    def __setitem__(self, name, service):
+        if name in self.deleted:
+            self.deleted.discard(name)
+        elif name not in self.loaded and self.snapshot.find(name) is None:
+            self.added.add(name)
+        self.loaded[name] = service
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self.loaded.pop(name, None)
+        if name in self.added:
+            self.added.discard(name)
+        else:
+            self.deleted.add(name)
+
+    def __contains__(self, name):
+        if name in self.loaded:
+            return True
+        return name not in self.deleted and self.snapshot.find(name) is not None
+
+    def __iter__(self):
+        names = [name for name in self.snapshot.names() if name not in self.deleted]
+        seen = set(names)
+        return iter(names + [name for name in self.loaded if name not in seen])
+
+    def __len__(self):
+        return self.snapshot.index.count - len(self.deleted) + len(self.added)
+
+    def iter_values(self):
+        for name in list(self):
+            yield self.loaded[name] if name in self.loaded else self._read(name)
+
+class BinaryStorage:
+    """
+    Stores the whole store as one binary snapshot (see binary_format.py).
+    Opening it only maps the file; a service is decoded the first time it is requested.
+    Every save rewrites the snapshot, so this backend suits read-mostly stores.
+    """
+    def __init__(self, filename=None):
+        self.filename = resolve_path(filename, os.path.join('config', 'config_data.bin'))
+        self.services = self.load()
+
+    def load(self):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        if not os.path.exists(self.filename):
+            write_snapshot(self.filename, [])
+        with metrics.timer('load'):
+            self.snapshot = BinarySnapshot(self.filename)
+        return SnapshotServices(self.snapshot)
 
     def save(self):
-        with open(self.filename, "w") as f:
-            json.dump({name: service_to_dict(service) for name, service in self.services.items()}, f, indent=2)
+        with metrics.timer('write'):
+            count = write_snapshot(self.filename, self.services.iter_values())
+        metrics.count('services_saved', count)
+        # Keep already decoded services; everything else is read from the new file
+        loaded = self.services.loaded
+        self.snapshot.close()
+        self.services = self.load()
+        self.services.loaded = loaded
 
     def add_service(self, service_name: str) -> Service:
         if service_name not in self.services:
@@ -84,4 +900,77 @@ class FileStorage:
         return self.services.get(service_name)
 
     def list_services(self):
-        return list(self.services.keys())
+        return list(self.services)
+
+    def iter_services(self):
+        return self.services.iter_values()
+
+    def delete_service(self, service_name: str) -> bool:
+        if service_name not in self.services:
+            return False
+        del self.services[service_name]
+        self.save()
+        return True
+
+    def close(self):
+        self.snapshot.close()
+
+def convert_json_to_binary(json_file, binary_file) -> int:
+    """Write a FileStorage JSON store as a binary snapshot; returns the number of services."""
+    return write_snapshot(binary_file, FileStorage(json_file).iter_services())
+
+def convert_binary_to_json(binary_file, json_file) -> int:
+    """Write a binary snapshot as a FileStorage JSON store; returns the number of services."""
+    snapshot = BinarySnapshot(binary_file)
+    try:
+        tmp = json_file + '.tmp'
+        with open(tmp, "w") as f:
+            count = write_json_store(f, snapshot.iter_services())
+        os.replace(tmp, json_file)
+    finally:
+        snapshot.close()
+    return count
+
+STORAGE_BACKENDS = {
+    'file': FileStorage,
+    'journal': JournaledFileStorage,
+    'sharded': ShardedStorage,
+    'sqlite': SQLiteStorage,
+    'binary': BinaryStorage,
+}
+
+def store_files(storage) -> List[str]:
+    """Files whose changes mean the store was written by someone else."""
+    files = [getattr(storage, name) for name in ('filename', 'log_filename', 'manifest_file') if hasattr(storage, name)]
+    if hasattr(storage, 'filename'):
+        files.append(storage.filename + '-wal')  # SQLite commits land in the WAL first
+    if hasattr(storage, 'directory'):
+        files.append(os.path.join(storage.directory, 'services'))  # shard renames touch the directory
+    return files
+
+def file_signature(files: List[str]) -> Tuple:
+    """Identity, size and modification time of each file; changes whenever one of them is rewritten."""
+    signature = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def backend_for_path(path: str) -> str:
+    """Guess the backend of an existing store from its path, e.g. to open a backup."""
+    if os.path.isdir(path):
+        return 'sharded'
+    if path.endswith('.db'):
+        return 'sqlite'
+    if path.endswith('.bin') or is_binary_snapshot(path):
+        return 'binary'  # by content too, for backups saved under another name
+    return 'journal' if os.path.exists(path + '.log') else 'file'
+
+def create_storage(backend='file', filename=None, **options):
+    """Build a storage instance by backend name (see STORAGE_BACKENDS)."""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[backend](filename, **options)
@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import time
+from app_config_service.storage import FileStorage, SQLiteStorage
+from app_config_service.models import Service
+from app_config_service.async_manager import AsyncConfigManager
+from app_config_service.validation import SchemaError
+
+class TestAsyncConfigManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.manager = AsyncConfigManager(FileStorage(self.test_file))
+        await self.manager.set_base_config('payment-service', {'timeout': 30, 'retries': 3})
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    async def test_reads_see_completed_writes(self):
+        await self.manager.set_env_config('payment-service', 'production', {'timeout': 60})
+        config = await self.manager.get_config('payment-service', 'production')
+        self.assertEqual(dict(config.config_data), {'timeout': 60, 'retries': 3})
+        self.assertEqual(await self.manager.list_services(), ['payment-service'])
+        self.assertIsNone(await self.manager.get_config_json('missing', 'production'))
+        self.assertTrue(await self.manager.delete_service('payment-service'))
+        self.assertEqual(FileStorage(self.test_file).list_services(), [])
+
+    async def test_concurrent_writes_to_one_service_are_coalesced(self):
+        # Test that a burst of writes is saved in a few batches, and a bad write fails alone
+        writes = [self.manager.set_env_config('payment-service', f'env-{i}', {'timeout': i}) for i in range(50)]
+        writes.append(self.manager.set_env_config('payment-service', 'broken', {'timeout': 'soon'}))
+        batches = self.manager.batches
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        self.assertEqual(results[:50], [None] * 50)
+        self.assertIsInstance(results[50], SchemaError)
+        self.assertLessEqual(self.manager.batches - batches, 3)
+        service = FileStorage(self.test_file).get_service('payment-service')
+        self.assertEqual(len(service.configurations), 51)
+        self.assertEqual(service.get_configuration('env-49').config_data['timeout'], 49)
+
+    async def test_event_loop_stays_responsive_during_heavy_writes(self):
+        # Test that saving a large store on the writer thread does not stall the event loop
+        storage = self.manager.manager.storage
+        for s in range(3000):
+            service = Service(f'service-{s:05d}')
+            service.add_configuration('base', {f'key_{k}': 'x' * 20 for k in range(20)})
+            storage.services[service.name] = service
+        started = time.perf_counter()
+        storage.save()
+        save_seconds = time.perf_counter() - started  # what a blocking save would stall the loop for
+
+        lags = []
+        stop = asyncio.Event()
+
+        async def heartbeat():
+            while not stop.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - started - 0.001)
+
+        beat = asyncio.ensure_future(heartbeat())
+        await asyncio.gather(*(self.manager.set_base_config(f'service-{s:05d}', {'key_0': str(s)}) for s in range(8)))
+        stop.set()
+        await beat
+        self.assertGreater(len(lags), 8)
+        self.assertLess(max(lags), save_seconds / 2)
+        self.assertEqual((await self.manager.get_config('service-00007', 'base')).config_data['key_0'], '7')
+
+class TestAsyncConfigManagerSQLite(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.db')
+        self.manager = AsyncConfigManager(SQLiteStorage(self.test_file))
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    async def test_connection_is_used_from_worker_threads(self):
+        # Test that the connection opened on the event loop thread serves the writer and reader threads
+        await asyncio.gather(*(self.manager.set_base_config(f'service-{s}', {'timeout': s}) for s in range(10)))
+        await self.manager.set_env_config('service-3', 'production', {'timeout': 60})
+        self.manager.manager.snapshots.clear()
+        configs = await asyncio.gather(*(self.manager.get_config(f'service-{s}', 'production') for s in range(10)))
+        self.assertEqual([config.config_data['timeout'] for config in configs], [0, 1, 2, 60, 4, 5, 6, 7, 8, 9])
+        self.assertTrue(await self.manager.delete_service('service-0'))
+        self.assertEqual(sorted(await self.manager.list_services()), [f'service-{s}' for s in range(1, 10)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import os
+import json
+import io
+import gzip
+import tempfile
+from app_config_service.storage import FileStorage, JournaledFileStorage, ShardedStorage, store_files
+from app_config_service.config_manager import ConfigManager
+from app_config_service.bulk import import_records, read_records, export_records, open_text
+
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = FileStorage(os.path.join(self.tmp.name, 'config_data.json'))
+        self.manager = ConfigManager(self.storage)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_ndjson(self, records):
+        path = os.path.join(self.tmp.name, 'records.ndjson')
+        with open(path, 'w') as f:
+            for record in records:
+                f.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+        return path
+
+    def test_import_ndjson_commits_once_per_chunk(self):
+        # Test that records are applied in chunks with one save per chunk
+        saves = []
+        original_save = self.storage.save_services
+        self.storage.save_services = lambda *args: (saves.append(1), original_save(*args))
+        records = []
+        for i in range(10):
+            records.append({'service': f'svc-{i}', 'config': {'timeout': 30}})
+            records.append({'service': f'svc-{i}', 'environment': 'prod', 'config': {'timeout': 60}})
+        report = import_records(self.manager, read_records(self.write_ndjson(records)), chunk_size=8)
+        self.assertEqual(report.applied, 20)
+        self.assertEqual(report.chunks, 3)
+        self.assertEqual(len(saves), 3)
+        self.assertEqual(self.manager.get_config('svc-9', 'prod').config_data, {'timeout': 60})
+
+    def test_rejected_records_are_reported(self):
+        # Test that bad records are skipped without losing the rest of the chunk
+        path = self.write_ndjson([
+            {'service': 'svc', 'config': {'timeout': 30}},
+            {'service': 'svc', 'environment': 'prod', 'config': {'timeout': 'slow'}},
+            '{not json',
+            {'service': 'ghost', 'environment': 'prod', 'config': {'timeout': 1}},
+            {'environment': 'prod'},
+            {'service': 'svc', 'environment': 'dev', 'config': {'timeout': 5}},
+        ])
+        report = import_records(self.manager, read_records(path))
+        self.assertEqual(report.applied, 2)
+        self.assertEqual([source for source, error in report.rejected], ['line 2', 'line 3', 'line 4', 'line 5'])
+        self.assertNotIn('ghost', self.storage.list_services())
+        self.assertEqual(self.manager.get_config('svc', 'dev').config_data, {'timeout': 5})
+
+    def test_import_directory_of_service_exports(self):
+        # Test importing files in the print-service-json layout
+        export_dir = os.path.join(self.tmp.name, 'exports')
+        os.makedirs(export_dir)
+        with open(os.path.join(export_dir, 'payment-service.json'), 'w') as f:
+            json.dump({'service_name': 'payment-service', 'configurations': {
+                'base': {'timeout': 30, 'retries': 3},
+                'production': {'timeout': 60, 'retries': 3},
+            }}, f)
+        storage = JournaledFileStorage(os.path.join(self.tmp.name, 'journal.json'))
+        manager = ConfigManager(storage)
+        report = import_records(manager, read_records(export_dir))
+        self.assertEqual((report.applied, report.rejected), (2, []))
+        entry = manager.get_config('payment-service', 'production')
+        self.assertEqual(entry.overrides, {'timeout': 60})
+        self.assertEqual(entry.config_data, {'timeout': 60, 'retries': 3})
+
+    def test_import_from_the_store_folder_skips_the_store(self):
+        # Test that exports written next to the store are imported without reading the store itself
+        self.manager.set_base_config('orders', {'timeout': 5})
+        with open(os.path.join(self.tmp.name, 'payment-service.json'), 'w') as f:
+            json.dump({'service_name': 'payment-service', 'configurations': {'base': {'timeout': 30}}}, f)
+        report = import_records(self.manager, read_records(self.tmp.name, store_files(self.storage)))
+        self.assertEqual((report.applied, report.rejected), (1, []))
+        self.assertEqual(sorted(FileStorage(self.storage.filename).list_services()), ['orders', 'payment-service'])
+
+class TestStreamingExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = ShardedStorage(os.path.join(self.tmp.name, 'shards'))
+        self.manager = ConfigManager(self.storage)
+        for name in ('payment-service', 'payment-gateway', 'order-service'):
+            self.manager.set_base_config(name, {'timeout': 30, 'retries': 3})
+            self.manager.set_env_config(name, 'production', {'timeout': 60})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ndjson_export_round_trips_through_import(self):
+        # Test that an NDJSON export re-imports to the same configs
+        path = os.path.join(self.tmp.name, 'export.ndjson.gz')
+        reopened = ShardedStorage(os.path.join(self.tmp.name, 'shards'))
+        with open_text(path, 'w', 'gzip') as out:
+            self.assertEqual(export_records(reopened, out), 3)
+        # Exported services are not kept in memory
+        self.assertEqual(reopened.services.loaded, {})
+        with gzip.open(path, 'rt') as f:
+            self.assertEqual(len(f.readlines()), 6)
+        target = ConfigManager(FileStorage(os.path.join(self.tmp.name, 'copy.json')))
+        report = import_records(target, read_records(path))
+        self.assertEqual((report.applied, report.rejected), (6, []))
+        self.assertEqual(target.get_config('order-service', 'production').overrides, {'timeout': 60})
+
+    def test_json_export_with_filters(self):
+        # Test the chunked JSON format with prefix and environment filters
+        out = io.StringIO()
+        count = export_records(self.storage, out, 'json', prefix='payment-', environment='production', resolved=True)
+        self.assertEqual(count, 2)
+        self.assertEqual(json.loads(out.getvalue()), {
+            'payment-service': {'production': {'timeout': 60, 'retries': 3}},
+            'payment-gateway': {'production': {'timeout': 60, 'retries': 3}},
+        })
+        empty = io.StringIO()
+        self.assertEqual(export_records(self.storage, empty, 'json', prefix='nothing'), 0)
+        self.assertEqual(json.loads(empty.getvalue()), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.changes import ChangeFeed, FeedGapError
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.feed = ChangeFeed(self.test_file + '.changes', max_events=5)
+        self.manager = ConfigManager(FileStorage(self.test_file), feed=self.feed)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_commit_publishes_changed_keys_and_versions(self):
+        # Test that each commit records which keys changed in which environment
+        self.manager.set_base_config('payment-service', {'timeout': 30, 'region': 'eu'})
+        self.manager.set_env_config('payment-service', 'production', {'timeout': 60})
+        self.manager.set_base_config('payment-service', {'timeout': 30})  # no actual change, no new version
+        with self.manager.transaction():
+            self.manager.set_base_config('payment-service', {'retries': 3})
+            self.manager.set_env_config('payment-service', 'production', {'timeout': 90})
+        events = [event.to_dict() for event in ChangeFeed(self.feed.filename).read()]
+        self.assertEqual([(e['sequence'], e['environment'], e['keys'], e['old_version'], e['new_version']) for e in events], [
+            (1, 'base', ['region', 'timeout'], 0, 1),
+            (2, 'production', ['timeout'], 1, 2),
+            (3, 'base', ['retries'], 2, 3),
+            (4, 'production', ['timeout'], 2, 3),
+        ])
+
+    def test_subscribe_resumes_and_filters(self):
+        # Test that a subscriber replays from a sequence number, then receives new matching events
+        self.manager.set_base_config('payment-service', {'timeout': 30})
+        self.manager.set_env_config('payment-service', 'production', {'timeout': 60})
+        self.manager.set_base_config('order-service', {'retries': 3})
+        seen = []
+        self.feed.subscribe(seen.append, since=1, service='payment-service', environment='staging')
+        self.manager.set_env_config('payment-service', 'staging', {'timeout': 5})
+        self.manager.set_env_config('payment-service', 'production', {'timeout': 70})
+        self.manager.set_base_config('payment-service', {'timeout': 40})
+        self.assertEqual([(event.sequence, event.environment) for event in seen], [(4, 'staging'), (6, 'base')])
+
+    def test_delete_and_trim(self):
+        # Test that deletions are recorded and a consumer that fell behind the trimmed feed is told so
+        self.manager.set_base_config('payment-service', {'timeout': 30})
+        self.assertTrue(self.manager.delete_service('payment-service'))
+        self.assertEqual(self.feed.read(1)[0].to_dict()['new_version'], None)
+        for i in range(10):
+            self.manager.set_base_config('order-service', {'retries': i})
+        self.assertLess(len(self.feed.read(self.feed.last_sequence - 5)), 10)
+        self.assertEqual(self.feed.last_sequence, 12)
+        with self.assertRaises(FeedGapError):
+            self.feed.read(0)
+
+    def test_publish_reads_only_the_ends_of_the_feed(self):
+        feed = ChangeFeed(self.feed.filename, max_events=1000)
+        manager = ConfigManager(FileStorage(self.test_file), feed=feed)
+        for i in range(50):
+            manager.set_base_config('order-service', {'retries': i})
+        with mock.patch.object(ChangeFeed, 'read_since', side_effect=AssertionError('whole feed read')), \
+                mock.patch.object(ChangeFeed, 'read', side_effect=AssertionError('whole feed read')):
+            manager.set_base_config('order-service', {'retries': 50})
+        self.assertEqual(feed.last_sequence, 51)
+
+    def test_follow_sees_changes_from_other_writers(self):
+        self.manager.set_base_config('payment-service', {'timeout': 30})
+        other = ConfigManager(FileStorage(self.test_file), feed=ChangeFeed(self.feed.filename, max_events=5))
+        other.set_env_config('payment-service', 'production', {'timeout': 60})
+        events = list(self.feed.follow(since=1, service='payment-service', poll_interval=0.01, timeout=0.05))
+        self.assertEqual([(event.sequence, event.environment) for event in events], [(2, 'production')])
+
+    def test_long_events_and_torn_last_line(self):
+        # Test that numbering continues after an event longer than one read-back chunk and a half-written line
+        self.manager.set_base_config('payment-service', {f'key_{k}': k for k in range(1000)})
+        self.assertGreater(os.path.getsize(self.feed.filename), 4096)
+        self.assertEqual(ChangeFeed(self.feed.filename).last_sequence, 1)
+        self.manager.set_base_config('payment-service', {'timeout': 30})
+        with open(self.feed.filename, 'a', encoding='utf-8') as f:
+            f.write('{"sequence": 3, "service": "pay')
+        self.assertEqual(self.feed.last_sequence, 2)
+        self.assertEqual([event.sequence for event in self.feed.read()], [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import unittest
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.locking import ConflictError
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Runs the CLI as `python -m` would, then reports whether typer was imported
+RUN_CLI = '''
+import runpy, sys
+sys.argv = ['cli'] + sys.argv[1:]
+try:
+    runpy.run_module('app_config_service.cli', run_name='__main__', alter_sys=True)
+except SystemExit:
+    pass
+print('typer imported' if 'typer' in sys.modules else 'typer not imported')
+'''
+
+class TestCliFastPath(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        manager = ConfigManager(FileStorage(self.test_file))
+        manager.set_base_config('payment-service', {'timeout': 30, 'retries': 3})
+        manager.set_env_config('payment-service', 'production', {'timeout': 60})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *args):
+        env = dict(os.environ, APP_CONFIG_PATH=self.test_file, APP_CONFIG_STORAGE='file')
+        return subprocess.run([sys.executable, '-c', RUN_CLI, *args], cwd=PACKAGE_ROOT, env=env,
+                              capture_output=True, text=True, timeout=60)
+
+    def test_script_takes_no_other_arguments(self):
+        env = dict(os.environ, APP_CONFIG_PATH=self.test_file, APP_CONFIG_STORAGE='file')
+        result = subprocess.run([sys.executable, '-m', 'app_config_service.cli', '--script', '-', 'list-services'],
+                                cwd=PACKAGE_ROOT, env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn('Usage: --script <file>', result.stderr)
+
+    def test_hot_reads_are_answered_without_typer(self):
+        result = self.run_cli('get-config', 'payment-service', 'production')
+        *output, marker = result.stdout.splitlines()
+        self.assertEqual(json.loads('\n'.join(output)), {'timeout': 60, 'retries': 3})
+        self.assertEqual(marker, 'typer not imported')
+        result = self.run_cli('list-services')
+        self.assertEqual(result.stdout.splitlines(), ['payment-service', 'typer not imported'])
+
+class CliTestCase(unittest.TestCase):
+    # Runs the typer app in this process against a store in a temporary folder
+    def setUp(self):
+        from typer.testing import CliRunner
+        from app_config_service import cli
+        self.cli = cli
+        self.runner = CliRunner()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.env = mock.patch.dict(os.environ, {'APP_CONFIG_PATH': self.test_file, 'APP_CONFIG_STORAGE': 'file'})
+        self.env.start()
+        cli._storage = cli._manager = None
+
+    def tearDown(self):
+        self.cli._storage = self.cli._manager = None
+        self.env.stop()
+        self.tmp.cleanup()
+
+@unittest.skipUnless(importlib.util.find_spec('typer'), 'typer is not installed')
+class TestCliLazyManager(CliTestCase):
+    def test_help_does_not_open_the_store(self):
+        result = self.runner.invoke(self.cli.app, ['--help'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIsNone(self.cli._storage)
+        self.assertIsNone(self.cli._manager)
+        self.assertFalse(os.path.exists(self.test_file))
+
+    def test_import_builds_the_manager_on_first_use(self):
+        records = os.path.join(self.tmp.name, 'records.ndjson')
+        with open(records, 'w') as f:
+            f.write(json.dumps({'service': 'orders', 'config': {'timeout': 30}}) + '\n')
+        result = self.runner.invoke(self.cli.app, ['import', records])
+        self.assertIn('Imported 1 record(s)', result.output)
+        self.assertIs(self.cli.get_manager(), self.cli._manager)
+        self.assertEqual(FileStorage(self.test_file).get_service('orders').get_configuration('base').config_data,
+                         {'timeout': 30})
+
+    def test_remove_key_visits_the_environments_in_the_key_index(self):
+        manager = ConfigManager(FileStorage(self.test_file))
+        manager.set_base_config('orders', {'timeout': 30, 'retries': 3})
+        manager.set_env_config('orders', 'production', {'timeout': 60})
+        manager.set_env_config('orders', 'staging', {'retries': 5})
+        self.runner.invoke(self.cli.app, ['query', 'timeout'])  # writes the sidecar
+        commands = os.path.join(self.tmp.name, 'commands.txt')
+        with open(commands, 'w') as f:
+            f.write('remove-key orders timeout\n')
+        found = []
+        lookup = self.cli.indexed_environments
+        with mock.patch.object(self.cli, 'indexed_environments', lambda *args: found.append(lookup(*args)) or found[-1]):
+            result = self.runner.invoke(self.cli.app, ['batch', commands])
+        self.assertIn('Batch applied', result.output)
+        self.assertEqual(found, [['base', 'production']])
+        service = FileStorage(self.test_file).get_service('orders')
+        self.assertEqual({env: entry.overrides for env, entry in service.configurations.items()},
+                         {'base': {'retries': 3}, 'production': {}, 'staging': {'retries': 5}})
+
+    def test_repl_remove_key_reports_what_was_not_found(self):
+        ConfigManager(FileStorage(self.test_file)).set_base_config('orders', {'timeout': 30})
+        output = io.StringIO()
+        commands = ['remove-key ghost timeout', 'remove-key orders retries', 'remove-key orders timeout', 'exit']
+        with mock.patch('builtins.input', side_effect=commands), contextlib.redirect_stdout(output):
+            self.cli.interactive_cli()
+        self.assertIn("Service 'ghost' not found.", output.getvalue())
+        self.assertIn("Key 'retries' not found in the base config of 'orders'.", output.getvalue())
+        self.assertEqual(output.getvalue().count('removed from'), 1)
+
+    def test_diff_between_recorded_versions(self):
+        self.runner.invoke(self.cli.app, ['set-base', 'orders', '{"timeout": 30, "retries": 3}'])
+        self.runner.invoke(self.cli.app, ['set-base', 'orders', '{"timeout": 45}'])
+        result = self.runner.invoke(self.cli.app, ['diff', '--service', 'orders', '--version', '1', '--json'])
+        self.assertEqual(json.loads(result.output)['changed'],
+                         {'timeout': {'old': 30, 'old_type': 'int', 'new': 45, 'new_type': 'int'}})
+        result = self.runner.invoke(self.cli.app, ['diff', '--service', 'orders', '--version', '1', '--version', '7'])
+        self.assertIn("Version 7 of 'orders' is not in the history.", result.output)
+
+@unittest.skipUnless(importlib.util.find_spec('typer'), 'typer is not installed')
+class TestCliScript(CliTestCase):
+    def run_script(self, lines):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            errors = self.cli.run_script(lines)
+        return errors, output.getvalue()
+
+    def stored(self, service_name='orders'):
+        service = FileStorage(self.test_file).get_service(service_name)
+        return {env: entry.overrides for env, entry in service.configurations.items()}
+
+    def test_commit_and_rollback(self):
+        errors, output = self.run_script([
+            'set-base orders {"timeout": 30, "retries": 3}',
+            'commit',
+            'set-env orders production {"timeout": 60}',
+            'rollback',
+            'set-env orders staging {"timeout": 5}',
+        ])
+        self.assertEqual(errors, 0)
+        self.assertIn('2 change(s) saved in 2 commit(s), 0 error(s)', output)
+        self.assertEqual(self.stored(), {'base': {'timeout': 30, 'retries': 3}, 'staging': {'timeout': 5}})
+
+    def test_failed_lines_are_skipped(self):
+        errors, output = self.run_script([
+            'set-base orders {"timeout": 30}',
+            'set-env orders production {"timeout": "soon"}',
+            'set-env orders production {"timeout": ',
+            'set-env orders staging {"timeout": 5}',
+        ])
+        self.assertEqual(errors, 2)
+        self.assertIn('Line 2 skipped', output)
+        self.assertIn('Line 3 skipped: invalid JSON.', output)
+        self.assertEqual(self.stored(), {'base': {'timeout': 30}, 'staging': {'timeout': 5}})
+
+    def other_process_writes(self, change):
+        # Lines of a script during which another process commits change(manager) to the store
+        ConfigManager(FileStorage(self.test_file)).set_base_config('orders', {'timeout': 30, 'retries': 3})
+        def lines():
+            yield 'set-env orders production {"retries": 5}'
+            change(ConfigManager(FileStorage(self.test_file)))
+            yield 'set-base orders {"region": "eu"}'
+        return lines()
+
+    def test_conflicting_block_is_replayed(self):
+        errors, output = self.run_script(self.other_process_writes(lambda other: other.set_base_config('orders', {'timeout': 45})))
+        self.assertEqual(errors, 0)
+        self.assertEqual(self.stored(), {'base': {'timeout': 45, 'retries': 3, 'region': 'eu'}, 'production': {'retries': 5}})
+
+    def test_failed_replay_counts_every_line_of_the_block(self):
+        # Test that a block whose replay no longer validates is reported line by line, not raised
+        errors, output = self.run_script(self.other_process_writes(lambda other: other.remove_key_from_base('orders', 'retries')))
+        self.assertEqual(errors, 2)
+        self.assertIn('Line 1 skipped', output)
+        self.assertIn('Line 2 skipped', output)
+        self.assertIn('0 change(s) saved in 0 commit(s), 2 error(s)', output)
+        self.assertEqual(self.stored(), {'base': {'timeout': 30}})
+
+    def test_replay_conflict_is_reported(self):
+        # Test that a block that keeps losing the write race is reported once the retries run out
+        ConfigManager(FileStorage(self.test_file)).set_base_config('orders', {'timeout': 30})
+        manager = self.cli.get_manager()
+        manager.max_retries = 1
+        with mock.patch.object(manager, '_save', side_effect=ConflictError('orders', 1, 2)):
+            errors, output = self.run_script(['set-base orders {"timeout": 45}', 'set-env orders production {"timeout": 60}'])
+        self.assertEqual(errors, 2)
+        self.assertIn("Line 2 skipped: Service 'orders' changed concurrently", output)
+        self.assertEqual(self.stored(), {'base': {'timeout': 30}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import os
+import tempfile
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.commands import apply_command, split_command
+
+class TestCommands(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.manager = ConfigManager(FileStorage(self.test_file))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_json_is_taken_as_typed_or_shell_quoted(self):
+        self.assertEqual(split_command('set-base payment-service {"timeout": 30, "retries": 3}'),
+                         ['set-base', 'payment-service', '{"timeout": 30, "retries": 3}'])
+        self.assertEqual(split_command("set-env payment-service production '{\"timeout\": 60}'"),
+                         ['set-env', 'payment-service', 'production', '{"timeout": 60}'])
+        self.assertEqual(split_command('set-env "my service" production {"note": "a # b"}', comments=True),
+                         ['set-env', 'my service', 'production', '{"note": "a # b"}'])
+        self.assertEqual(split_command('remove-key payment-service retries  # no longer used', comments=True),
+                         ['remove-key', 'payment-service', 'retries'])
+        self.assertEqual(split_command('# comment only', comments=True), [])
+        self.assertEqual(split_command('set-base payment-service {"timeout": 30}  # seconds', comments=True),
+                         ['set-base', 'payment-service', '{"timeout": 30}'])
+        self.assertEqual(split_command("set-base payment-service '{\"timeout\": 30}'  # seconds", comments=True),
+                         ['set-base', 'payment-service', '{"timeout": 30}'])
+        self.assertEqual(split_command('set-base payment-service  # later', comments=True), ['set-base', 'payment-service'])
+
+    def test_documented_batch_lines_apply(self):
+        lines = ['set-base payment-service {"timeout": 30, "retries": 3}',
+                 'set-env payment-service production {"timeout": 60}',
+                 'remove-key payment-service retries']
+        with self.manager.transaction():
+            for line in lines:
+                apply_command(self.manager, split_command(line, comments=True))
+        service = FileStorage(self.test_file).get_service('payment-service')
+        self.assertEqual(service.get_configuration('production').config_data, {'timeout': 60})
+        with self.assertRaises(ValueError):
+            apply_command(self.manager, split_command('set-env payment-service'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,26 @@
 import unittest
 # from app_config_service.storage import InMemoryStorage
 from app_config_service.storage import FileStorage
-from app_config_service.config_manager import ConfigManager
+from app_config_service.config_manager import ConfigManager, ThreadSafeConfigManager
+from app_config_service.validation import SchemaError
+from app_config_service.instrumentation import metrics
 import os
+import json
+import tempfile
+import threading
+import time
 
 class TestConfigManager(unittest.TestCase):
     def setUp(self):
         # self.storage = InMemoryStorage()
-        # Use a test-specific file to avoid clobbering real data
-        self.test_file = "config/test_config_data.json"
-        # Remove the file before each test to ensure isolation
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
+        # A fresh folder per test, so neither the store nor its sidecars (.idx, .lock) touch real data
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'test_config_data.json')
         self.storage = FileStorage(self.test_file)
         self.manager = ConfigManager(self.storage)
 
     def tearDown(self):
-        # Clean up the test file after each test
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
+        self.tmp.cleanup()
 
     def test_add_service_and_base_config(self):
         # Test adding a service and setting its base configuration
@@ -233,5 +235,223 @@ class TestConfigManager(unittest.TestCase):
             self.assertEqual(data['prod']['timeout'], 456)
         os.remove(out_file)
 
+    def test_transaction_commits_once(self):
+        # Test that a transaction stages many changes and saves once at the end
+        saves = []
+        original_save = self.storage.save_services
+        self.storage.save_services = lambda *args: (saves.append(1), original_save(*args))
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30, 'retry_attempts': 3})
+        saves.clear()
+        with self.manager.transaction():
+            for env in ('dev', 'staging', 'production'):
+                self.manager.set_env_config('payment-service', env, {'timeout_seconds': 60})
+            self.manager.set_base_config('payment-service', {'currency': 'USD'})
+            self.assertEqual(saves, [])
+        self.assertEqual(saves, [1])
+        reloaded = FileStorage(self.test_file).get_service('payment-service')
+        self.assertEqual(reloaded.get_configuration('production').config_data['currency'], 'USD')
+
+    def test_transaction_rolls_back_all_changes(self):
+        # Test that a failing step undoes every change made in the transaction
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        with self.assertRaises(ValueError):
+            with self.manager.transaction():
+                self.manager.set_base_config('payment-service', {'timeout_seconds': 45})
+                self.manager.set_base_config('new-service', {'retries': 1})
+                self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 'bad'})
+        self.assertNotIn('new-service', self.storage.list_services())
+        base = self.storage.get_service('payment-service').get_configuration('base')
+        self.assertEqual(base.config_data, {'timeout_seconds': 30})
+        self.assertIsNone(self.manager.current_transaction)
+
+    def test_begin_commit_rollback(self):
+        # Test the explicit transaction API
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.manager.begin()
+        with self.assertRaises(ValueError):
+            self.manager.begin()
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 45})
+        self.manager.rollback()
+        self.assertEqual(self.manager.get_config('payment-service', 'base').config_data['timeout_seconds'], 30)
+        with self.assertRaises(ValueError):
+            self.manager.commit()
+
+    def test_environments_are_overlays_on_base(self):
+        # Test that environments store only overrides and resolve the rest from base
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30, 'retry_attempts': 3})
+        self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+        self.manager.set_base_config('payment-service', {'retry_attempts': 5, 'currency': 'USD'})
+        entry = self.manager.get_config('payment-service', 'production')
+        self.assertEqual(entry.overrides, {'timeout_seconds': 60})
+        self.assertEqual(entry.config_data, {'timeout_seconds': 60, 'retry_attempts': 5, 'currency': 'USD'})
+        with open(self.test_file) as f:
+            saved = json.load(f)['payment-service']['configurations']['production']
+        self.assertEqual(saved['overrides'], {'timeout_seconds': 60})
+        self.assertNotIn('config_data', saved)
+
+    def test_materialized_environments_load_as_overrides(self):
+        # Test that stores written before overlays load with only the differing keys
+        legacy = {'legacy-service': {'name': 'legacy-service', 'configurations': {
+            'base': {'environment': 'base', 'config_data': {'timeout': 30, 'retries': 3},
+                     'created_at': '2024-01-01T00:00:00+00:00', 'updated_at': '2024-01-01T00:00:00+00:00'},
+            'prod': {'environment': 'prod', 'config_data': {'timeout': 60, 'retries': 3},
+                     'created_at': '2024-01-01T00:00:00+00:00', 'updated_at': '2024-01-01T00:00:00+00:00'},
+        }}}
+        with open(self.test_file, 'w') as f:
+            json.dump(legacy, f)
+        entry = ConfigManager(FileStorage(self.test_file)).get_config('legacy-service', 'prod')
+        self.assertEqual(entry.overrides, {'timeout': 60})
+        self.assertEqual(entry.config_data, {'timeout': 60, 'retries': 3})
+
+    def test_version_bumps_once_per_commit(self):
+        # Test that each committed change bumps the service version and persists it
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+        with self.manager.transaction():
+            self.manager.set_base_config('payment-service', {'retries': 1})
+            self.manager.set_base_config('payment-service', {'retries': 2})
+        self.assertEqual(self.storage.get_service('payment-service').version, 3)
+        self.assertEqual(FileStorage(self.test_file).get_service('payment-service').version, 3)
+
+    def test_get_config_json_is_cached_by_version(self):
+        # Test that repeat reads hit the cache and mutations are visible immediately
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        first = self.manager.get_config_json('payment-service', 'production')
+        self.assertEqual(json.loads(first), {'timeout_seconds': 30})
+        self.assertIs(self.manager.get_config_json('payment-service', 'production'), first)
+        self.assertEqual(self.manager.cache.stats()['hits'], 1)
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 45})
+        self.assertEqual(json.loads(self.manager.get_config_json('payment-service', 'production')), {'timeout_seconds': 45})
+        self.assertEqual(self.manager.cache.stats()['misses'], 2)
+        self.assertIsNone(self.manager.get_config_json('ghost-service', 'production'))
+
+    def test_deleted_service_is_not_served_from_cache(self):
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.manager.get_config_json('payment-service', 'base')
+        self.assertTrue(self.manager.delete_service('payment-service'))
+        self.manager.set_base_config('payment-service', {'retries': 3})
+        self.assertEqual(json.loads(self.manager.get_config_json('payment-service', 'base')), {'retries': 3})
+
+    def test_bool_is_not_accepted_for_int_key(self):
+        # Test that type codes are exact: bool subclasses int but is rejected for an int key
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30, 'enabled': False})
+        with self.assertRaises(ValueError):
+            self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': True})
+        with self.assertRaises(ValueError):
+            self.manager.set_base_config('payment-service', {'enabled': 1})
+
+    def test_schema_reports_every_mismatch(self):
+        # Test that all problems in a payload are reported together
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30, 'currency': 'USD'})
+        with self.assertRaises(SchemaError) as ctx:
+            self.manager.set_env_config('payment-service', 'production',
+                                        {'timeout_seconds': '60', 'currency': 1, 'unknown': 1})
+        self.assertEqual(len(ctx.exception.errors), 3)
+
+    def test_schema_is_cached_until_base_keys_change(self):
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        service = self.storage.get_service('payment-service')
+        schema = service.get_schema()
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 45})
+        self.assertIs(service.get_schema(), schema)
+        self.manager.set_base_config('payment-service', {'currency': 'USD'})
+        self.assertEqual(service.get_schema().types, {'timeout_seconds': 'int', 'currency': 'str'})
+        self.manager.remove_key_from_base('payment-service', 'currency')
+        self.assertEqual(service.get_schema().types, {'timeout_seconds': 'int'})
+
+    def test_validate_env_configs_in_one_pass(self):
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        rejected = self.manager.validate_env_configs('payment-service', [
+            {'timeout_seconds': 1}, {'timeout_seconds': 'x'}, {'timeout_seconds': 2}, {'other': 1}])
+        self.assertEqual([index for index, errors in rejected], [1, 3])
+
+    def test_instrumentation_records_phases(self):
+        # Test that enabled metrics time each phase and feed registered listeners
+        metrics.reset()
+        metrics.enabled = True
+        seen = []
+        listener = lambda kind, name, value: seen.append((kind, name))
+        metrics.add_listener(listener)
+        try:
+            self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+            self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+            self.manager.remove_key_from_base('payment-service', 'timeout_seconds')
+            FileStorage(self.test_file).get_service('payment-service')
+        finally:
+            metrics.enabled = False
+            metrics.remove_listener(listener)
+        for phase in ('load', 'deserialize', 'validate', 'propagate', 'serialize', 'write'):
+            self.assertIn(phase, metrics.timings)
+        self.assertIn(('timer', 'validate'), seen)
+        self.assertIn('validate', metrics.report())
+        metrics.reset()
+
+class TestThreadSafeConfigManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = FileStorage(os.path.join(self.tmp.name, 'config_data.json'))
+        self.manager = ThreadSafeConfigManager(self.storage)
+        self.manager.set_base_config('payment-service', {'a': 0, 'b': 0, 'hosts': ['x']})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshots_are_immutable_and_detached(self):
+        # Test that readers get a read-only copy that later writes leave alone
+        snapshot = self.manager.get_config('payment-service', 'base')
+        with self.assertRaises(TypeError):
+            snapshot.config_data['a'] = 1
+        self.assertEqual(snapshot.config_data['hosts'], ('x',))
+        self.assertIs(self.manager.get_config('payment-service', 'base'), snapshot)
+        self.manager.set_base_config('payment-service', {'a': 5})
+        self.assertEqual(snapshot.config_data['a'], 0)
+        fresh = self.manager.get_config('payment-service', 'base')
+        self.assertEqual((fresh.version, fresh.config_data['a']), (2, 5))
+        self.assertEqual(json.loads(self.manager.get_config_json('payment-service', 'base'))['hosts'], ['x'])
+
+    def test_readers_never_see_half_applied_transactions(self):
+        # Test that concurrent readers always see a and b from the same commit
+        stop = threading.Event()
+        torn = []
+
+        def read():
+            while not stop.is_set():
+                config = self.manager.get_config('payment-service', 'base').config_data
+                if config['a'] != config['b']:
+                    torn.append(dict(config))
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for i in range(1, 101):
+            with self.manager.transaction():
+                self.manager.set_base_config('payment-service', {'a': i})
+                time.sleep(0.0005)  # let readers run between the two changes
+                self.manager.set_base_config('payment-service', {'b': i})
+        stop.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(torn, [])
+        self.assertEqual(self.manager.get_config('payment-service', 'base').config_data['b'], 100)
+
+    def test_open_transaction_does_not_block_readers(self):
+        # Test that a transaction in another thread is invisible to (and does not block) readers until it commits
+        staged, release = threading.Event(), threading.Event()
+
+        def write():
+            with self.manager.transaction():
+                self.manager.set_base_config('payment-service', {'a': 1, 'b': 1})
+                self.assertEqual(self.manager.get_config('payment-service', 'base').config_data['a'], 1)
+                staged.set()
+                release.wait(5)
+        self.manager.get_config('payment-service', 'base')
+        writer = threading.Thread(target=write)
+        writer.start()
+        self.assertTrue(staged.wait(5))
+        self.assertIsNone(self.manager.current_transaction)
+        self.assertEqual(self.manager.get_config('payment-service', 'base').config_data['a'], 0)
+        release.set()
+        writer.join()
+        self.assertEqual(self.manager.get_config('payment-service', 'base').config_data['a'], 1)
+
 if __name__ == '__main__':
     unittest.main()
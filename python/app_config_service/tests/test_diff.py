@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.diff import DiffEngine, content_hash, diff_configs
+
+class TestDiffEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.manager = ConfigManager(FileStorage(self.test_file))
+        self.manager.set_base_config('orders', {'timeout': 30, 'retries': 3, 'debug': False})
+        self.manager.set_env_config('orders', 'staging', {'debug': True})
+        self.manager.set_env_config('orders', 'production', {'timeout': 60})
+        self.manager.set_base_config('billing', {'timeout': 30, 'region': 'eu'})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_diff_configs_reports_types(self):
+        # Test that added, removed and changed keys are reported, with 1 vs 1.0 vs True as changes
+        diff = diff_configs({'a': 1, 'b': 'x', 'c': 1, 'd': [1]}, {'a': 1, 'c': True, 'd': [1], 'e': 2.5},
+                            ('svc', 'staging'), ('svc', 'production'))
+        self.assertEqual((diff.added, diff.removed, diff.changed), ({'e': 2.5}, {'b': 'x'}, {'c': (1, True)}))
+        data = diff.to_dict()
+        self.assertEqual(data['changed']['c'], {'old': 1, 'old_type': 'int', 'new': True, 'new_type': 'bool'})
+        self.assertEqual(data['added']['e'], {'value': 2.5, 'type': 'float'})
+        self.assertIn('~ c: 1 (int) -> true (bool)', diff.format())
+        self.assertNotEqual(content_hash({'a': 1}), content_hash({'a': 1.0}))
+        self.assertEqual(content_hash({'a': 1, 'b': 2}), content_hash({'b': 2, 'a': 1}))
+
+    def test_environments_across_all_services(self):
+        # Test one pass over every service, with identical environments skipped by hash
+        engine = DiffEngine()
+        diffs = list(engine.diff_environments(self.manager.storage, 'staging', 'production'))
+        self.assertEqual(len(diffs), 1)
+        self.assertEqual((diffs[0].left, diffs[0].right), (('orders', 'staging'), ('orders', 'production')))
+        self.assertEqual(diffs[0].changed, {'timeout': (30, 60), 'debug': (True, False)})
+        self.assertEqual((engine.compared, engine.skipped), (1, 1))  # billing resolves both to base
+        list(engine.diff_environments(self.manager.storage, 'staging', 'production'))
+        self.assertEqual(engine.hashes.stats()['misses'], 4)  # each stored entry hashed once, base shared by envs
+
+    def test_two_services(self):
+        engine = DiffEngine()
+        storage = self.manager.storage
+        diff = engine.diff_services(storage.get_service('orders'), 'base', storage.get_service('billing'), 'base')
+        self.assertEqual((diff.added, diff.removed), ({'region': 'eu'}, {'retries': 3, 'debug': False}))
+        missing = engine.diff_services(storage.get_service('orders'), 'base', None, 'base', right_name='gone')
+        self.assertEqual(missing.right, ('gone', 'base'))
+        self.assertEqual(len(missing.removed), 3)
+
+    def test_store_against_backup_skips_unchanged_services_unread(self):
+        # Test that services with byte-identical JSON in both stores are never decoded
+        backup = FileStorage(os.path.join(self.tmp.name, 'backup.json'))
+        for service in self.manager.storage.iter_services():
+            backup.services[service.name] = service
+        backup.save()
+        self.manager.set_env_config('orders', 'production', {'timeout': 90})
+        self.manager.set_base_config('search', {'replicas': 2})
+        current, old = FileStorage(self.test_file), FileStorage(backup.filename)
+        self.assertEqual(old.services.loaded, {})
+        engine = DiffEngine()
+        diffs = {(d.left[0], d.left[1]): d for d in engine.diff_stores(old, current)}
+        self.assertEqual(diffs[('orders', 'production')].changed, {'timeout': (60, 90)})
+        self.assertEqual(diffs[('search', 'base')].added, {'replicas': 2})
+        self.assertEqual(set(diffs), {('orders', 'production'), ('search', 'base')})
+        self.assertEqual(engine.skipped, 3)  # billing by its bytes, orders base and staging by hash
+        self.assertEqual((old.services.loaded, current.services.loaded), ({}, {}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.history import VersionHistory, history_path, resolve_state
+
+class TestVersionHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.storage = FileStorage(self.test_file)
+        self.manager = ConfigManager(self.storage, history=VersionHistory(history_path(self.storage)))
+        self.manager.set_base_config('orders', {'timeout': 30, 'retries': 3})  # version 1
+        self.manager.set_env_config('orders', 'production', {'timeout': 60})  # version 2
+        self.manager.set_base_config('orders', {'retries': 5})  # version 3
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_every_version_can_be_shown(self):
+        history = self.manager.history
+        self.assertEqual([record.version for record in history.read('orders')], [1, 2, 3])
+        self.assertEqual(history.read('orders')[2].keys(), {'base': ['retries']})
+        self.assertEqual(history.state_at('orders', 1), {'base': {'timeout': 30, 'retries': 3}})
+        self.assertEqual(resolve_state(history.state_at('orders', 2), 'production'), {'timeout': 60, 'retries': 3})
+        self.assertEqual(resolve_state(history.state_at('orders', 3), 'staging'), {'timeout': 30, 'retries': 5})
+        self.assertIsNone(history.state_at('orders', 4))
+        self.assertEqual(history.read('missing'), [])
+
+    def test_rollback_commits_a_new_version(self):
+        self.manager.restore_version('orders', 1)
+        service = FileStorage(self.test_file).get_service('orders')
+        self.assertEqual(service.version, 4)
+        self.assertEqual(list(service.configurations), ['base'])
+        self.assertEqual(service.get_configuration('base').config_data, {'timeout': 30, 'retries': 3})
+        self.assertEqual(self.manager.history.read('orders')[-1].keys(), {'base': ['retries'], 'production': []})
+        self.manager.restore_version('orders', 3)
+        self.assertEqual(self.manager.get_config('orders', 'production').config_data, {'timeout': 60, 'retries': 5})
+        with self.assertRaises(ValueError):
+            self.manager.restore_version('orders', 9)
+
+    def test_versions_are_diffed_as_resolved_configs(self):
+        diffs = self.manager.history.diff('orders', 1)
+        self.assertEqual([(d.left, d.right) for d in diffs], [(('orders@1', 'base'), ('orders@3', 'base')),
+                                                              (('orders@1', 'production'), ('orders@3', 'production'))])
+        self.assertEqual(diffs[0].changed, {'retries': (3, 5)})
+        self.assertEqual(diffs[1].changed, {'timeout': (30, 60), 'retries': (3, 5)})
+        production = self.manager.history.diff('orders', 2, 3, environment='production')
+        self.assertEqual([d.changed for d in production], [{'retries': (3, 5)}])
+        self.assertTrue(self.manager.history.diff('orders', 2, 2)[0].identical)
+        with self.assertRaises(ValueError):
+            self.manager.history.diff('orders', 1, 9)
+
+    def test_history_grows_with_the_change_not_the_config(self):
+        # Test that versions changing one key of a large config store about one key each
+        history = VersionHistory(history_path(self.storage) + '-large', max_versions=None, checkpoint_every=50)
+        manager = ConfigManager(self.storage, history=history)
+        manager.set_base_config('search', {f'key_{k}': 'x' * 20 for k in range(200)})
+        first = os.path.getsize(history.filename)
+        for version in range(2, 50):
+            manager.set_base_config('search', {'key_0': f'value-{version}'})
+        per_version = (os.path.getsize(history.filename) - first) / 48
+        self.assertLess(per_version, first / 20)
+        self.assertEqual(history.state_at('search', 30)['base']['key_0'], 'value-30')
+        self.assertEqual(history.state_at('search', 30)['base']['key_199'], 'x' * 20)
+
+    def test_retention_keeps_latest_versions_restorable(self):
+        history = VersionHistory(history_path(self.storage) + '-short', max_versions=5, checkpoint_every=50)
+        manager = ConfigManager(self.storage, history=history)
+        for version in range(1, 13):
+            manager.set_base_config('billing', {'region': f'eu-{version}'})
+        versions = [record.version for record in history.read('billing')]
+        self.assertTrue(5 <= len(versions) < 10)
+        self.assertEqual(versions[-1], 12)
+        self.assertEqual(history.state_at('billing', versions[0]), {'base': {'region': f'eu-{versions[0]}'}})
+        self.assertIsNone(history.state_at('billing', 1))
+
+    def test_unchanged_commits_add_no_version(self):
+        self.manager.set_base_config('orders', {'retries': 5})
+        self.manager.set_env_config('orders', 'production', {'timeout': 60})
+        self.assertEqual(FileStorage(self.test_file).get_service('orders').version, 3)
+        self.assertEqual([record.version for record in self.manager.history.read('orders')], [1, 2, 3])
+
+    def test_deleting_a_service_ends_its_history(self):
+        # Test that a later service under the same name does not replay the old one's versions
+        self.manager.delete_service('orders')
+        self.assertEqual(self.manager.history.read('orders'), [])
+        self.manager.set_base_config('orders', {'timeout': 10})
+        self.assertEqual(self.manager.history.state_at('orders', 1), {'base': {'timeout': 10}})
+
+    def test_history_started_on_an_existing_store(self):
+        # Test that the first recorded change of an older service is a full checkpoint
+        plain = ConfigManager(FileStorage(self.test_file))
+        plain.set_base_config('search', {'replicas': 1, 'shards': 4})
+        plain.set_base_config('search', {'replicas': 2})
+        manager = ConfigManager(FileStorage(self.test_file), history=VersionHistory(history_path(self.storage)))
+        manager.set_base_config('search', {'replicas': 3})
+        self.assertEqual(self.manager.history.state_at('search', 3), {'base': {'replicas': 3, 'shards': 4}})
+        self.assertIsNone(self.manager.history.state_at('search', 2))
+
+    def test_new_process_reads_only_records_after_the_summary(self):
+        # Test that a fresh VersionHistory restores the summary and scans only the records written since
+        history = VersionHistory(history_path(self.storage) + '-summary', max_versions=3)
+        history.summary_bytes = 1  # save after every append
+        manager = ConfigManager(self.storage, history=history)
+        for version in range(1, 8):  # trimmed at 6 records
+            manager.set_base_config('search', {'replicas': version})
+        history.summary_bytes = None
+        manager.set_base_config('search', {'replicas': 8})  # after the summary
+        fresh = VersionHistory(history.filename, max_versions=3)
+        with mock.patch.object(VersionHistory, '_scan', autospec=True, side_effect=VersionHistory._scan) as scan:
+            with fresh.lock:
+                fresh.catch_up()
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual((fresh.latest['search'], fresh.counts['search']), (8, 5))
+        self.assertEqual(history.state_at('search', 4), {'base': {'replicas': 4}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import os
+import random
+import tempfile
+from app_config_service.storage import FileStorage, file_signature, store_files
+from app_config_service.config_manager import ConfigManager
+from app_config_service.models import Service
+from app_config_service.key_index import (KeyIndex, index_storage, key_index_path, match_postings, read_key_postings,
+                                          write_key_index)
+
+class TestKeyIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = FileStorage(os.path.join(self.tmp.name, 'config_data.json'))
+        self.manager = ConfigManager(self.storage)
+        self.manager.set_base_config('orders', {'db_pool_size': 40, 'debug': False})
+        self.manager.set_env_config('orders', 'production', {'db_pool_size': 80})
+        self.manager.set_env_config('orders', 'staging', {'debug': True})
+        self.manager.set_base_config('billing', {'db_pool_size': 60, 'region': 'eu'})
+        self.manager.set_env_config('billing', 'staging', {'region': 'us'})
+        self.manager.set_base_config('search', {'replicas': 1})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_existence_equality_and_range_filters(self):
+        self.assertEqual(self.manager.query('db_pool_size'),
+                         [('billing', 'base', 60), ('orders', 'base', 40), ('orders', 'production', 80)])
+        self.assertEqual(self.manager.query('db_pool_size', [('>', 50)]), [('billing', 'base', 60), ('orders', 'production', 80)])
+        self.assertEqual(self.manager.query('db_pool_size', [('>=', 40), ('<', 60)]), [('orders', 'base', 40)])
+        self.assertEqual(self.manager.query('region', [('=', 'us')]), [('billing', 'staging', 'us')])
+        self.assertEqual(self.manager.query('debug', [('=', 0)]), [])  # False is not 0
+        self.assertEqual(self.manager.query('missing'), [])
+        with self.assertRaises(ValueError):
+            self.manager.query('db_pool_size', [('>', 'fifty')])
+
+    def test_environment_resolves_through_base(self):
+        # Test that an environment without its own override matches on the base value
+        self.assertEqual(self.manager.query('db_pool_size', [('>', 50)], environment='staging'), [('billing', 'staging', 60)])
+        self.assertEqual(self.manager.query('db_pool_size', environment='production'),
+                         [('billing', 'production', 60), ('orders', 'production', 80)])
+        # as get_config does, a service without the environment falls back to base
+        self.assertEqual(self.manager.get_config('billing', 'production').config_data['db_pool_size'], 60)
+
+    def test_index_follows_commits_and_deletes(self):
+        self.manager.query('db_pool_size')
+        self.manager.set_env_config('billing', 'production', {'db_pool_size': 90})
+        self.manager.remove_key_from_base('orders', 'db_pool_size')
+        self.manager.delete_service('search')
+        self.assertEqual(self.manager.query('db_pool_size'), [('billing', 'base', 60), ('billing', 'production', 90)])
+        self.assertEqual(self.manager.query('replicas'), [])
+        rebuilt = index_storage(FileStorage(self.storage.filename))
+        self.assertEqual(rebuilt.postings, self.manager.keys.postings)
+
+    def test_remove_key_uses_index_for_environments(self):
+        # Test that only environments the index lists are touched, and the key is gone everywhere
+        self.manager.query('db_pool_size')
+        touched = []
+        original = self.manager.keys.environments_with
+        self.manager.keys.environments_with = lambda service, key: touched.append(service) or original(service, key)
+        self.manager.remove_key_from_base('orders', 'db_pool_size')
+        self.assertEqual(touched, ['orders'])
+        service = FileStorage(self.storage.filename).get_service('orders')
+        self.assertTrue(all('db_pool_size' not in entry.overrides for entry in service.configurations.values()))
+
+    def test_value_index_matches_full_scan(self):
+        rng = random.Random(7)
+        indexed, scanned = KeyIndex(values=True), KeyIndex(values=False)
+        for step in range(300):
+            service = Service(f'service-{rng.randrange(20)}')
+            service.add_configuration('base', {'size': rng.choice([1, 2, 2.5, 3, True, 'x', None])})
+            service.add_configuration('production', {'size': rng.choice([2, 4])})
+            indexed.update_service(service)
+            scanned.update_service(service)
+        for filters in ([('=', 2)], [('=', True)], [('>', 1)], [('<=', 2.5)], [('>=', 2), ('!=', 3)], [('=', None)]):
+            self.assertEqual(indexed.query('size', filters), scanned.query('size', filters), filters)
+
+    def test_sidecar_reads_one_key_until_store_changes(self):
+        path = key_index_path(self.storage)
+        signature = file_signature(store_files(self.storage))
+        write_key_index(path, index_storage(self.storage), signature)
+        postings = read_key_postings(path, 'region', signature)
+        self.assertEqual(postings, {'billing': {'base': 'eu', 'staging': 'us'}})
+        self.assertEqual(match_postings(postings, [('=', 'eu')], 'production'), [('billing', 'production', 'eu')])
+        self.assertEqual(match_postings(postings, [('=', 'eu')], 'staging'), [])
+        self.assertEqual(match_postings(postings, [('=', 'eu')], 'base'), [('billing', 'base', 'eu')])
+        self.assertEqual(read_key_postings(path, 'missing', signature), {})
+        self.manager.set_base_config('search', {'replicas': 2})
+        self.assertIsNone(read_key_postings(path, 'region', file_signature(store_files(self.storage))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from app_config_service.storage import FileStorage, JournaledFileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.locking import ConflictError, FileLock, LockTimeout
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Each worker increments a shared counter with read-modify-write transactions
+WORKER = '''
+import sys
+from app_config_service.storage import FileStorage, JournaledFileStorage
+from app_config_service.config_manager import ConfigManager
+backend, path, increments = sys.argv[1], sys.argv[2], int(sys.argv[3])
+manager = ConfigManager({'file': FileStorage, 'journal': JournaledFileStorage}[backend](path))
+def bump():
+    current = manager.get_config('counter-service', 'base').config_data['counter']
+    manager.set_base_config('counter-service', {'counter': current + 1})
+for _ in range(increments):
+    manager.run_transaction(bump, retries=1000)
+'''
+
+class TestMultiProcessWrites(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_workers(self, backend, storage_class, workers=4, increments=25):
+        ConfigManager(storage_class(self.test_file)).set_base_config('counter-service', {'counter': 0})
+        env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+        processes = [subprocess.Popen([sys.executable, '-c', WORKER, backend, self.test_file, str(increments)], env=env)
+                     for _ in range(workers)]
+        self.assertEqual([process.wait(timeout=120) for process in processes], [0] * workers)
+        service = storage_class(self.test_file).get_service('counter-service')
+        self.assertEqual(service.get_configuration('base').config_data['counter'], workers * increments)
+        self.assertEqual(service.version, workers * increments + 1)
+
+    def test_no_lost_updates_file_storage(self):
+        # Test that concurrent writer processes never overwrite each other's increments
+        self.run_workers('file', FileStorage)
+
+    def test_no_lost_updates_journaled_storage(self):
+        self.run_workers('journal', JournaledFileStorage)
+
+    def test_stale_write_raises_conflict_and_retries(self):
+        # Test that a write based on an outdated read is refused, then succeeds on fresh state
+        first = ConfigManager(FileStorage(self.test_file))
+        first.set_base_config('payment-service', {'timeout': 30})
+        second = ConfigManager(FileStorage(self.test_file))
+        second.get_config('payment-service', 'base')
+        first.set_base_config('payment-service', {'timeout': 60})
+        with self.assertRaises(ConflictError) as raised:
+            second.run_transaction(lambda: second.set_base_config('payment-service', {'retries': 3}), retries=0)
+        self.assertEqual((raised.exception.expected, raised.exception.actual), (1, 2))
+        second.set_base_config('payment-service', {'retries': 3})
+        config = FileStorage(self.test_file).get_service('payment-service').get_configuration('base').config_data
+        self.assertEqual(config, {'timeout': 60, 'retries': 3})
+
+    def test_lock_timeout(self):
+        path = os.path.join(self.tmp.name, 'store.lock')
+        with FileLock(path):
+            with self.assertRaises(LockTimeout):
+                FileLock(path, timeout=0.05).acquire()
+
+if __name__ == '__main__':
+    unittest.main()
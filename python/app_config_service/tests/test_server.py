@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.server import ConfigServer
+
+async def request(port, path, headers=None, connection=None):
+    """Send one GET over a new (or the given) connection; returns (status, headers, body)."""
+    reader, writer = connection or await asyncio.open_connection('127.0.0.1', port)
+    lines = [f'GET {path} HTTP/1.1', 'Host: localhost'] + [f'{k}: {v}' for k, v in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    response_headers = dict(line.split(': ', 1) for line in head[1:] if line)
+    body = await reader.readexactly(int(response_headers['Content-Length']))
+    if connection is None:
+        writer.close()
+    return int(head[0].split(' ')[1]), response_headers, body
+
+class TestConfigServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        manager = ConfigManager(FileStorage(self.test_file))
+        manager.set_base_config('payment-service', {'timeout': 30, 'region': 'eu'})
+        manager.set_env_config('payment-service', 'production', {'timeout': 60})
+        self.server = ConfigServer(lambda: FileStorage(self.test_file), reload_interval=0.02)
+        await self.server.start('127.0.0.1', 0)
+        self.port = self.server.port
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.tmp.cleanup()
+
+    async def test_get_config_with_etag(self):
+        # Test that a config is served with an ETag and a matching If-None-Match gets 304
+        status, headers, body = await request(self.port, '/services/payment-service/production')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {'timeout': 60, 'region': 'eu'})
+        self.assertEqual(headers['X-Config-Version'], '2')
+        status, _, body = await request(self.port, '/services/payment-service/production', {'If-None-Match': headers['ETag']})
+        self.assertEqual((status, body), (304, b''))
+        status, _, _ = await request(self.port, '/services/missing/production')
+        self.assertEqual(status, 404)
+
+    async def test_keep_alive_connection_serves_many_requests(self):
+        connection = await asyncio.open_connection('127.0.0.1', self.port)
+        for _ in range(20):
+            status, _, _ = await request(self.port, '/services/payment-service/base', connection=connection)
+            self.assertEqual(status, 200)
+        connection[1].close()
+
+    async def test_long_poll_returns_when_version_changes(self):
+        # Test that a poll waits until another process changes the config
+        poll = asyncio.ensure_future(request(self.port, '/services/payment-service/production/poll?version=2&timeout=10'))
+        await asyncio.sleep(0.1)
+        self.assertFalse(poll.done())
+        ConfigManager(FileStorage(self.test_file)).set_env_config('payment-service', 'production', {'timeout': 90})
+        status, headers, body = await asyncio.wait_for(poll, 5)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['X-Config-Version'], '3')
+        self.assertEqual(json.loads(body)['timeout'], 90)
+
+    async def test_long_poll_times_out_unchanged(self):
+        status, headers, _ = await request(self.port, '/services/payment-service/production/poll?version=2&timeout=0.1')
+        self.assertEqual(status, 304)
+        self.assertEqual(headers['X-Config-Version'], '2')
+
+    async def test_many_concurrent_pollers(self):
+        # Test that hundreds of open long-polls are all released by one change
+        polls = [asyncio.ensure_future(request(self.port, '/services/payment-service/base/poll?version=2&timeout=10'))
+                 for _ in range(200)]
+        await asyncio.sleep(0.3)
+        ConfigManager(FileStorage(self.test_file)).set_base_config('payment-service', {'region': 'us'})
+        results = await asyncio.wait_for(asyncio.gather(*polls), 10)
+        self.assertEqual({status for status, _, _ in results}, {200})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+from app_config_service.storage import FileStorage
+from app_config_service.sidecars import AppendLog, sidecar_path
+
+class CountingLog(AppendLog):
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.seen = []
+        self.resets = 0
+
+    def _scan(self, line):
+        self.seen.append(line)
+
+    def _reset(self):
+        self.seen = []
+        self.resets += 1
+
+class TestAppendLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'log.ndjson')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_catch_up_follows_appends_and_rewrites(self):
+        # Test that each process scans every line once, and starts over after another rewrote the file
+        log, other = CountingLog(self.filename), CountingLog(self.filename)
+        with log.lock:
+            log.catch_up()
+            log.append([b'{"n": 1}\n', b'{"n": 2}\n'])
+        self.assertEqual(log.position[1], os.path.getsize(self.filename))
+        with open(self.filename, 'ab') as f:
+            f.write(b'{"n": 3')  # torn: not scanned until complete
+        other.catch_up()
+        self.assertEqual(other.seen, [b'{"n": 1}\n', b'{"n": 2}\n'])
+        self.assertEqual(other.last_line(), b'{"n": 2}\n')
+        other.rewrite([b'{"n": 2}\n'])
+        log.catch_up()
+        self.assertEqual((log.seen, log.resets), ([b'{"n": 2}\n'], 1))
+        self.assertEqual(list(log.lines()), [b'{"n": 2}\n'])
+
+    def test_missing_file_and_sidecar_paths(self):
+        log = CountingLog(self.filename)
+        self.assertEqual((log.read_since(), log.last_line(), list(log.lines())), (([], None, False), None, []))
+        storage = FileStorage(os.path.join(self.tmp.name, 'config_data.json'))
+        self.assertEqual(sidecar_path(storage, '.changes', 'changes.ndjson'), storage.filename + '.changes')
+
+if __name__ == '__main__':
+    unittest.main()
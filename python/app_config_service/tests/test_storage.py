@@ -0,0 +1,310 @@
+import unittest
+import os
+import json
+import tempfile
+from datetime import datetime
+from unittest import mock
+from app_config_service.storage import (FileStorage, JournaledFileStorage, ShardedStorage, SQLiteStorage, BinaryStorage,
+                                        create_storage, convert_json_to_binary, convert_binary_to_json, backend_for_path)
+from app_config_service.config_manager import ConfigManager
+
+class TestJournaledFileStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.storage = JournaledFileStorage(self.test_file, compact_threshold=50)
+        self.manager = ConfigManager(self.storage)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_mutations_append_to_log_not_snapshot(self):
+        # Test that a mutation appends a record instead of rewriting the snapshot
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        with open(self.test_file) as f:
+            self.assertEqual(json.load(f), {})
+        with open(self.storage.log_filename) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records[-1]['name'], 'payment-service')
+
+    def test_load_replays_snapshot_and_log(self):
+        # Test that reloading folds the log tail over the snapshot
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.storage.compact()
+        self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+        self.storage.delete_service('payment-service')
+        self.manager.set_base_config('order-service', {'retries': 3})
+        reloaded = JournaledFileStorage(self.test_file)
+        self.assertEqual(reloaded.list_services(), ['order-service'])
+
+    def test_threshold_triggers_compaction(self):
+        # Test that the log is folded into the snapshot once it reaches the threshold
+        for i in range(60):
+            self.manager.set_base_config('svc', {f'key_{i}': i})
+        self.assertLess(self.storage.log_records, 50)
+        with open(self.test_file) as f:
+            self.assertIn('svc', json.load(f))
+        reloaded = JournaledFileStorage(self.test_file)
+        self.assertEqual(len(reloaded.get_service('svc').get_configuration('base').config_data), 60)
+
+    def test_torn_log_tail_is_ignored(self):
+        # Test that a partially written last record does not break loading
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        with open(self.storage.log_filename, 'a') as f:
+            f.write('{"op": "put", "name": "broken"')
+        reloaded = JournaledFileStorage(self.test_file)
+        self.assertEqual(reloaded.list_services(), ['payment-service'])
+        with open(self.storage.log_filename) as f:
+            self.assertNotIn('broken', f.read())
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_storage('nope', self.test_file)
+
+class TestShardedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'shards')
+        self.storage = ShardedStorage(self.directory)
+        self.manager = ConfigManager(self.storage)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_services_load_lazily(self):
+        # Test that reopening reads only the manifest until a service is requested
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+        self.manager.set_base_config('order-service', {'retries': 3})
+        reopened = ShardedStorage(self.directory)
+        self.assertEqual(set(reopened.list_services()), {'payment-service', 'order-service'})
+        self.assertEqual(reopened.services.loaded, {})
+        config = ConfigManager(reopened).get_config('payment-service', 'production')
+        self.assertEqual(config.config_data['timeout_seconds'], 60)
+        self.assertEqual(list(reopened.services.loaded), ['payment-service'])
+
+    def test_only_dirty_shards_are_written(self):
+        # Test that saving rewrites only shards whose content changed
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.manager.set_base_config('order-service', {'retries': 3})
+        order_shard = os.path.join(self.directory, 'services', self.storage.shard_name('order-service'))
+        before = os.stat(order_shard).st_mtime_ns
+        os.utime(order_shard, ns=(before - 10**9, before - 10**9))
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 45})
+        self.storage.save()
+        self.assertEqual(os.stat(order_shard).st_mtime_ns, before - 10**9)
+
+    def test_delete_service_removes_shard(self):
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        shard = os.path.join(self.directory, 'services', self.storage.shard_name('payment-service'))
+        self.assertTrue(os.path.exists(shard))
+        reopened = ShardedStorage(self.directory)
+        self.assertTrue(reopened.delete_service('payment-service'))
+        self.assertFalse(os.path.exists(shard))
+        self.assertEqual(ShardedStorage(self.directory).list_services(), [])
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, 'config_data.db')
+        self.storage = SQLiteStorage(self.db_file)
+        self.manager = ConfigManager(self.storage)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_round_trip_and_wal_mode(self):
+        # Test that configs persist across connections and the database uses WAL
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30, 'meta': {'a': 1}})
+        self.manager.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+        self.manager.remove_key_from_base('payment-service', 'meta')
+        reopened = SQLiteStorage(self.db_file)
+        self.assertEqual(reopened.conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        config = ConfigManager(reopened).get_config('payment-service', 'production')
+        self.assertEqual(config.config_data, {'timeout_seconds': 60})
+        reopened.close()
+
+    def test_single_key_update_touches_one_row(self):
+        # Test that changing one key only writes that key's row
+        self.manager.set_base_config('payment-service', {f'key_{i}': i for i in range(20)})
+        before = self.storage.conn.total_changes
+        self.manager.set_base_config('payment-service', {'key_3': 33})
+        # One config_keys row plus the environment's updated_at and the service version
+        self.assertEqual(self.storage.conn.total_changes - before, 3)
+
+    def test_delete_service_cascades(self):
+        self.manager.set_base_config('payment-service', {'timeout_seconds': 30})
+        self.assertTrue(self.storage.delete_service('payment-service'))
+        self.assertEqual(self.storage.conn.execute('SELECT COUNT(*) FROM config_keys').fetchone()[0], 0)
+        self.assertFalse(self.storage.delete_service('payment-service'))
+
+    def test_import_json(self):
+        # Test migrating an existing JSON store into SQLite
+        json_file = os.path.join(self.tmp.name, 'config_data.json')
+        source = ConfigManager(FileStorage(json_file))
+        source.set_base_config('payment-service', {'timeout_seconds': 30})
+        source.set_env_config('payment-service', 'production', {'timeout_seconds': 60})
+        source.set_base_config('order-service', {'retries': 3})
+        self.assertEqual(self.storage.import_json(json_file), 2)
+        reopened = SQLiteStorage(self.db_file)
+        self.assertEqual(set(reopened.list_services()), {'payment-service', 'order-service'})
+        self.assertEqual(reopened.get_service('payment-service').get_configuration('production').config_data['timeout_seconds'], 60)
+        reopened.close()
+
+class TestBinaryStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmp.name, 'config_data.json')
+        self.binary_file = os.path.join(self.tmp.name, 'config_data.bin')
+        manager = ConfigManager(FileStorage(self.json_file))
+        for i in range(50):
+            manager.set_base_config(f'service-{i}', {'timeout': i, 'name': f'svc {i}', 'meta': {'a': [1, None]}})
+            manager.set_env_config(f'service-{i}', 'production', {'timeout': i * 2})
+        manager.set_base_config('unicode 你好', {'enabled': True})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_through_binary_snapshot(self):
+        # Test that JSON -> binary -> JSON preserves services, versions and timestamps
+        self.assertEqual(convert_json_to_binary(self.json_file, self.binary_file), 51)
+        copy = os.path.join(self.tmp.name, 'copy.json')
+        self.assertEqual(convert_binary_to_json(self.binary_file, copy), 51)
+        with open(self.json_file) as a, open(copy) as b:
+            self.assertEqual(json.load(a), json.load(b))
+
+    def test_single_service_decoded_on_demand(self):
+        # Test that opening decodes nothing and a lookup decodes only the requested service
+        convert_json_to_binary(self.json_file, self.binary_file)
+        storage = BinaryStorage(self.binary_file)
+        self.assertEqual(storage.services.loaded, {})
+        config = ConfigManager(storage).get_config('service-7', 'production')
+        self.assertEqual(config.config_data, {'timeout': 14, 'name': 'svc 7', 'meta': {'a': [1, None]}})
+        self.assertEqual(list(storage.services.loaded), ['service-7'])
+        self.assertIsNone(storage.get_service('service-999'))
+        self.assertIn('unicode 你好', storage.list_services())
+        storage.close()
+
+    def test_backend_detected_from_contents(self):
+        # Test that a snapshot saved without the .bin suffix still opens as binary
+        backup = os.path.join(self.tmp.name, 'backup-monday')
+        convert_json_to_binary(self.json_file, backup)
+        self.assertEqual((backend_for_path(backup), backend_for_path(self.json_file)), ('binary', 'file'))
+        storage = create_storage(backend_for_path(backup), backup)
+        self.assertEqual(len(storage.list_services()), 51)
+        storage.close()
+
+    def test_writes_and_deletes_persist(self):
+        storage = BinaryStorage(self.binary_file)
+        manager = ConfigManager(storage)
+        manager.set_base_config('payment-service', {'timeout': 30})
+        manager.set_env_config('payment-service', 'production', {'timeout': 60})
+        manager.set_base_config('order-service', {'retries': 3})
+        self.assertTrue(storage.delete_service('order-service'))
+        storage.close()
+        reopened = BinaryStorage(self.binary_file)
+        self.assertEqual(reopened.list_services(), ['payment-service'])
+        self.assertEqual(reopened.get_service('payment-service').version, 2)
+        reopened.close()
+
+class TestFileStorageOffsetIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        manager = ConfigManager(FileStorage(self.test_file))
+        for name in ('zeta-service', 'alpha-service', 'unicode 你好'):
+            manager.set_base_config(name, {'timeout': 30, 'label': name})
+        manager.set_env_config('alpha-service', 'production', {'timeout': 60})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_writes_index_and_reads_decode_one_service(self):
+        # Test that reopening decodes nothing and a lookup decodes only that service
+        self.assertTrue(os.path.exists(self.test_file + '.idx'))
+        storage = FileStorage(self.test_file)
+        self.assertEqual(storage.services.loaded, {})
+        self.assertEqual(storage.list_services(), ['zeta-service', 'alpha-service', 'unicode 你好'])
+        config = ConfigManager(storage).get_config('alpha-service', 'production')
+        self.assertEqual(config.config_data, {'timeout': 60, 'label': 'alpha-service'})
+        self.assertEqual(list(storage.services.loaded), ['alpha-service'])
+        self.assertEqual(storage.get_service('unicode 你好').get_configuration('base').config_data['label'], 'unicode 你好')
+        self.assertIsNone(storage.get_service('missing'))
+
+    def test_stale_index_is_ignored_and_rebuilt(self):
+        # Test that a store changed behind the index's back is parsed in full, then indexed again
+        with open(self.test_file) as f:
+            data = json.load(f)
+        del data['zeta-service']
+        with open(self.test_file, 'w') as f:
+            json.dump(data, f, indent=4)
+        storage = FileStorage(self.test_file)
+        self.assertNotIn('zeta-service', storage.list_services())
+        reopened = FileStorage(self.test_file)
+        self.assertEqual(reopened.services.loaded, {})
+        self.assertEqual(reopened.get_service('alpha-service').get_configuration('production').config_data['timeout'], 60)
+
+    def test_writes_through_indexed_store(self):
+        storage = FileStorage(self.test_file)
+        manager = ConfigManager(storage)
+        manager.set_env_config('zeta-service', 'staging', {'timeout': 5})
+        self.assertTrue(storage.delete_service('alpha-service'))
+        manager.set_base_config('new-service', {'retries': 3})
+        self.assertEqual(len(storage.services), 3)
+        reopened = FileStorage(self.test_file)
+        self.assertEqual(reopened.list_services(), ['zeta-service', 'unicode 你好', 'new-service'])
+        self.assertEqual(reopened.get_service('zeta-service').get_configuration('staging').config_data['timeout'], 5)
+
+    def test_unmapped_reads_where_mapped_files_cannot_be_replaced(self):
+        # Test the Windows path: files are read instead of mapped, and a reader never blocks a writer
+        with mock.patch('app_config_service.offset_index.MAP_FILES', False):
+            reader = FileStorage(self.test_file)
+            self.assertIsInstance(reader.index.data, bytes)
+            self.assertEqual(reader.index.maps, [])
+            ConfigManager(FileStorage(self.test_file)).set_env_config('zeta-service', 'staging', {'timeout': 5})
+            self.assertEqual(reader.get_service('alpha-service').get_configuration('production').config_data['timeout'], 60)
+            self.assertEqual(FileStorage(self.test_file).get_service('zeta-service').get_configuration('staging')
+                             .config_data['timeout'], 5)
+
+class TestCompactModels(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.test_file = os.path.join(self.tmp.name, 'config_data.json')
+        manager = ConfigManager(FileStorage(self.test_file))
+        manager.set_base_config('payment-service', {'timeout': 30, 'region': 'eu'})
+        manager.set_env_config('payment-service', 'production', {'timeout': 60})
+        manager.set_base_config('order-service', {'timeout': 5})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_timestamps_parsed_on_access(self):
+        # Test that loaded timestamps are kept as stored until read, and save back unchanged
+        with open(self.test_file) as f:
+            before = f.read()
+        stored = json.loads(before)['payment-service']['configurations']['production']['created_at']
+        storage = FileStorage(self.test_file)
+        entry = storage.get_service('payment-service').get_configuration('production')
+        self.assertEqual(entry.created_raw, stored)
+        self.assertEqual(entry.created_at.isoformat(), stored)
+        self.assertIsInstance(entry.created_raw, datetime)
+        self.assertFalse(hasattr(entry, '__dict__'))
+        storage.get_service('order-service')
+        storage.save()  # both services are written back from their decoded entries
+        with open(self.test_file) as f:
+            self.assertEqual(f.read(), before)
+
+    def test_keys_shared_across_services(self):
+        # Test that equal key names loaded from different services are the same object
+        storage = FileStorage(self.test_file)
+        payment = storage.get_service('payment-service')
+        order = storage.get_service('order-service')
+        payment_keys = list(payment.get_configuration('base').overrides)
+        production_keys = list(payment.get_configuration('production').overrides)
+        order_keys = list(order.get_configuration('base').overrides)
+        self.assertIs(payment_keys[0], order_keys[0])
+        self.assertIs(payment_keys[0], production_keys[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,66 @@
 # Type checking and validation logic
 
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Tuple
+
+# Exact JSON type codes; bool is kept apart from int even though it subclasses it
+TYPE_CODES = {
+    bool: 'bool',
+    int: 'int',
+    float: 'float',
+    str: 'str',
+    list: 'list',
+    dict: 'dict',
+    type(None): 'null',
+}
+
+def type_code(value: Any) -> str:
+    return TYPE_CODES.get(type(value)) or type(value).__name__
+
+class SchemaError(ValueError):
+    """Raised with every problem found in a payload, not just the first one."""
+    def __init__(self, errors: List[str]):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+class ConfigSchema:
+    """
+    Type codes for each key of a base config, compiled once and reused for
+    every payload checked against that base.
+    """
+    def __init__(self, base_config: Dict[str, Any]):
+        self.types = {key: type_code(value) for key, value in base_config.items()}
+
+    def errors(self, config: Dict[str, Any], allow_unknown: bool = False) -> List[str]:
+        types = self.types
+        errors = []
+        for key, value in config.items():
+            expected = types.get(key)
+            if expected is None:
+                if not allow_unknown:
+                    errors.append(f'Key {key} not defined in base configuration.')
+                continue
+            actual = TYPE_CODES.get(type(value)) or type(value).__name__
+            if actual != expected:
+                errors.append(f"Type mismatch for key '{key}': expected {expected}, got {actual}")
+        return errors
+
+    def validate(self, config: Dict[str, Any], allow_unknown: bool = False):
+        errors = self.errors(config, allow_unknown)
+        if errors:
+            raise SchemaError(errors)
+
+    def validate_many(self, payloads: Iterable[Dict[str, Any]], allow_unknown: bool = False) -> List[Tuple[int, List[str]]]:
+        """Check a batch of payloads in one pass; returns (index, errors) for each rejected payload."""
+        rejected = []
+        for index, config in enumerate(payloads):
+            errors = self.errors(config, allow_unknown)
+            if errors:
+                rejected.append((index, errors))
+        return rejected
 
 def validate_config_types(base_config: Dict[str, Any], new_config: Dict[str, Any]):
     """
     Validates that the types of values in new_config match those in base_config.
-    Raises ValueError if a type mismatch is found.
+    Raises ValueError listing every type mismatch found.
     """
-    for key, value in new_config.items():
-        if key in base_config:
-            if not isinstance(value, type(base_config[key])):
-                raise ValueError(f"Type mismatch for key '{key}': expected {type(base_config[key]).__name__}, got {type(value).__name__}")
+    ConfigSchema(base_config).validate(new_config, allow_unknown=True)
@@ -0,0 +1,78 @@
+# Concurrent writer benchmark: several processes updating one store through locked compare-and-swap commits
+#
+# Each writer process runs read-modify-write transactions; --hot services are shared by
+# all writers (contended), the rest are private to one writer. Run from the python folder:
+#   python -m benchmarks.bench_concurrency --writers 1 4 8 --commits 200 --output concurrency.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app_config_service.storage import create_storage
+from app_config_service.config_manager import ConfigManager
+from app_config_service.instrumentation import metrics
+from benchmarks.synthetic import populate
+
+def writer(backend, path, worker, commits, hot, start, results):
+    manager = ConfigManager(create_storage(backend, path))
+    start.wait()
+    metrics.reset()
+    metrics.enabled = True  # for the conflict_retries counter
+    began = time.perf_counter()
+    for i in range(commits):
+        name = f'service-{i % hot:06d}' if hot else f'service-{worker:06d}'
+
+        def bump():
+            current = manager.get_config(name, 'base').config_data.get('writes', 0)
+            manager.set_base_config(name, {'writes': current + 1})
+        manager.run_transaction(bump, retries=10000)
+    results.put((time.perf_counter() - began, metrics.counters.get('conflict_retries', 0)))
+
+def run_case(backend, path, writers, commits, hot):
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=writer, args=(backend, path, w, commits, hot, start, results))
+                 for w in range(writers)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)  # let every writer open the store first
+    began = time.perf_counter()
+    start.set()
+    rows = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+    total = writers * commits
+    return {'backend': backend, 'writers': writers, 'hot_services': hot, 'commits': total, 'seconds': elapsed,
+            'commits_per_second': total / elapsed, 'conflict_retries': sum(retries for _, retries in rows)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Commit throughput with several writer processes.')
+    parser.add_argument('--backends', nargs='+', default=['file', 'journal'])
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--commits', type=int, default=200, help='Commits per writer process')
+    parser.add_argument('--hot', type=int, default=1, help='Services shared by all writers (0: one private service each)')
+    parser.add_argument('--services', type=int, default=1000)
+    parser.add_argument('--environments', type=int, default=5)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    results = []
+    for backend in args.backends:
+        for writers in args.writers:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'store.json')
+                populate(create_storage(backend, path), args.services, args.environments, args.keys)
+                row = run_case(backend, path, writers, args.commits, args.hot)
+            print(f"{row['backend']:<8} {row['writers']:>3} writers  {row['commits']:>6} commits  "
+                  f"{row['commits_per_second']:>8.0f} commits/s  {row['conflict_retries']:>6} retries")
+            results.append(row)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'concurrency', 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Memory benchmark: resident set size and Python heap after loading a store
+#
+# Each case loads the store in a fresh process so measurements do not leak between backends.
+# Run from the python folder:
+#   python -m benchmarks.bench_memory --sizes 1000 10000 --backend file binary --output memory.json
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from app_config_service.storage import create_storage, convert_json_to_binary
+from benchmarks.synthetic import populate
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        # Peak rather than current RSS, but still comparable between runs
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def measure(backend, path):
+    """Load every service of a store and report memory use; runs inside the child process."""
+    before = rss_kb()
+    tracemalloc.start()
+    storage = create_storage(backend, path)
+    services = [storage.get_service(name) for name in storage.list_services()]
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    entries = sum(len(service.configurations) for service in services)
+    return {'rss_kb': rss_kb() - before, 'heap_kb': heap // 1024,
+            'bytes_per_entry': heap // entries if entries else 0}
+
+def run_case(backend, path):
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_memory', '--measure', backend, path],
+                            cwd=PYTHON_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+def run(sizes, backends, environments, keys, seed):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f'store_{size}.json')
+            populate(create_storage('file', path), size, environments, keys, seed)
+            for backend in backends:
+                store = path
+                if backend == 'binary':
+                    store = os.path.join(tmp, f'store_{size}.bin')
+                    convert_json_to_binary(path, store)
+                elif backend != 'file':
+                    raise SystemExit(f"Unsupported backend for this benchmark: {backend}")
+                results.append({'backend': backend, 'services': size, 'environments': environments,
+                                'keys': keys, **run_case(backend, store)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory used by a loaded config store.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--backend', nargs='+', default=['file', 'binary'], choices=['file', 'binary'])
+    parser.add_argument('--environments', type=int, default=5)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--measure', nargs=2, metavar=('BACKEND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+    results = run(args.sizes, args.backend, args.environments, args.keys, args.seed)
+    for row in results:
+        print(f"{row['backend']:<8}{row['services']:>8} services  "
+              f"rss: {row.get('rss_kb')} KB  heap: {row.get('heap_kb')} KB  per entry: {row.get('bytes_per_entry')} B")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'memory', 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
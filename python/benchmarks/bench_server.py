@@ -0,0 +1,63 @@
+# HTTP server benchmark: request throughput with many concurrent keep-alive readers
+#
+# The server and all clients share one event loop, so this measures one core doing both.
+# Run from the python folder:
+#   python -m benchmarks.bench_server --clients 100 1000 --requests 20 --output server.json
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from app_config_service.storage import FileStorage
+from app_config_service.server import ConfigServer
+from benchmarks.synthetic import populate
+
+async def client(port, paths, requests):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i in range(requests):
+        writer.write(f'GET {paths[i % len(paths)]} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('latin-1'))
+        head = await reader.readuntil(b'\r\n\r\n')
+        length = int(head.split(b'Content-Length: ')[1].split(b'\r\n')[0])
+        await reader.readexactly(length)
+    writer.close()
+
+async def run_case(path, clients, requests, services, environments):
+    server = ConfigServer(lambda: FileStorage(path), reload_interval=60)
+    await server.start('127.0.0.1', 0)
+    paths = [f'/services/service-{s:06d}/env_{s % environments}' for s in range(min(services, 100))]
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(server.port, paths[c % len(paths):] + paths[:c % len(paths)], requests)
+                               for c in range(clients)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await server.close()
+    total = clients * requests
+    return {'clients': clients, 'requests': total, 'seconds': elapsed, 'requests_per_second': total / elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of the config HTTP server.')
+    parser.add_argument('--clients', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client connection')
+    parser.add_argument('--services', type=int, default=1000)
+    parser.add_argument('--environments', type=int, default=5)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'store.json')
+        populate(FileStorage(path), args.services, args.environments, args.keys)
+        for clients in args.clients:
+            row = asyncio.run(run_case(path, clients, args.requests, args.services, args.environments))
+            print(f"{row['clients']:>6} clients  {row['requests']:>8} requests  {row['requests_per_second']:>10.0f} req/s")
+            results.append(row)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'server', 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
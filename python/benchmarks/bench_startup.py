@@ -0,0 +1,61 @@
+# CLI startup benchmark: wall time of `--help` and `get-config` as the store grows
+#
+# Run from the python folder:
+#   python -m benchmarks.bench_startup --sizes 10 1000 10000 --output startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app_config_service.storage import FileStorage
+from benchmarks.synthetic import populate
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_command(args, env, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', 'app_config_service.cli'] + args, env=env,
+                                cwd=PYTHON_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        samples.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return {'error': result.stderr.decode(errors='replace').strip().splitlines()[-1]}
+    return {'median_ms': statistics.median(samples) * 1000, 'min_ms': min(samples) * 1000}
+
+def run(sizes, environments, keys, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f'store_{size}.json')
+            populate(FileStorage(path), size, environments, keys)
+            env = dict(os.environ, APP_CONFIG_STORAGE='file', APP_CONFIG_PATH=path)
+            results.append({
+                'services': size,
+                'help': time_command(['--help'], env, repeat),
+                'get_config': time_command(['get-config', 'service-000000', 'env_0'], env, repeat),
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--environments', type=int, default=5)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    results = run(args.sizes, args.environments, args.keys, args.repeat)
+    for row in results:
+        print(f"{row['services']:>8} services  --help: {row['help']}  get-config: {row['get_config']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'startup', 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Scale benchmarks for ConfigManager and the storage backends
+#
+# Run from the python folder:
+#   python -m benchmarks.bench_storage --preset small --backend file journal --output before.json
+#   python -m benchmarks.bench_storage --services 5000 --environments 10 --keys 100
+#   python -m benchmarks.compare before.json after.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from app_config_service.config_manager import ConfigManager
+from app_config_service.storage import STORAGE_BACKENDS, create_storage
+from benchmarks.synthetic import populate
+
+# (services, environments, keys); together they span 10-100k services, 1-50 environments and 10-1000 keys
+PRESETS = {
+    'tiny': [(10, 1, 10)],
+    'small': [(10, 1, 10), (1000, 5, 50)],
+    'medium': [(1000, 5, 50), (10000, 10, 100), (1000, 50, 1000)],
+    'large': [(10000, 10, 100), (100000, 20, 50), (1000, 50, 1000)],
+}
+
+SCENARIOS = ('cold_load', 'point_read', 'single_key_write', 'base_key_propagation', 'key_removal', 'save')
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def timed(fn, ops):
+    samples = []
+    for i in range(ops):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return {
+        'ops': ops,
+        'total_s': sum(samples),
+        'per_op_ms': statistics.median(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+def close(storage):
+    if hasattr(storage, 'close'):
+        storage.close()
+
+def run_case(backend, services, environments, keys, ops, seed):
+    rng = random.Random(seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'store')
+        close(populate(create_storage(backend, path), services, environments, keys, seed))
+        names = [f'service-{s:06d}' for s in range(services)]
+        envs = [f'env_{e}' for e in range(environments)]
+
+        def cold_load(i):
+            storage = create_storage(backend, path)
+            # Lazy backends only pay for what the first read touches
+            storage.get_service(names[0])
+            close(storage)
+        results['cold_load'] = timed(cold_load, min(ops, 5))
+
+        storage = create_storage(backend, path)
+        manager = ConfigManager(storage)
+        picks = [(rng.choice(names), rng.choice(envs)) for _ in range(ops)]
+        results['point_read'] = timed(lambda i: manager.get_config(*picks[i]).config_data, ops)
+        results['single_key_write'] = timed(
+            lambda i: manager.set_env_config(picks[i][0], picks[i][1], {'key_0': i}), ops)
+        results['base_key_propagation'] = timed(
+            lambda i: manager.set_base_config(picks[i][0], {f'bench_key_{i}': i}), ops)
+        results['key_removal'] = timed(
+            lambda i: manager.remove_key_from_base(picks[i][0], f'bench_key_{i}'), ops)
+        results['save'] = timed(lambda i: storage.save(), min(ops, 5))
+        close(storage)
+    return [dict(backend=backend, services=services, environments=environments, keys=keys, scenario=name, **stats)
+            for name, stats in results.items()]
+
+def main():
+    parser = argparse.ArgumentParser(description='ConfigManager/storage scale benchmarks')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--services', type=int, help='Run a single shape instead of a preset')
+    parser.add_argument('--environments', type=int, default=5)
+    parser.add_argument('--keys', type=int, default=50)
+    parser.add_argument('--backend', nargs='+', default=['file'], choices=sorted(STORAGE_BACKENDS))
+    parser.add_argument('--ops', type=int, default=20, help='Operations timed per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    shapes = [(args.services, args.environments, args.keys)] if args.services else PRESETS[args.preset]
+    rows = []
+    for backend in args.backend:
+        for services, environments, keys in shapes:
+            for row in run_case(backend, services, environments, keys, args.ops, args.seed):
+                print(f"{row['backend']:>8} {row['services']:>7}s {row['environments']:>3}e {row['keys']:>5}k "
+                      f"{row['scenario']:<22} {row['per_op_ms']:10.3f} ms/op")
+                rows.append(row)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'storage',
+                'meta': {'commit': git_commit(), 'python': platform.python_version(), 'seed': args.seed, 'ops': args.ops},
+                'results': rows,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
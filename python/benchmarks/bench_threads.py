@@ -0,0 +1,104 @@
+# Multithreaded read benchmark: get_config throughput and latency while a writer thread commits
+#
+# 'snapshot' reads through ThreadSafeConfigManager (lock-free snapshot hits); 'mutex' is the
+# naive alternative of one lock around a plain ConfigManager, copying each config out under it.
+# Run from the python folder:
+#   python -m benchmarks.bench_threads --threads 1 2 4 8 --seconds 2 --output threads.json
+
+import argparse
+import copy
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from app_config_service.storage import FileStorage
+from app_config_service.config_manager import ConfigManager, ThreadSafeConfigManager
+from benchmarks.synthetic import populate
+
+class MutexReader:
+    def __init__(self, storage):
+        self.manager = ConfigManager(storage)
+        self.lock = threading.Lock()
+
+    def get_config(self, name, env):
+        with self.lock:
+            entry = self.manager.get_config(name, env)
+            return copy.deepcopy(entry.config_data) if entry else None
+
+    def set_env_config(self, name, env, data):
+        with self.lock:
+            self.manager.set_env_config(name, env, data)
+
+def run_case(path, mode, threads, seconds, services, environments, write_interval):
+    storage = FileStorage(path)
+    manager = ThreadSafeConfigManager(storage) if mode == 'snapshot' else MutexReader(storage)
+    names = [f'service-{s:06d}' for s in range(min(services, 200))]
+    stop = threading.Event()
+    counts, latencies, commits = [0] * threads, [[] for _ in range(threads)], [0]
+
+    def read(slot):
+        rng = random.Random(slot)
+        count, samples = 0, latencies[slot]
+        while not stop.is_set():
+            name = rng.choice(names)
+            began = time.perf_counter()
+            manager.get_config(name, f'env_{rng.randrange(environments)}')
+            if count % 64 == 0:
+                samples.append(time.perf_counter() - began)
+            count += 1
+        counts[slot] = count
+
+    def write():
+        rng = random.Random(-1)
+        while not stop.wait(write_interval):
+            name = rng.choice(names)
+            manager.set_env_config(name, 'env_0', {})
+            commits[0] += 1
+
+    for name in names:  # warm up: snapshots built / services decoded
+        for env in range(environments):
+            manager.get_config(name, f'env_{env}')
+    workers = [threading.Thread(target=read, args=(slot,)) for slot in range(threads)]
+    if write_interval:
+        workers.append(threading.Thread(target=write))
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    samples = sorted(sample for per_thread in latencies for sample in per_thread)
+    reads = sum(counts)
+    return {'mode': mode, 'threads': threads, 'reads': reads, 'reads_per_second': reads / seconds,
+            'p99_us': samples[int(len(samples) * 0.99)] * 1e6 if samples else None, 'commits': commits[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description='get_config throughput with several reader threads.')
+    parser.add_argument('--modes', nargs='+', default=['snapshot', 'mutex'], choices=['snapshot', 'mutex'])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--write-interval', type=float, default=0.01, help='Seconds between writer commits (0: no writer)')
+    parser.add_argument('--services', type=int, default=1000)
+    parser.add_argument('--environments', type=int, default=5)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'store.json')
+        populate(FileStorage(path), args.services, args.environments, args.keys)
+        for mode in args.modes:
+            for threads in args.threads:
+                row = run_case(path, mode, threads, args.seconds, args.services, args.environments, args.write_interval)
+                print(f"{row['mode']:<9} {row['threads']:>3} threads  {row['reads_per_second']:>10.0f} reads/s  "
+                      f"p99 {row['p99_us']:>8.1f} us  {row['commits']:>5} commits")
+                results.append(row)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'threads', 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
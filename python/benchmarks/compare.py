@@ -0,0 +1,38 @@
+# Compare two benchmark result files and flag regressions
+#
+#   python -m benchmarks.compare before.json after.json --threshold 1.2
+
+import argparse
+import json
+
+# Fields that identify the same measurement across runs
+IDENTITY = ('backend', 'services', 'environments', 'keys', 'scenario', 'threads')
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {tuple(row.get(field) for field in IDENTITY): row for row in data['results']}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare benchmark results between commits')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--metric', default='per_op_ms')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Flag rows slower by at least this ratio')
+    args = parser.parse_args()
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    for key in sorted(before.keys() & after.keys(), key=str):
+        old, new = before[key].get(args.metric), after[key].get(args.metric)
+        if not old or new is None:
+            continue
+        ratio = new / old
+        flag = 'REGRESSION' if ratio >= args.threshold else ''
+        regressions += bool(flag)
+        label = ' '.join(str(part) for part in key if part is not None)
+        print(f"{label:<60} {old:10.3f} -> {new:10.3f}  x{ratio:5.2f} {flag}")
+    print(f"{regressions} regression(s) at threshold x{args.threshold}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,33 @@
+# Synthetic config stores for benchmarks
+
+import random
+from app_config_service.models import Service
+
+def make_service(name, environments, keys, rng):
+    """Build one Service with `keys` base keys and `environments` sparse environment overlays."""
+    service = Service(name)
+    base = {}
+    for i in range(keys):
+        kind = i % 4
+        if kind == 0:
+            base[f'key_{i}'] = rng.randint(0, 1000)
+        elif kind == 1:
+            base[f'key_{i}'] = f'value-{rng.randint(0, 1000)}'
+        elif kind == 2:
+            base[f'key_{i}'] = rng.random() < 0.5
+        else:
+            base[f'key_{i}'] = rng.random()
+    service.add_configuration('base', base)
+    for e in range(environments):
+        overrides = {key: base[key] for key in rng.sample(sorted(base), min(len(base), 3))}
+        service.add_configuration(f'env_{e}', overrides)
+    return service
+
+def populate(storage, services, environments, keys, seed=0):
+    """Fill a storage with a reproducible synthetic store and save it once."""
+    rng = random.Random(seed)
+    for s in range(services):
+        service = make_service(f'service-{s:06d}', environments, keys, rng)
+        storage.services[service.name] = service
+    storage.save()
+    return storage
@@ -34,6 +34,8 @@ addenv myservice prod '{timeout: 60, retries: 5}'  # Invalid JSON (keys must be
 # Note:
 # - For addenv, the third argument must be a valid JSON string (use single quotes around JSON, and double quotes for keys/values).
 # - For set, you can set any key/value in any environment.
+# - Changes are saved to services.json in the background, once edits pause for half a second
+#   (SET_CONFIG_DEBOUNCE), and always on exit, Ctrl+C or SIGTERM. Pasting many lines costs one write.
 """
 
 class Config:
@@ -85,14 +87,21 @@ def parse_input(input_str):
 
 import os
 import json
+import signal
+import threading
+import time
+from contextlib import contextmanager
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SERVICES_FILE = os.path.join(SCRIPT_DIR, "services.json")
+# Seconds without edits before changes are written (SET_CONFIG_DEBOUNCE), and the longest an edit waits
+DEBOUNCE_SECONDS = float(os.environ.get("SET_CONFIG_DEBOUNCE", "0.5"))
+MAX_DELAY_SECONDS = 5.0
 
-def load_services():
+def load_services(path=SERVICES_FILE):
     try:
-        if os.path.exists(SERVICES_FILE):
-            with open(SERVICES_FILE, "r") as f:
+        if os.path.exists(path):
+            with open(path, "r") as f:
                 data = json.load(f)
                 return {name: Config(name, config) for name, config in data.items()}
         return {}
@@ -100,25 +109,115 @@ def load_services():
         print(f"Error loading services: {e}")
         return {}
 
-def save_services(services):
-    try:
-        data = {name: svc.config for name, svc in services.items()}
-        with open(SERVICES_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        print(f"Error saving services: {e}")
+def write_atomically(path, text):
+    # Write a temp file next to the target and rename it over, so readers never see half a file
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class ServiceStore:
+    """
+    The services, saved by a background thread instead of after every command.
+
+    Edits made inside `with store.edit():` only mark the store dirty. The flusher thread
+    writes once no edit has come in for `debounce` seconds (or at most `max_delay` after
+    the first unsaved edit), so a burst of edits costs one write. close() stops the
+    thread and writes anything still unsaved.
+    """
+    def __init__(self, path=SERVICES_FILE, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.services = load_services(path)
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.write_lock = threading.Lock()  # one write at a time, in the order the snapshots were taken
+        self.dirty = False
+        self.first_edit = self.last_edit = 0.0
+        self.closed = False
+        self.writes = 0
+        self.flusher = threading.Thread(target=self._run, name="config-flusher", daemon=True)
+        self.flusher.start()
+
+    @contextmanager
+    def edit(self):
+        with self.changed:
+            yield self.services
+            now = time.monotonic()
+            if not self.dirty:
+                self.first_edit = now
+            self.dirty = True
+            self.last_edit = now
+            self.changed.notify()
+
+    def flush(self):
+        """Write the services now if anything changed since the last write."""
+        with self.write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                # Serialized under the lock so no edit lands halfway through
+                text = json.dumps({name: svc.config for name, svc in self.services.items()}, indent=2)
+                self.dirty = False
+            try:
+                write_atomically(self.path, text)
+                self.writes += 1
+            except Exception as e:
+                with self.lock:
+                    self.dirty = True  # retried on the next flush
+                print(f"Error saving services: {e}")
+
+    def _run(self):
+        while True:
+            with self.changed:
+                while not self.dirty and not self.closed:
+                    self.changed.wait()
+                # Wait for the burst of edits to end
+                while self.dirty and not self.closed:
+                    due = min(self.last_edit + self.debounce, self.first_edit + self.max_delay)
+                    if time.monotonic() >= due:
+                        break
+                    self.changed.wait(due - time.monotonic())
+                if self.closed:
+                    return  # close() flushes
+            self.flush()
+
+    def close(self):
+        with self.changed:
+            self.closed = True
+            self.changed.notify()
+        self.flusher.join()
+        self.flush()
+
+def _exit_on_signal(signum, frame):
+    # Unwind through main()'s finally so unsaved edits are written
+    raise SystemExit(128 + signum)
 
 
 def main():
-    services = load_services()
+    store = ServiceStore()
+    services = store.services
+    for name in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _exit_on_signal)
     print("Welcome to the Config CLI! Type 'help' for commands, 'exit' to quit.")
+    try:
+        run_commands(store, services)
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
+    finally:
+        store.close()
+
+def run_commands(store, services):
     while True:
         try:
             user_input = input("config> ").strip()
             if not user_input:
                 continue
             if user_input.lower() in ("exit", "quit"):
-                save_services(services)
                 print("Goodbye!")
                 break
             if user_input.lower() == "help":
@@ -138,15 +237,15 @@ def main():
                 if name in services:
                     print(f"Service '{name}' already exists.")
                 else:
-                    services[name] = Config(name)
-                    save_services(services)
+                    with store.edit():
+                        services[name] = Config(name)
             elif cmd == "set" and len(args) == 4:
                 name, env, key, value = args
                 if name not in services:
                     print(f"Service '{name}' not found.")
                 else:
-                    services[name].set_service(env, key, value)
-                    save_services(services)
+                    with store.edit():
+                        services[name].set_service(env, key, value)
             elif cmd == "addenv" and len(args) == 3:
                 name, env, json_str = args
                 if name not in services:
@@ -154,8 +253,8 @@ def main():
                 else:
                     try:
                         env_config = json.loads(json_str)
-                        services[name].add_env(env, env_config)
-                        save_services(services)
+                        with store.edit():
+                            services[name].add_env(env, env_config)
                     except Exception as e:
                         print(f"Invalid JSON: {e}")
             elif cmd == "show" and len(args) == 1:
@@ -169,8 +268,8 @@ def main():
                 if name not in services:
                     print(f"Service '{name}' not found.")
                 else:
-                    del services[name]
-                    save_services(services)
+                    with store.edit():
+                        del services[name]
                     print(f"Service '{name}' deleted.")
             elif cmd == "printjson" and len(args) == 1:
                 name = args[0]
@@ -191,6 +290,10 @@ def main():
                     print("Services:", ", ".join(services.keys()))
             else:
                 print("Unknown or malformed command. Type 'help' for usage.")
+        except EOFError:
+            # End of piped input
+            print()
+            break
         except Exception as e:
             print(f"Unexpected error: {e}")
 
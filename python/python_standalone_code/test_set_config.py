@@ -0,0 +1,72 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from Set_Config import Config, ServiceStore
+
+class TestServiceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'services.json')
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))  # Config prints as services are onboarded
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def saved(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def wait_for_writes(self, store, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while store.writes < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_loads_from_its_own_path(self):
+        with open(self.path, 'w') as f:
+            json.dump({'orders': {'base': {'timeout': 30}}}, f)
+        store = ServiceStore(self.path, debounce=10, max_delay=10)
+        store.close()
+        self.assertEqual(store.services['orders'].config, {'base': {'timeout': 30}})
+
+    def test_burst_of_edits_is_written_once(self):
+        store = ServiceStore(self.path, debounce=0.1, max_delay=10)
+        for i in range(50):
+            with store.edit() as services:
+                services[f'service-{i}'] = Config(f'service-{i}')
+        self.wait_for_writes(store, 1)
+        time.sleep(0.2)
+        store.close()
+        self.assertEqual(store.writes, 1)
+        self.assertEqual(len(self.saved()), 50)
+
+    def test_max_delay_bounds_the_wait_for_a_pause(self):
+        # Test that edits arriving faster than the debounce still get written after max_delay
+        store = ServiceStore(self.path, debounce=10, max_delay=0.2)
+        started = time.monotonic()
+        with store.edit() as services:
+            services['orders'] = Config('orders')
+        while store.writes == 0 and time.monotonic() - started < 5:
+            with store.edit() as services:
+                services['orders'].set_service('base', 'timeout', 30)
+            time.sleep(0.02)
+        store.close()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(self.saved()['orders'], {'base': {'timeout': 30}})
+
+    def test_close_writes_unsaved_edits(self):
+        store = ServiceStore(self.path, debounce=10, max_delay=10)
+        with store.edit() as services:
+            services['orders'] = Config('orders')
+        self.assertFalse(os.path.exists(self.path))
+        store.close()
+        self.assertEqual((store.writes, self.saved()), (1, {'orders': {'base': {}}}))
+        reopened = ServiceStore(self.path, debounce=10, max_delay=10)
+        reopened.close()
+        self.assertEqual((list(reopened.services), reopened.writes), (['orders'], 0))
+
+if __name__ == '__main__':
+    unittest.main()